@@ -0,0 +1,220 @@
+import os
+import re
+import time
+import socket
+import asyncio
+import hashlib
+import mimetypes
+import posixpath
+import tempfile
+import contextlib
+import ipaddress
+from urllib.parse import urljoin, urlsplit, unquote
+import aiohttp
+import discord
+import metrics
+from cache import TTLCache, MISSING
+
+# --- Attachment Re-hosting ---
+# Attachment links in confessions are either Discord CDN URLs, which expire,
+# or arbitrary URLs that can disappear. After a confession is posted with
+# the original link, its file is downloaded once and uploaded onto the
+# confession message itself (where Discord keeps the link fresh) and into
+# the log channel.
+#
+# Downloads stream in chunks into a temporary file that stays in memory up
+# to ATTACHMENT_SPOOL_SIZE and moves to disk past that, and are abandoned as
+# soon as they pass ATTACHMENT_MAX_SIZE. At most ATTACHMENT_CONCURRENCY files
+# are held at once, so memory stays bounded however many or how large the
+# attachments are. Files are hashed as they stream, and a file already
+# uploaded to a log channel is linked to instead of uploaded again. Only
+# images are re-hosted; any other type is left as the original link and
+# never downloaded, so the bot doesn't re-publish arbitrary files.
+ATTACHMENT_MAX_SIZE = int(os.environ.get("ATTACHMENT_MAX_SIZE", 8 * 1024 * 1024))
+ATTACHMENT_CONCURRENCY = int(os.environ.get("ATTACHMENT_CONCURRENCY", 4))
+ATTACHMENT_SPOOL_SIZE = int(os.environ.get("ATTACHMENT_SPOOL_SIZE", 1024 * 1024))
+ATTACHMENT_TIMEOUT = float(os.environ.get("ATTACHMENT_TIMEOUT", 30))
+ATTACHMENT_HASH_CACHE_SIZE = int(os.environ.get("ATTACHMENT_HASH_CACHE_SIZE", 10_000))
+ATTACHMENT_HASH_CACHE_TTL = float(os.environ.get("ATTACHMENT_HASH_CACHE_TTL", 86400))
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+MAX_URL_LENGTH = 2000
+MAX_FILENAME_LENGTH = 100
+
+INVALID_URL_MESSAGE = "⚠️ The attachment must be an http(s) link to a file."
+
+class AttachmentError(Exception):
+    """Raised when an attachment can't be accepted or fetched; str() is the message for the user."""
+
+class NotAnImage(AttachmentError):
+    """Raised when an attachment link doesn't serve an image, so it isn't re-hosted."""
+
+def _is_public(address):
+    return ipaddress.ip_address(address).is_global
+
+def validate_url(url):
+    """Returns the stripped URL, or raises AttachmentError if it isn't a public http(s) link."""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+    except ValueError:
+        raise AttachmentError(INVALID_URL_MESSAGE) from None
+    if len(url) > MAX_URL_LENGTH or parts.scheme not in ("http", "https") or not host:
+        raise AttachmentError(INVALID_URL_MESSAGE)
+    try:
+        public = _is_public(host)
+    except ValueError:
+        public = host != "localhost" and not host.endswith(".localhost")
+    if not public:
+        raise AttachmentError(INVALID_URL_MESSAGE)
+    return url
+
+class _PublicResolver(aiohttp.abc.AbstractResolver):
+    """Resolves host names, dropping private and loopback addresses."""
+
+    def __init__(self):
+        self._resolver = aiohttp.DefaultResolver()
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        hosts = [result for result in await self._resolver.resolve(host, port, family) if _is_public(result["host"])]
+        if not hosts:
+            raise OSError(f"{host} does not resolve to a public address")
+        return hosts
+
+    async def close(self):
+        await self._resolver.close()
+
+def _filename(url, content_type):
+    name = unquote(posixpath.basename(urlsplit(url).path))
+    name = re.sub(r"[^\w.-]", "_", name).strip("._")[-MAX_FILENAME_LENGTH:] or "attachment"
+    if "." not in name:
+        name += mimetypes.guess_extension(content_type or "") or ""
+    return name
+
+class Attachment:
+    """A downloaded file: a seekable temporary file with its name, type, size and SHA-256."""
+
+    def __init__(self, file, filename, content_type, size, digest):
+        self.file = file
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.digest = digest
+
+    def to_file(self):
+        """Returns a discord.File reading the download from the start."""
+        self.file.seek(0)
+        return discord.File(self.file, filename=self.filename)
+
+class AttachmentPipeline:
+    """Downloads attachments with bounded memory and uploads each file to a log channel once."""
+
+    def __init__(self, max_size=ATTACHMENT_MAX_SIZE, concurrency=ATTACHMENT_CONCURRENCY,
+                 spool_size=ATTACHMENT_SPOOL_SIZE, timeout=ATTACHMENT_TIMEOUT, public_only=True):
+        self.max_size = max_size
+        self.concurrency = concurrency
+        self.spool_size = spool_size
+        self.timeout = timeout
+        self.public_only = public_only
+        self._slots = asyncio.Semaphore(concurrency)
+        self._session = None
+        self._uploaded = TTLCache(maxsize=ATTACHMENT_HASH_CACHE_SIZE, ttl=ATTACHMENT_HASH_CACHE_TTL)  # (channel_id, digest) -> jump URL
+        self._uploading = {}  # (channel_id, digest) -> Event, set once the upload finishes
+        self.active = 0
+        self.deduplicated = 0
+
+    def check_size(self, size):
+        """Raises AttachmentError if a file of `size` bytes is over the cap."""
+        if size > self.max_size:
+            raise AttachmentError(f"⚠️ Attachments can be at most {self.max_size / 1024 / 1024:g} MB.")
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, resolver=_PublicResolver() if self.public_only else None)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    @contextlib.asynccontextmanager
+    async def fetch(self, url):
+        """Downloads `url` and yields it as an Attachment, deleting it afterwards.
+
+        Holds one of the pipeline's slots until the block exits, so uploads
+        of the file count against the concurrency limit too.
+        """
+        async with self._slots:
+            self.active += 1
+            file = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+            try:
+                started = time.perf_counter()
+                try:
+                    attachment = await self._download(url, file)
+                except NotAnImage:
+                    metrics.ATTACHMENTS.inc(outcome="skipped")
+                    raise
+                except AttachmentError:
+                    metrics.ATTACHMENTS.inc(outcome="failed")
+                    raise
+                metrics.ATTACHMENT_DOWNLOAD.observe(time.perf_counter() - started)
+                metrics.ATTACHMENTS.inc(outcome="downloaded")
+                yield attachment
+            finally:
+                file.close()
+                self.active -= 1
+
+    async def _download(self, url, file):
+        session = self._get_session()
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                if self.public_only:
+                    validate_url(url)
+                async with session.get(url, allow_redirects=False) as response:
+                    if response.status in (301, 302, 303, 307, 308) and "Location" in response.headers:
+                        url = urljoin(url, response.headers["Location"])
+                        continue
+                    if response.status != 200:
+                        raise AttachmentError(f"⚠️ The attachment couldn't be downloaded (HTTP {response.status}).")
+                    if not (response.content_type or "").startswith("image/"):
+                        raise NotAnImage("⚠️ Only image attachments are re-hosted.")
+                    if response.content_length is not None:
+                        self.check_size(response.content_length)
+                    digest = hashlib.sha256()
+                    size = 0
+                    async for chunk in response.content.iter_chunked(ATTACHMENT_CHUNK_SIZE):
+                        size += len(chunk)
+                        self.check_size(size)
+                        digest.update(chunk)
+                        file.write(chunk)
+                    return Attachment(file, _filename(url, response.content_type), response.content_type, size, digest.hexdigest())
+            raise AttachmentError("⚠️ The attachment link redirects too many times.")
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            raise AttachmentError(f"⚠️ The attachment couldn't be downloaded: {e}") from e
+
+    async def upload_once(self, channel, attachment, content=None):
+        """Uploads a file to a channel unless the same bytes are already there.
+
+        Returns the jump URL of the message holding the file.
+        """
+        key = (channel.id, attachment.digest)
+        while True:
+            url = self._uploaded.get(key)
+            if url is not MISSING:
+                self.deduplicated += 1
+                return url
+            uploading = self._uploading.get(key)
+            if uploading is None:
+                break
+            await uploading.wait()  # If that upload failed, try it ourselves
+
+        uploading = self._uploading[key] = asyncio.Event()
+        try:
+            message = await channel.send(content=content, file=attachment.to_file())
+            self._uploaded.set(key, message.jump_url)
+            return message.jump_url
+        finally:
+            del self._uploading[key]
+            uploading.set()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,50 @@
+import time
+import asyncio
+from collections import deque
+
+# --- Background Tasks ---
+# Work that doesn't affect what the user sees (map saves, button cleanup,
+# logging) runs after the user has been answered. Tasks are tracked so they
+# can't be garbage collected mid-flight, and failures are kept for inspection
+# instead of disappearing into "Task exception was never retrieved".
+
+class BackgroundTasks:
+    """Runs fire-and-forget coroutines as tracked tasks and records failures."""
+
+    def __init__(self, max_failures=100):
+        self._tasks = set()
+        self.failures = deque(maxlen=max_failures)  # (timestamp, name, error)
+        self.completed = 0
+        self.failed = 0
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def spawn(self, name, coro):
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            self.completed += 1
+            return
+        self.failed += 1
+        self.failures.append((time.time(), task.get_name(), repr(error)))
+        print(f"Background task {task.get_name()} failed: {error!r}")
+
+    def stats(self):
+        return {"running": len(self._tasks), "completed": self.completed, "failed": self.failed}
+
+    async def drain(self, timeout=10.0):
+        """Waits for running tasks to finish, cancelling any that overrun."""
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(list(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
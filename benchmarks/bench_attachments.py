@@ -0,0 +1,123 @@
+"""Memory, latency and upload volume of re-hosting confession attachments.
+
+Serves files from a local aiohttp server, throttled to a given bandwidth,
+and posts a burst of confessions that carry them, some sharing the same
+file. Compares the old-style approach (read each file whole into memory
+before posting, then upload it to the confession and the log) with
+attachments.AttachmentPipeline running after the post. Reports the time
+until the confession is posted, the peak of Python-allocated memory, and
+the bytes uploaded to Discord. Run from the repository root:
+
+    python -m benchmarks.bench_attachments --submissions 50 --size 4 --duplicates 0.5
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import random
+import time
+import tracemalloc
+
+import aiohttp
+import discord
+from aiohttp import web
+
+from attachments import AttachmentPipeline
+from benchmarks.bench_e2e import percentile
+from benchmarks.fakes import FakeBot, FakeDatabase, RestClient
+from storage import MongoStorage
+
+CHUNK = 64 * 1024
+
+async def start_file_server(size, bandwidth):
+    """Serves /<n> as `size` bytes derived from n, at `bandwidth` bytes per second."""
+    async def serve(request):
+        seed = hashlib.sha256(request.match_info["name"].encode()).digest()
+        block = (seed * (CHUNK // len(seed) + 1))[:CHUNK]
+        response = web.StreamResponse(headers={"Content-Type": "image/png", "Content-Length": str(size)})
+        await response.prepare(request)
+        for start in range(0, size, CHUNK):
+            await response.write(block[:min(CHUNK, size - start)])
+            await asyncio.sleep(CHUNK / bandwidth)
+        return response
+
+    app = web.Application()
+    app.router.add_get("/{name}", serve)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+async def buffered(bot, session, channel, log_channel, url):
+    """Downloads the whole file before posting, then uploads it twice."""
+    async with session.get(url) as response:
+        data = await response.read()
+    message = await channel.send(embed=discord.Embed(title="confession"))
+    posted = time.perf_counter()
+    await message.edit(attachments=[discord.File(io.BytesIO(data), filename="file.png")])
+    await log_channel.send(file=discord.File(io.BytesIO(data), filename="file.png"))
+    return posted
+
+async def pipelined(bot, session, channel, log_channel, url):
+    """Posts straight away; the pipeline re-hosts the file afterwards."""
+    message = await channel.send(embed=discord.Embed(title="confession"))
+    posted = time.perf_counter()
+
+    async def rehost():
+        async with bot.attachments.fetch(url) as attachment:
+            await message.edit(attachments=[attachment.to_file()])
+            await bot.attachments.upload_once(log_channel, attachment)
+    bot.background.spawn(f"rehost:{url}:{message.id}", rehost())
+    return posted
+
+async def run(args, mode):
+    runner, base = await start_file_server(int(args.size * 1024 * 1024), args.bandwidth * 1024 * 1024)
+    rest = RestClient(latency=args.rest_latency)
+    bot = FakeBot(MongoStorage(FakeDatabase()), rest, attachments=AttachmentPipeline(max_size=64 * 1024 * 1024, public_only=False))
+    guild = bot.create_guild()
+    channel = guild.create_text_channel("confessions")
+    log_channel = guild.create_text_channel("confession-logs")
+    rng = random.Random(0)
+    distinct = max(1, round(args.submissions * (1 - args.duplicates)))
+    urls = [f"{base}/{rng.randrange(distinct)}" for _ in range(args.submissions)]
+    post = buffered if mode == "buffered" else pipelined
+    latencies = []
+
+    async with aiohttp.ClientSession() as session:
+        tracemalloc.start()
+        started = time.perf_counter()
+
+        async def one(url):
+            submitted = time.perf_counter()
+            latencies.append(await post(bot, session, channel, log_channel, url) - submitted)
+
+        await asyncio.gather(*(one(url) for url in urls))
+        await bot.background.drain()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    await bot.close()
+    await runner.cleanup()
+    return latencies, peak, elapsed, rest.uploaded_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=50)
+    parser.add_argument("--size", type=float, default=4, help="file size in MB")
+    parser.add_argument("--duplicates", type=float, default=0.5, help="fraction of submissions reusing an earlier file")
+    parser.add_argument("--bandwidth", type=float, default=50, help="download speed per file in MB/s")
+    parser.add_argument("--rest-latency", type=float, default=0.08)
+    args = parser.parse_args()
+
+    print(f"{args.submissions} confessions with {args.size:g} MB attachments, {args.duplicates:.0%} duplicates, "
+          f"{args.bandwidth:g} MB/s per download")
+    print(f"{'mode':<10}{'post p50 ms':>12}{'post p99 ms':>12}{'peak MB':>9}{'uploaded MB':>13}{'total s':>9}")
+    for mode in ("buffered", "pipeline"):
+        latencies, peak, elapsed, uploaded = asyncio.run(run(args, mode))
+        print(f"{mode:<10}{percentile(latencies, 0.5) * 1000:>12.0f}{percentile(latencies, 0.99) * 1000:>12.0f}"
+              f"{peak / 1024 / 1024:>9.1f}{uploaded / 1024 / 1024:>13.1f}{elapsed:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Ban checks on the submission path, for guilds with large ban lists.
+
+Compares asking the backend on every submission (one indexed read each)
+with the in-memory ban set in database.py, which loads a guild's bans once
+and then answers with a dict lookup. Reports the one-off load, the memory
+the set takes and the per-check latency. With the Mongo stand-in, the load
+time is mostly the stand-in copying documents. Run from the repository root:
+
+    python -m benchmarks.bench_bans --bans 1000 10000 100000 --checks 5000
+    python -m benchmarks.bench_bans --backend sqlite
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import database as db
+from benchmarks.bench_e2e import percentile
+from benchmarks.storage_conformance import BACKENDS, open_backend
+
+GUILD_ID = 1
+
+async def per_check_query(storage, guild_id, user_id):
+    return await storage.get_ban(guild_id, user_id) is not None
+
+async def time_checks(check, storage, user_ids):
+    samples = []
+    banned = 0
+    for user_id in user_ids:
+        started = time.perf_counter()
+        banned += await check(storage, GUILD_ID, user_id)
+        samples.append(time.perf_counter() - started)
+    return samples, banned
+
+async def run(args, ban_count):
+    async with open_backend(args.backend, args) as storage:
+        mongo = storage.mongo if args.backend == "mongo" and not args.mongo_uri else None
+        if mongo is not None:
+            mongo.latency = 0  # seed without simulated round trips
+        for user_id in range(1, ban_count + 1):
+            await storage.add_ban(GUILD_ID, user_id, {"reason": "bench"})
+        if mongo is not None:
+            mongo.latency = args.mongo_latency
+
+        # Half the submissions come from banned users.
+        rng = random.Random(ban_count)
+        user_ids = [rng.randint(1, ban_count * 2) for _ in range(args.checks)]
+
+        db.ban_cache.clear()
+        started = time.perf_counter()
+        await db.is_banned(storage, GUILD_ID, 0)
+        load = time.perf_counter() - started
+        bans = db.ban_cache.peek(GUILD_ID)
+        set_bytes = sys.getsizeof(bans) + sum(sys.getsizeof(user_id) for user_id in bans)
+
+        results = [
+            ("query per check", *await time_checks(per_check_query, storage, user_ids)),
+            ("in-memory set", *await time_checks(db.is_banned, storage, user_ids)),
+        ]
+    return load, set_bytes, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bans", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--checks", type=int, default=2000)
+    parser.add_argument("--backend", choices=BACKENDS, default="mongo")
+    parser.add_argument("--mongo-uri", help="use a real mongod instead of the stand-in")
+    parser.add_argument("--mongo-latency", type=float, default=0.001, help="stand-in round trip in seconds")
+    args = parser.parse_args()
+
+    print(f"backend {args.backend}, {args.checks} checks per guild"
+          + (f", {args.mongo_latency * 1000:.1f} ms per round trip" if args.backend == "mongo" and not args.mongo_uri else ""))
+    for ban_count in args.bans:
+        load, set_bytes, results = asyncio.run(run(args, ban_count))
+        print(f"{ban_count} bans: set loaded in {load * 1000:.1f} ms, ~{set_bytes / 1024 / 1024:.1f} MB")
+        for label, samples, banned in results:
+            print(f"  {label:<16} p50 {percentile(samples, 0.5) * 1e6:9.1f} us  p99 {percentile(samples, 0.99) * 1e6:9.1f} us"
+                  f"  {len(samples) / sum(samples):10.0f} checks/sec  ({banned} banned)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""/checklogs page latency for a prolific user in a large guild.
+
+Seeds one guild's audit records into the SQLite backend, with one user
+behind a given share of them, then times fetching that user's pages at
+increasing depths two ways: skip/limit (ORDER BY ... LIMIT ? OFFSET ?, the
+shape of a find().skip().limit()) and the keyset pagination /checklogs
+uses ("posted before the last message shown"). Both run on the same
+(guild_id, user_id, message_id) index. Run from the repository root:
+
+    python -m benchmarks.bench_checklogs --records 1000000 --user-share 0.1
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+import database as db
+from benchmarks.bench_e2e import percentile
+from storage import SQLiteStorage, _AUDIT_SELECT, _audit_row
+
+GUILD_ID = 1
+USER_ID = 5
+SEED_BATCH = 50_000
+
+async def seed(storage, args):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    every = max(1, round(1 / args.user_share))
+    for start in range(1, args.records + 1, SEED_BATCH):
+        await storage.add_audit_records([
+            {"guild_id": GUILD_ID, "index": index, "user_id": USER_ID if index % every == 0 else 1000 + index % 5000,
+             "type": "original", "channel_id": 10, "message_id": index, "created_at": now}
+            for index in range(start, min(start + SEED_BATCH, args.records + 1))
+        ])
+    return args.records // every
+
+async def offset_page(storage, page):
+    sql = f"{_AUDIT_SELECT} WHERE guild_id = ? AND user_id = ? ORDER BY message_id DESC LIMIT ? OFFSET ?"
+    params = (GUILD_ID, USER_ID, db.AUDIT_PAGE_SIZE, page * db.AUDIT_PAGE_SIZE)
+    rows = await storage._run(lambda: storage._connect().execute(sql, params).fetchall())
+    return [_audit_row(row) for row in rows]
+
+async def time_pages(fetch, depths, repeat):
+    results = {}
+    for depth in depths:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await fetch(depth)
+            samples.append(time.perf_counter() - started)
+        results[depth] = percentile(samples, 0.5)
+    return results
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(os.path.join(directory, "bench.sqlite3"))
+        await storage.ensure_schema()
+        started = time.perf_counter()
+        user_records = await seed(storage, args)
+        print(f"seeded {args.records} records ({user_records} by the user) in {time.perf_counter() - started:.1f}s")
+        pages = user_records // db.AUDIT_PAGE_SIZE
+        depths = sorted({0, 10, 100, pages // 2, pages - 1} & set(range(pages)))
+
+        # The keyset cursor for page N is the last message ID on page N-1.
+        cursors = {}
+        before = None
+        for page in range(pages):
+            if page in depths:
+                cursors[page] = before
+            records = await db.get_submission_page(storage, GUILD_ID, USER_ID, before)
+            before = records[-1]["message_id"]
+
+        for page in depths:
+            assert await offset_page(storage, page) == await db.get_submission_page(storage, GUILD_ID, USER_ID, cursors[page])
+        offset = await time_pages(lambda page: offset_page(storage, page), depths, args.repeat)
+        keyset = await time_pages(lambda page: db.get_submission_page(storage, GUILD_ID, USER_ID, cursors[page]), depths, args.repeat)
+        await storage.close()
+    return depths, offset, keyset
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000, help="audit records in the guild")
+    parser.add_argument("--user-share", type=float, default=0.1, help="fraction of them sent by the user being checked")
+    parser.add_argument("--repeat", type=int, default=50, help="fetches per page depth")
+    args = parser.parse_args()
+
+    depths, offset, keyset = asyncio.run(run(args))
+    print(f"{'page':>8}{'skip/limit ms':>15}{'keyset ms':>11}")
+    for depth in depths:
+        print(f"{depth + 1:>8}{offset[depth] * 1000:>15.3f}{keyset[depth] * 1000:>11.3f}")
+
+if __name__ == "__main__":
+    main()
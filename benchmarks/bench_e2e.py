@@ -0,0 +1,190 @@
+"""Offline end-to-end benchmarks for the confession and reply paths.
+
+Drives ConfessionModal.on_submit, ReplyModal.on_submit and the /confess
+command against the fake Discord layer in benchmarks/fakes.py, backed by the
+in-memory Mongo stand-in or, with --mongo-uri, a local mongod. Latency is
+measured from the start of the handler until the user's followup is sent.
+DB and REST calls include the background work each submission triggers.
+Run from the repository root:
+
+    python -m benchmarks.bench_e2e --scenario all --submissions 200 --concurrency 10
+    python -m benchmarks.bench_e2e --scenario reply --rate-limit-ratio 0.05
+    python -m benchmarks.bench_e2e --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.bench_e2e --write-behind
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+from pymongo import monitoring
+
+import database as db
+from cogs.confess import Confess, ConfessionModal, ReplyModal
+from benchmarks.fakes import FakeBot, FakeDatabase, FakeInteraction, FakeUser, RestClient
+from storage import MongoStorage
+
+SCENARIOS = ("modal", "command", "reply", "reply_index")
+BENCH_DB_NAME = "confession_bench"
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to a real mongod."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def started(self, event):
+        self.calls += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def reset_module_state():
+    db.ban_cache.clear()
+    for cache in db._CONFIG_CACHES.values():
+        cache.clear()
+    db._index_blocks.clear()
+    db._index_locks.clear()
+    db._pending_writes.clear()
+    db._pending_by_message.clear()
+    del db._pending_audit[:]
+    for task in (db._flush_task, db._batch_flush_task):
+        if task is not None:
+            task.cancel()
+    db._flush_task = db._batch_flush_task = None
+    db._flush_lock = asyncio.Lock()
+
+async def open_database(args):
+    """Returns (database, call_counter, cleanup) for the configured backend."""
+    if not args.mongo_uri:
+        fake_db = FakeDatabase(latency=args.db_latency)
+        return MongoStorage(fake_db), lambda: fake_db.calls, None
+
+    import motor.motor_asyncio
+    counter = CommandCounter()
+    client = motor.motor_asyncio.AsyncIOMotorClient(args.mongo_uri, event_listeners=[counter])
+    await client.drop_database(BENCH_DB_NAME)
+    database = MongoStorage(client[BENCH_DB_NAME])
+    await db.ensure_indexes(database)
+
+    async def cleanup():
+        await client.drop_database(BENCH_DB_NAME)
+        client.close()
+    return database, lambda: counter.calls, cleanup
+
+async def submit(bot, scenario, guild, channel, user, number, seed_message):
+    """Runs one submission and returns its interaction."""
+    text = f"submission number {number}"
+    if scenario == "modal":
+        interaction = FakeInteraction(guild, user, channel=channel)
+        modal = ConfessionModal(bot)
+        modal.content._value = text
+        await modal.on_submit(interaction)
+    elif scenario == "command":
+        interaction = FakeInteraction(guild, user, channel=channel)
+        cog = Confess(bot)
+        await cog.confess.callback(cog, interaction, confess=text)
+    else:
+        interaction = FakeInteraction(guild, user, channel=channel, message=seed_message)
+        modal = ReplyModal(bot)
+        modal.reply._value = text
+        if scenario == "reply_index":
+            modal.confession_to_reply_to._value = str(seed_message.index)
+        await modal.on_submit(interaction)
+    return interaction
+
+async def run_scenario(args, scenario):
+    reset_module_state()
+    database, db_calls, cleanup = await open_database(args)
+    rest = RestClient(latency=args.rest_latency)
+    bot = FakeBot(database, rest)
+    guild = bot.create_guild()
+    channel = guild.create_text_channel("confessions")
+    log_guild = bot.create_guild()
+    log_channel = log_guild.create_text_channel("confession-logs")
+    await db.set_confession_channel(bot.db, guild.id, channel.id)
+    await db.set_log_channel(bot.db, guild.id, log_guild.id, log_channel.id)
+
+    seed_message = None
+    if scenario.startswith("reply"):
+        # Replies need an existing confession to target.
+        await submit(bot, "modal", guild, channel, FakeUser(0), 0, None)
+        await bot.background.drain()
+        seed_message = max(channel._messages.values(), key=lambda message: message.id)
+        seed_message.index = 1
+
+    await bot.background.drain()
+    db_before, rest_before = db_calls(), rest.calls
+    rest.rate_limit_ratio = args.rate_limit_ratio
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(number):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            interaction = await submit(bot, scenario, guild, channel, FakeUser(number), number, seed_message)
+            latencies.append((interaction.answered_at or time.perf_counter()) - started)
+            if not interaction.replies or not str(interaction.replies[-1]).startswith(":white_check_mark:"):
+                errors += 1
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one(n) for n in range(1, args.submissions + 1)))
+        elapsed = time.perf_counter() - started
+        await bot.close()
+        await db.flush_writes(bot.db)
+    submissions = args.submissions
+    result = {
+        "scenario": scenario,
+        "rate": submissions / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "mean": statistics.mean(latencies),
+        "db_calls": (db_calls() - db_before) / submissions,
+        "rest_calls": (rest.calls - rest_before) / submissions,
+        "rate_limited": rest.rate_limited,
+        "errors": errors,
+    }
+    if cleanup:
+        await cleanup()
+    return result
+
+async def run_all(args):
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    return [await run_scenario(args, scenario) for scenario in scenarios]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rest-latency", type=float, default=0.08, help="simulated Discord REST round trip in seconds")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="simulated Mongo round trip in seconds (fake backend only)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="fraction of message sends that fail with 429")
+    parser.add_argument("--mongo-uri", help="benchmark against this mongod instead of the in-memory stand-in")
+    parser.add_argument("--write-behind", action="store_true", help="buffer confession_map writes (CONFESSION_WRITE_BEHIND=1)")
+    args = parser.parse_args()
+    db.WRITE_BEHIND = args.write_behind
+
+    backend = args.mongo_uri or f"in-memory Mongo ({args.db_latency * 1000:.0f} ms)"
+    print(f"{args.submissions} submissions per scenario, concurrency {args.concurrency}, "
+          f"REST {args.rest_latency * 1000:.0f} ms, {backend}")
+    print(f"{'scenario':<12}{'per sec':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db/op':>8}{'rest/op':>9}{'429s':>6}{'errors':>8}")
+    for r in asyncio.run(run_all(args)):
+        print(f"{r['scenario']:<12}{r['rate']:>9.1f}{r['p50'] * 1000:>9.1f}{r['p95'] * 1000:>9.1f}{r['p99'] * 1000:>9.1f}"
+              f"{r['db_calls']:>8.2f}{r['rest_calls']:>9.2f}{r['rate_limited']:>6}{r['errors']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Confessions/sec for index allocation on a single busy guild.
+
+Compares the old allocator (one ``$inc`` round trip per confession) with
+block reservation at a few block sizes. Run from the repository root:
+
+    python -m benchmarks.bench_index_alloc --confessions 2000 --latency 0.005
+"""
+import argparse
+import asyncio
+import time
+import pymongo
+
+import database as db
+from benchmarks.fakes import FakeDatabase
+from storage import MongoStorage
+
+GUILD_ID = 1
+
+async def legacy_next_index(storage, guild_id):
+    result = await storage.mongo.guild_counters.find_one_and_update(
+        {"_id": guild_id},
+        {"$inc": {"index": 1}},
+        upsert=True,
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+    return result.get("index", 1)
+
+async def run(allocate, confessions, concurrency, latency):
+    db._index_blocks.clear()
+    fake_db = FakeDatabase(latency=latency)
+    storage = MongoStorage(fake_db)
+    issued = []
+
+    async def worker(count):
+        for _ in range(count):
+            issued.append(await allocate(storage, GUILD_ID))
+
+    per_worker = confessions // concurrency
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    assert len(set(issued)) == len(issued), "duplicate indices were issued"
+    return len(issued) / elapsed, fake_db.calls
+
+async def run_all(args):
+    results = [("before (per-confession $inc)", await run(legacy_next_index, args.confessions, args.concurrency, args.latency))]
+    for block_size in args.block_sizes:
+        db.INDEX_BLOCK_SIZE = block_size
+        results.append((f"block size {block_size}", await run(db.get_next_confession_index, args.confessions, args.concurrency, args.latency)))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--confessions", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated Mongo round trip in seconds")
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=[10, 50])
+    args = parser.parse_args()
+
+    print(f"{args.confessions} confessions, concurrency {args.concurrency}, {args.latency * 1000:.1f} ms per round trip")
+    for label, (rate, calls) in asyncio.run(run_all(args)):
+        print(f"  {label:<30} {rate:10.0f} confessions/sec  {calls:6d} counter round trips")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Latency for quiet guilds while another guild is being raided.
+
+One guild submits a burst of confessions from many users at once while a
+number of quiet guilds keep submitting at a normal pace. Every submission
+needs a slot on a shared backend with limited concurrency, standing in for
+the Mongo pool and Discord's global rate limit. Compares running each
+submission straight away (the old behaviour) with the scheduler, with and
+without admission limits. Run from the repository root:
+
+    python -m benchmarks.bench_scheduler --raid 500 --quiet-guilds 20
+"""
+import argparse
+import asyncio
+import time
+
+from scheduler import SubmissionRejected, SubmissionScheduler
+from benchmarks.bench_e2e import percentile
+
+RAID_GUILD = 0
+
+class SharedBackend:
+    def __init__(self, capacity, latency):
+        self.slots = asyncio.Semaphore(capacity)
+        self.latency = latency
+
+    async def submit(self):
+        async with self.slots:
+            await asyncio.sleep(self.latency)
+
+async def run(args, mode):
+    backend = SharedBackend(args.capacity, args.latency)
+    if mode == "scheduler":
+        scheduler = SubmissionScheduler()
+    elif mode == "scheduler, no limits":
+        scheduler = SubmissionScheduler(user_rate=0, guild_rate=0, guild_queue=10**9)
+    else:
+        scheduler = None
+    results = {"raid": [], "quiet": [], "rejected": 0}
+
+    async def one(guild_id, user_id, label):
+        started = time.perf_counter()
+        try:
+            if scheduler is None:
+                await backend.submit()
+            else:
+                await scheduler.run(guild_id, user_id, backend.submit)
+        except SubmissionRejected:
+            results["rejected"] += 1
+            return
+        results[label].append(time.perf_counter() - started)
+
+    async def quiet_guild(guild_id):
+        for number in range(args.quiet_submissions):
+            await one(guild_id, number, "quiet")
+            await asyncio.sleep(args.quiet_interval)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(one(RAID_GUILD, user_id, "raid") for user_id in range(args.raid)),
+        *(quiet_guild(guild_id) for guild_id in range(1, args.quiet_guilds + 1)),
+    )
+    elapsed = time.perf_counter() - started
+    if scheduler is not None:
+        await scheduler.close()
+    return results, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--raid", type=int, default=500, help="submissions in the raid burst")
+    parser.add_argument("--quiet-guilds", type=int, default=20)
+    parser.add_argument("--quiet-submissions", type=int, default=5, help="submissions per quiet guild")
+    parser.add_argument("--quiet-interval", type=float, default=0.2, help="seconds between a quiet guild's submissions")
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent submissions the shared backend can serve")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds each submission holds a backend slot")
+    args = parser.parse_args()
+
+    print(f"raid of {args.raid}, {args.quiet_guilds} quiet guilds x {args.quiet_submissions}, "
+          f"backend capacity {args.capacity} x {args.latency * 1000:.0f} ms")
+    print(f"{'mode':<22}{'quiet p50 ms':>13}{'quiet p99 ms':>13}{'raid posted':>12}{'rejected':>10}{'total s':>9}")
+    for mode in ("unbounded", "scheduler, no limits", "scheduler"):
+        results, elapsed = asyncio.run(run(args, mode))
+        quiet = results["quiet"]
+        print(f"{mode:<22}{percentile(quiet, 0.5) * 1000:>13.1f}{percentile(quiet, 0.99) * 1000:>13.1f}"
+              f"{len(results['raid']):>12}{results['rejected']:>10}{elapsed:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Cold start time from login to ready, with simulated Discord and Mongo latency.
+
+Runs ConfessionBot's startup against the in-memory Mongo stand-in, with
+sleeps standing in for the HTTP login and the gateway handshake. Compares
+the old sequence (create indexes one by one, then load cogs one by one,
+then connect; read the command tree hash in on_ready) with the current
+one, where the database warms up alongside the cog loads and the gateway.
+Prints the startup report for the current sequence. Run from the
+repository root:
+
+    python -m benchmarks.bench_startup --db-latency 0.02 --gateway-latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import time
+from unittest import mock
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("DISCORD_TOKEN", "bench")
+
+import database as db
+import main as bot_main
+import memory
+from benchmarks.bench_e2e import reset_module_state
+from benchmarks.fakes import FakeDatabase
+from storage import MongoStorage
+
+async def sequential_schema(storage):
+    """ensure_schema as it used to run, one create_index after another."""
+    async def gather_in_turn(*coroutines):
+        return [await coroutine for coroutine in coroutines]
+    with mock.patch.object(asyncio, "gather", gather_in_turn):
+        await storage.ensure_schema()
+
+def new_bot(args):
+    bot = bot_main.ConfessionBot(command_prefix="!", help_command=None, **memory.client_options())
+    bot.db = MongoStorage(FakeDatabase(latency=args.db_latency))
+
+    async def sync():
+        await asyncio.sleep(args.login_latency)
+        return []
+    bot.tree.sync = sync
+    return bot
+
+async def old_startup(bot, args):
+    """The sequence before startup was reworked."""
+    await asyncio.sleep(args.login_latency)
+    await sequential_schema(bot.db)
+    for filename in sorted(os.listdir("cogs")):
+        if filename.endswith(".py"):
+            await bot.load_extension(f"cogs.{filename[:-3]}")
+    await asyncio.sleep(args.gateway_latency)
+    await bot.sync_commands()
+
+async def new_startup(bot, args):
+    """ConfessionBot's own login -> setup_hook -> gateway -> on_ready path."""
+    bot._login_started = time.perf_counter()
+    await asyncio.sleep(args.login_latency)
+    await bot.setup_hook()
+    await asyncio.sleep(args.gateway_latency)
+    bot.startup.record("gateway", bot._gateway_started)
+    await bot.warmup
+    with bot.startup.phase("command_sync"):
+        await bot.sync_commands()
+    bot.startup.ready()
+
+async def run(args, mode, tree_hash):
+    reset_module_state()
+    bot = new_bot(args)
+    await bot._async_setup_hook() # What `async with bot` does before login
+    if tree_hash:
+        await db.set_command_tree_hash(bot.db, tree_hash) # A restart, so the tree is unchanged
+    started = time.perf_counter()
+    await (old_startup if mode == "old" else new_startup)(bot, args)
+    elapsed = time.perf_counter() - started
+    for task in (bot.warmup, bot.config_watcher, bot.spool_replayer):
+        if task:
+            task.cancel()
+    return elapsed, bot
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-latency", type=float, default=0.02, help="Mongo round trip in seconds")
+    parser.add_argument("--login-latency", type=float, default=0.2, help="HTTP login in seconds")
+    parser.add_argument("--gateway-latency", type=float, default=1.0, help="gateway handshake until READY in seconds")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    async def bench():
+        _, primer = await run(args, "new", None)
+        tree_hash = primer.command_tree_hash()
+        results = {}
+        for mode in ("old", "new"):
+            samples = []
+            for _ in range(args.runs):
+                elapsed, bot = await run(args, mode, tree_hash)
+                samples.append(elapsed)
+            results[mode] = (min(samples), bot)
+        return results
+
+    results = asyncio.run(bench())
+    print(f"login {args.login_latency * 1000:.0f} ms, gateway {args.gateway_latency * 1000:.0f} ms, "
+          f"Mongo {args.db_latency * 1000:.0f} ms per round trip")
+    for mode, (elapsed, _) in results.items():
+        print(f"{mode:<4} login to ready {elapsed * 1000:7.0f} ms")
+    results["new"][1].startup.emit()
+
+if __name__ == "__main__":
+    main()
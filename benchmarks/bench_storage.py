@@ -0,0 +1,61 @@
+"""Per-operation latency of each storage backend.
+
+Times the calls the confession path makes (config read, block reservation,
+map upsert and lookups, a write-behind batch) directly against each backend.
+The Mongo numbers come from the in-memory stand-in with a simulated round
+trip (--mongo-latency), or from a real mongod with --mongo-uri. Run from the
+repository root:
+
+    python -m benchmarks.bench_storage --ops 2000
+    python -m benchmarks.bench_storage --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.bench_e2e import percentile
+from benchmarks.storage_conformance import BACKENDS, open_backend
+
+GUILD_ID = 1
+BULK_SIZE = 100
+
+async def timed(samples, name, call):
+    started = time.perf_counter()
+    await call
+    samples.setdefault(name, []).append(time.perf_counter() - started)
+
+async def run_backend(name, args):
+    samples = {}
+    async with open_backend(name, args) as storage:
+        await storage.update_config("guild_config", GUILD_ID, {"channel_id": 10})
+        for i in range(1, args.ops + 1):
+            fields = {"channel_id": 10, "message_id": 10_000 + i, "type": "confession", "content": f"confession {i}", "preview": f"confession {i}"}
+            await timed(samples, "get_config", storage.get_config("guild_config", GUILD_ID))
+            await timed(samples, "reserve_indices", storage.reserve_indices(GUILD_ID, 1))
+            await timed(samples, "update_map", storage.update_map(GUILD_ID, i, fields, upsert=True))
+            await timed(samples, "get_map", storage.get_map(GUILD_ID, i))
+            await timed(samples, "get_map_by_message", storage.get_map_by_message(GUILD_ID, 10_000 + i))
+        for batch in range(args.ops // BULK_SIZE):
+            updates = [(GUILD_ID, index, {"thread_id": 50_000 + index}, False)
+                       for index in range(batch * BULK_SIZE + 1, (batch + 1) * BULK_SIZE + 1)]
+            await timed(samples, f"bulk_update_map x{BULK_SIZE}", storage.bulk_update_map(updates))
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=1000, help="iterations per operation")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--mongo-uri", help="time a real mongod instead of the stand-in")
+    parser.add_argument("--mongo-latency", type=float, default=0.0005, help="stand-in round trip in seconds")
+    args = parser.parse_args()
+
+    if not args.mongo_uri:
+        print(f"mongo: in-memory stand-in, {args.mongo_latency * 1000:.2f} ms per round trip")
+    print(f"{'backend':<8} {'operation':<22} {'p50 ms':>9} {'p99 ms':>9} {'ops/sec':>10}")
+    for name in args.backends:
+        for operation, values in asyncio.run(run_backend(name, args)).items():
+            print(f"{name:<8} {operation:<22} {percentile(values, 0.5) * 1000:9.3f} {percentile(values, 0.99) * 1000:9.3f} "
+                  f"{len(values) / sum(values):10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+import asyncio
+import copy
+import datetime
+import itertools
+import random
+import time
+from types import SimpleNamespace
+
+import discord
+import pymongo
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+from attachments import AttachmentPipeline
+from background import BackgroundTasks
+from log_dispatcher import LogDispatcher
+from scheduler import SubmissionScheduler
+
+# --- In-memory Mongo stand-in ---
+# Implements the subset of Motor's collection API that database.py uses, with
+# an injectable per-call latency so round trips show up in the numbers.
+
+def _get_path(document, path):
+    for part in path.split("."):
+        if not isinstance(document, dict) or part not in document:
+            return None, False
+        document = document[part]
+    return document, True
+
+def _matches(document, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(document, sub) for sub in condition):
+                return False
+            continue
+        value, present = _get_path(document, key)
+        if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            for op, operand in condition.items():
+                if op == "$exists":
+                    if present != bool(operand):
+                        return False
+                elif op == "$in":
+                    if value not in operand:
+                        return False
+                elif op == "$ne":
+                    if value == operand:
+                        return False
+                elif not present or value is None:
+                    return False
+                elif op == "$gt" and not value > operand:
+                    return False
+                elif op == "$gte" and not value >= operand:
+                    return False
+                elif op == "$lt" and not value < operand:
+                    return False
+                elif op == "$lte" and not value <= operand:
+                    return False
+        elif isinstance(value, list) and not isinstance(condition, list):
+            if condition not in value:
+                return False
+        elif value != condition or not present:
+            return False
+    return True
+
+def _apply_update(document, update, inserting):
+    for op, fields in update.items():
+        for key, value in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                target = document
+                *parents, key = key.split(".")
+                for part in parents:
+                    target = target.setdefault(part, {})
+                target[key] = copy.deepcopy(value)
+            elif op == "$addToSet":
+                values = document.setdefault(key, [])
+                for item in value["$each"] if isinstance(value, dict) and "$each" in value else [value]:
+                    if item not in values:
+                        values.append(copy.deepcopy(item))
+            elif op == "$inc":
+                document[key] = document.get(key, 0) + value
+            elif op == "$max":
+                document[key] = max(document.get(key, value), value)
+            elif op == "$unset":
+                document.pop(key, None)
+            elif op == "$currentDate":
+                document[key] = datetime.datetime.now(datetime.timezone.utc)
+
+class FakeUpdateResult:
+    def __init__(self, matched_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = matched_count
+        self.upserted_id = upserted_id
+
+class FakeCursor:
+    def __init__(self, collection, query, projection=None):
+        self._collection = collection
+        self._query = query
+        self._projection = projection or {}
+        self._sort = []
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = key if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        return [document async for document in self]
+
+    async def __aiter__(self):
+        await self._collection._round_trip()
+        documents = [d for d in self._collection._documents.values() if _matches(d, self._query)]
+        for key, direction in reversed(self._sort):
+            documents.sort(key=lambda d: _get_path(d, key)[0], reverse=direction == pymongo.DESCENDING)
+        if self._limit:
+            documents = documents[:self._limit]
+        for document in documents:
+            document = copy.deepcopy(document)
+            if self._projection.get("_id") == 0:
+                del document["_id"]
+            yield document
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._documents = {}
+        self._next_id = 1
+
+    async def _round_trip(self):
+        await self.database._round_trip()
+
+    def _find(self, query):
+        if "_id" in query and not isinstance(query["_id"], dict):
+            document = self._documents.get(query["_id"])
+            return document if document is not None and _matches(document, query) else None
+        for document in self._documents.values():
+            if _matches(document, query):
+                return document
+        return None
+
+    def _upsert(self, query, update):
+        document = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        if "_id" not in document:
+            document["_id"] = self._next_id
+            self._next_id += 1
+        if document["_id"] in self._documents:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}")
+        _apply_update(document, update, inserting=True)
+        self._documents[document["_id"]] = document
+        return document
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        if sort:
+            async for document in self.find(query or {}).sort(sort).limit(1):
+                return document
+            return None
+        await self._round_trip()
+        document = self._find(query or {})
+        return copy.deepcopy(document) if document is not None else None
+
+    def find(self, query=None, projection=None, **kwargs):
+        return FakeCursor(self, query or {}, projection)
+
+    async def update_one(self, query, update, upsert=False):
+        await self._round_trip()
+        document = self._find(query)
+        if document is not None:
+            _apply_update(document, update, inserting=False)
+            return FakeUpdateResult(1)
+        if upsert:
+            return FakeUpdateResult(0, self._upsert(query, update)["_id"])
+        return FakeUpdateResult(0)
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=pymongo.ReturnDocument.BEFORE, **kwargs):
+        await self._round_trip()
+        document = self._find(query)
+        if document is not None:
+            before = copy.deepcopy(document)
+            _apply_update(document, update, inserting=False)
+            return copy.deepcopy(document) if return_document == pymongo.ReturnDocument.AFTER else before
+        if upsert:
+            document = self._upsert(query, update)
+            return copy.deepcopy(document) if return_document == pymongo.ReturnDocument.AFTER else None
+        return None
+
+    async def bulk_write(self, requests, ordered=True):
+        await self._round_trip()
+        for request in requests:
+            document = self._find(request._filter)
+            if document is not None:
+                _apply_update(document, request._doc, inserting=False)
+            elif request._upsert:
+                self._upsert(request._filter, request._doc)
+
+    async def delete_one(self, query):
+        await self._round_trip()
+        document = self._find(query)
+        if document is not None:
+            del self._documents[document["_id"]]
+        return SimpleNamespace(deleted_count=int(document is not None))
+
+    async def delete_many(self, query):
+        await self._round_trip()
+        documents = [d for d in self._documents.values() if _matches(d, query)]
+        for document in documents:
+            del self._documents[document["_id"]]
+        return SimpleNamespace(deleted_count=len(documents))
+
+    async def count_documents(self, query):
+        await self._round_trip()
+        return sum(1 for document in self._documents.values() if _matches(document, query))
+
+    async def create_index(self, keys, **kwargs):
+        await self._round_trip()
+
+class FakeDatabase:
+    """An in-memory stand-in for a Motor database."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.down = False  # set to simulate an outage
+        self._collections = {}
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = FakeCollection(self, name)
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, name, *args, **kwargs):
+        await self._round_trip()
+        return {"ok": 1}
+
+    async def _round_trip(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.down:
+            raise ServerSelectionTimeoutError("fake outage")
+
+# --- Discord stand-ins ---
+# Just enough of discord.py's surface for the confession cogs. Every method
+# that would be a REST call goes through RestClient so it is counted and can
+# be delayed.
+
+def FakeHTTPException(status, code=0, cls=discord.HTTPException):
+    """Builds a real discord.py HTTP exception without a real response."""
+    response = SimpleNamespace(status=status, reason="Fake")
+    return cls(response, {"code": code, "message": "fake error"})
+
+class RestClient:
+    def __init__(self, latency=0.0, rate_limit_ratio=0.0):
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.calls = 0
+        self.rate_limited = 0
+        self.uploaded_bytes = 0
+
+    async def round_trip(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def upload(self, files):
+        """Reads uploaded discord.Files the way a multipart request would."""
+        for file in files:
+            self.uploaded_bytes += len(file.fp.read())
+
+    def maybe_rate_limit(self):
+        """Raises a 429 for the configured fraction of message sends."""
+        if self.rate_limit_ratio and random.random() < self.rate_limit_ratio:
+            self.rate_limited += 1
+            raise FakeHTTPException(429)
+
+_snowflake = itertools.count(1_000_000_000_000_000_000)
+
+def next_snowflake():
+    return next(_snowflake)
+
+class FakeUser:
+    def __init__(self, user_id, name="user"):
+        self.id = user_id
+        self.name = name
+        self.bot = False
+
+    def __str__(self):
+        return self.name
+
+class FakePartialMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.guild = channel.guild
+        self.id = message_id
+
+    @property
+    def thread(self):
+        return self.guild.get_thread(self.id)
+
+    @property
+    def jump_url(self):
+        return f"https://discord.com/channels/{self.guild.id}/{self.channel.id}/{self.id}"
+
+    async def edit(self, **kwargs):
+        await self.channel.rest.round_trip()
+        message = self.channel._messages.get(self.id)
+        if message is None:
+            raise FakeHTTPException(404, cls=discord.NotFound)
+        message._apply_edit(kwargs)
+        return message
+
+    async def reply(self, embed=None, view=None, **kwargs):
+        return await self.channel.send(embed=embed, view=view, **kwargs)
+
+    async def create_thread(self, name):
+        await self.channel.rest.round_trip()
+        if self.thread is not None:
+            raise FakeHTTPException(400, code=160004)
+        thread = FakeThread(self.guild, self.channel, name, thread_id=self.id)
+        self.guild._add_channel(thread)
+        return thread
+
+class FakeMessage(FakePartialMessage):
+    def __init__(self, channel, author, embeds=None, view=None):
+        super().__init__(channel, next_snowflake())
+        self.author = author
+        self.embeds = list(embeds or [])
+        self.components = [SimpleNamespace(children=list(view.children))] if view else []
+
+    def _apply_edit(self, changes):
+        if "view" in changes:
+            view = changes["view"]
+            self.components = [SimpleNamespace(children=list(view.children))] if view else []
+        if "embed" in changes:
+            self.embeds = [changes["embed"]]
+
+    async def edit(self, **kwargs):
+        await self.channel.rest.round_trip()
+        self.channel.rest.upload(kwargs.get("attachments", []))
+        self._apply_edit(kwargs)
+        return self
+
+class FakeTextChannel:
+    def __init__(self, guild, name="confessions", channel_id=None):
+        self.id = channel_id or next_snowflake()
+        self.name = name
+        self.guild = guild
+        self.rest = guild.rest
+        self._messages = {}
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    @property
+    def threads(self):
+        return [t for t in self.guild._channels.values() if isinstance(t, FakeThread) and t.parent is self]
+
+    async def send(self, content=None, embed=None, embeds=None, view=None, **kwargs):
+        await self.rest.round_trip()
+        self.rest.maybe_rate_limit()
+        self.rest.upload([kwargs["file"]] if "file" in kwargs else [])
+        message = FakeMessage(self, self.guild.me, [embed] if embed else embeds, view)
+        self._messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id):
+        return FakePartialMessage(self, message_id)
+
+    async def fetch_message(self, message_id):
+        await self.rest.round_trip()
+        message = self._messages.get(message_id)
+        if message is None:
+            raise FakeHTTPException(404, cls=discord.NotFound)
+        return message
+
+    async def history(self, limit=100):
+        await self.rest.round_trip()
+        for message in sorted(self._messages.values(), key=lambda m: m.id, reverse=True)[:limit]:
+            yield message
+
+class FakeThread(discord.Thread):
+    """A discord.Thread subclass so the cogs' isinstance checks still hold."""
+
+    def __init__(self, guild, parent, name, thread_id=None):
+        self.id = thread_id or next_snowflake()
+        self.name = name
+        self.guild = guild
+        self.parent_id = parent.id
+        self.archived = False
+        self.locked = False
+        self.rest = guild.rest
+        self._parent = parent
+        self._messages = {}
+
+    def __repr__(self):
+        return f"<FakeThread id={self.id} name={self.name!r}>"
+
+    @property
+    def parent(self):
+        return self._parent
+
+    async def edit(self, archived=None, **kwargs):
+        await self.rest.round_trip()
+        if archived is not None:
+            self.archived = archived
+        return self
+
+    send = FakeTextChannel.send
+    get_partial_message = FakeTextChannel.get_partial_message
+    fetch_message = FakeTextChannel.fetch_message
+    history = FakeTextChannel.history
+
+class FakeGuild:
+    def __init__(self, rest, guild_id=None, me=None):
+        self.id = guild_id or next_snowflake()
+        self.rest = rest
+        self.me = me
+        self._channels = {}
+
+    def _add_channel(self, channel):
+        self._channels[channel.id] = channel
+        return channel
+
+    def create_text_channel(self, name="confessions"):
+        return self._add_channel(FakeTextChannel(self, name))
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def get_thread(self, thread_id):
+        channel = self._channels.get(thread_id)
+        return channel if isinstance(channel, FakeThread) else None
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, **kwargs):
+        await self._interaction.rest.round_trip()
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        await self._interaction.rest.round_trip()
+        self._done = True
+        self._interaction.answered_at = time.perf_counter()
+        self._interaction.replies.append(content)
+
+    async def send_modal(self, modal):
+        await self._interaction.rest.round_trip()
+        self._done = True
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        await self._interaction.rest.round_trip()
+        if self._interaction.answered_at is None:
+            self._interaction.answered_at = time.perf_counter()
+        self._interaction.replies.append(content)
+
+class FakeInteraction:
+    def __init__(self, guild, user, channel=None, message=None):
+        self.rest = guild.rest
+        self.guild = guild
+        self.user = user
+        self.channel = channel
+        self.message = message
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.answered_at = None
+        self.replies = []
+
+class FakeBot:
+    """A stand-in for ConfessionBot wired to fake REST and Mongo layers."""
+
+    def __init__(self, db, rest, scheduler=None, attachments=None):
+        self.db = db
+        self.rest = rest
+        # No admission limits unless a benchmark asks for them.
+        self.scheduler = scheduler or SubmissionScheduler(user_rate=0, guild_rate=0, guild_queue=10**9)
+        self.user = FakeUser(next_snowflake(), "Confessions")
+        self.user.bot = True
+        self._guilds = {}
+        self.log_dispatcher = LogDispatcher(flush_interval=0.05)
+        self.background = BackgroundTasks()
+        # Benchmarks serve attachments from localhost.
+        self.attachments = attachments or AttachmentPipeline(public_only=False)
+
+    def create_guild(self):
+        guild = FakeGuild(self.rest, me=self.user)
+        self._guilds[guild.id] = guild
+        return guild
+
+    def get_guild(self, guild_id):
+        return self._guilds.get(guild_id)
+
+    def get_channel(self, channel_id):
+        for guild in self._guilds.values():
+            channel = guild.get_channel(channel_id)
+            if channel is not None:
+                return channel
+        return None
+
+    async def fetch_channel(self, channel_id):
+        await self.rest.round_trip()
+        channel = self.get_channel(channel_id)
+        if channel is None:
+            raise FakeHTTPException(404, cls=discord.NotFound)
+        return channel
+
+    async def close(self):
+        await self.scheduler.close()
+        await self.background.drain()
+        await self.attachments.close()
+        await self.log_dispatcher.close()
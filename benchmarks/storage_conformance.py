@@ -0,0 +1,311 @@
+"""Conformance checks for the storage backends in storage.py.
+
+Runs the same checks against every backend, each on a fresh store: memory,
+SQLite (in a temporary file) and Mongo (the in-memory stand-in, or a real
+mongod with --mongo-uri). Exits non-zero if any check fails. pytest runs
+the same checks through tests/test_storage_conformance.py. Run from the
+repository root:
+
+    python -m benchmarks.storage_conformance
+    python -m benchmarks.storage_conformance --backends sqlite --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import os
+import sys
+import tempfile
+import traceback
+
+import database as db
+from storage import MemoryStorage, MongoStorage, SQLiteStorage
+from benchmarks.fakes import FakeDatabase
+
+BACKENDS = ("memory", "sqlite", "mongo")
+CONFORMANCE_DB_NAME = "confession_conformance"
+GUILD_ID = 1
+OTHER_GUILD_ID = 2
+
+def _entry(document):
+    """Drops the backend's own keys, leaving what every backend must return."""
+    return {key: value for key, value in document.items() if key != "_id"} if document else document
+
+# --- Checks ---
+async def check_config(storage):
+    assert await storage.get_config("guild_config", GUILD_ID) is None
+    document = await storage.update_config("guild_config", GUILD_ID, {"channel_id": 10})
+    assert document["_id"] == GUILD_ID and document["channel_id"] == 10 and document["updated_at"]
+    document = await storage.update_config("guild_config", GUILD_ID, {"retention_days": 30})
+    assert document["channel_id"] == 10 and document["retention_days"] == 30
+    stored = await storage.get_config("guild_config", GUILD_ID)
+    assert (stored["channel_id"], stored["retention_days"]) == (10, 30)
+    # The two config kinds are separate documents.
+    assert await storage.get_config("log_config", GUILD_ID) is None
+    await storage.update_config("log_config", GUILD_ID, {"target_guild_id": 5, "target_channel_id": 6})
+    assert (await storage.get_config("log_config", GUILD_ID))["target_channel_id"] == 6
+    assert "target_channel_id" not in await storage.get_config("guild_config", GUILD_ID)
+    await storage.update_config("guild_config", OTHER_GUILD_ID, {"channel_id": 20})
+    configs = [document async for document in storage.iter_configs("guild_config", batch_size=1)]
+    assert [(c["_id"], c["channel_id"]) for c in configs] == [(GUILD_ID, 10), (OTHER_GUILD_ID, 20)]
+    assert [c["_id"] async for c in storage.iter_configs("log_config")] == [GUILD_ID]
+
+async def check_counters(storage):
+    assert await storage.get_counter(GUILD_ID) is None
+    assert await storage.reserve_indices(GUILD_ID, 10) == 10
+    assert await storage.reserve_indices(GUILD_ID, 5) == 15
+    assert (await storage.get_counter(GUILD_ID))["index"] == 15
+    # Releasing only applies while the counter still ends at the block.
+    await storage.release_indices(GUILD_ID, 14, 11)
+    assert (await storage.get_counter(GUILD_ID))["index"] == 15
+    await storage.release_indices(GUILD_ID, 15, 12)
+    assert (await storage.get_counter(GUILD_ID))["index"] == 12
+    await storage.advance_counter(GUILD_ID, 8)
+    assert (await storage.get_counter(GUILD_ID))["index"] == 12
+    await storage.advance_counter(GUILD_ID, 40)
+    assert (await storage.get_counter(GUILD_ID))["index"] == 40
+    await storage.set_counter(GUILD_ID, 3)
+    assert await storage.reserve_indices(GUILD_ID, 1) == 4
+    await storage.advance_counter(OTHER_GUILD_ID, 7)
+    assert (await storage.get_counter(OTHER_GUILD_ID))["index"] == 7
+
+async def check_concurrent_reservations(storage):
+    results = await asyncio.gather(*(storage.reserve_indices(GUILD_ID, 3) for _ in range(50)))
+    assert sorted(results) == list(range(3, 151, 3)), "reservations overlapped"
+
+async def check_map(storage):
+    assert await storage.get_map(GUILD_ID, 1) is None
+    await storage.update_map(GUILD_ID, 1, {"channel_id": 10, "message_id": 100, "type": "confession", "content": "hi", "preview": "hi"}, upsert=True)
+    assert _entry(await storage.get_map(GUILD_ID, 1)) == {
+        "guild_id": GUILD_ID, "index": 1, "channel_id": 10, "message_id": 100, "type": "confession", "content": "hi", "preview": "hi",
+    }
+    # Without upsert, updates only touch existing entries.
+    await storage.update_map(GUILD_ID, 2, {"thread_id": 50}, upsert=False)
+    assert await storage.get_map(GUILD_ID, 2) is None
+    await storage.update_map(GUILD_ID, 1, {"thread_id": 50}, upsert=False)
+    entry = await storage.get_map(GUILD_ID, 1)
+    assert entry["thread_id"] == 50 and entry["content"] == "hi"
+    assert _entry(await storage.get_map_by_message(GUILD_ID, 100)) == _entry(entry)
+    assert await storage.get_map_by_message(OTHER_GUILD_ID, 100) is None
+    assert await storage.get_map(OTHER_GUILD_ID, 1) is None
+
+async def check_bulk_map(storage):
+    await storage.update_map(GUILD_ID, 3, {"channel_id": 10, "message_id": 103, "type": "confession"}, upsert=True)
+    await storage.bulk_update_map([
+        (GUILD_ID, 1, {"channel_id": 10, "message_id": 101, "type": "confession"}, True),
+        (GUILD_ID, 2, {"channel_id": 10, "message_id": 102, "type": "reply", "parent_index": 1}, True),
+        (GUILD_ID, 3, {"thread_id": 60}, False),
+        (GUILD_ID, 4, {"thread_id": 61}, False),
+        (OTHER_GUILD_ID, 1, {"channel_id": 20, "message_id": 201, "type": "confession"}, True),
+    ])
+    assert (await storage.get_map(GUILD_ID, 2))["parent_index"] == 1
+    assert (await storage.get_map(GUILD_ID, 3))["thread_id"] == 60
+    assert await storage.get_map(GUILD_ID, 4) is None
+    assert await storage.count_map(GUILD_ID) == 3
+    assert await storage.count_map(OTHER_GUILD_ID) == 1
+
+async def check_iter_map(storage):
+    # Inserted out of order, read back in index order across several batches.
+    for index in (5, 1, 4, 2, 3, 7, 6):
+        fields = {"channel_id": 10, "message_id": 100 + index, "type": "reply" if index == 2 else "confession"}
+        if index in (3, 6):
+            fields["thread_id"] = 500 + index
+        await storage.update_map(GUILD_ID, index, fields, upsert=True)
+    await storage.update_map(OTHER_GUILD_ID, 1, {"channel_id": 20, "message_id": 201, "type": "confession"}, upsert=True)
+    entries = [_entry(entry) async for entry in storage.iter_map(GUILD_ID, batch_size=2)]
+    assert [entry["index"] for entry in entries] == [1, 2, 3, 4, 5, 6, 7]
+    assert all(entry["guild_id"] == GUILD_ID for entry in entries)
+    without = [entry["index"] async for entry in storage.iter_map(GUILD_ID, batch_size=2, without_thread=True)]
+    assert without == [1, 4, 5, 7]
+
+async def check_meta(storage):
+    assert await storage.get_meta("command_tree") is None
+    await storage.set_meta("command_tree", {"hash": "a"})
+    await storage.set_meta("command_tree", {"hash": "b"})
+    assert (await storage.get_meta("command_tree"))["hash"] == "b"
+
+async def check_active_pointer(storage):
+    assert await storage.swap_active(GUILD_ID, 10, 100) is None
+    previous = await storage.swap_active(GUILD_ID, 10, 200)
+    assert (previous["channel_id"], previous["message_id"]) == (10, 100)
+    # An older message never takes the pointer back.
+    stale = await storage.swap_active(GUILD_ID, 11, 150)
+    assert (stale["channel_id"], stale["message_id"]) == (11, 150)
+    previous = await storage.swap_active(GUILD_ID, 10, 300)
+    assert previous["message_id"] == 200
+
+async def check_bans(storage):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    assert await storage.get_ban(GUILD_ID, 5) is None
+    ban = await storage.add_ban(GUILD_ID, 5, {"expires_at": None, "reason": "spam", "moderator_id": 9})
+    assert (ban["guild_id"], ban["user_id"], ban["expires_at"], ban["reason"], ban["moderator_id"]) == (GUILD_ID, 5, None, "spam", 9)
+    assert ban["created_at"].tzinfo is not None
+    await storage.add_ban(GUILD_ID, 6, {"expires_at": now + datetime.timedelta(days=1)})
+    await storage.add_ban(GUILD_ID, 7, {"expires_at": now - datetime.timedelta(seconds=1)})
+    await storage.add_ban(OTHER_GUILD_ID, 5, {})
+    # Expired bans are never returned.
+    assert await storage.get_ban(GUILD_ID, 7) is None
+    bans = {ban["user_id"]: ban async for ban in storage.iter_bans(GUILD_ID)}
+    assert sorted(bans) == [5, 6]
+    assert abs((bans[6]["expires_at"] - now).total_seconds() - 86400) < 1
+    # Banning again replaces the ban.
+    await storage.add_ban(GUILD_ID, 5, {"expires_at": now + datetime.timedelta(hours=1), "reason": "again"})
+    assert (await storage.get_ban(GUILD_ID, 5))["reason"] == "again"
+    assert await storage.remove_ban(GUILD_ID, 5)
+    assert not await storage.remove_ban(GUILD_ID, 5)
+    assert await storage.get_ban(GUILD_ID, 5) is None
+    assert await storage.clear_bans(GUILD_ID) >= 1
+    assert [ban async for ban in storage.iter_bans(GUILD_ID)] == []
+    assert (await storage.get_ban(OTHER_GUILD_ID, 5))["user_id"] == 5
+
+async def check_audit(storage):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    def record(guild_id, index, user_id):
+        return {"guild_id": guild_id, "index": index, "user_id": user_id, "type": "original",
+                "channel_id": 10, "message_id": 1000 + index, "created_at": now}
+    await storage.add_audit_records([record(GUILD_ID, index, 5 if index % 3 else 6) for index in range(1, 31)])
+    await storage.add_audit_records([record(OTHER_GUILD_ID, 1, 5)])
+    # Keyset pages: newest first, each starting below the last message ID shown.
+    page = await storage.find_audit_records(GUILD_ID, 5, limit=4)
+    assert [r["index"] for r in page] == [29, 28, 26, 25]
+    assert page[0]["message_id"] == 1029 and abs((page[0]["created_at"] - now).total_seconds()) < 1
+    page = await storage.find_audit_records(GUILD_ID, 5, before=page[-1]["message_id"], limit=4)
+    assert [r["index"] for r in page] == [23, 22, 20, 19]
+    assert [r["index"] for r in await storage.find_audit_records(GUILD_ID, 5, before=1003, limit=4)] == [2, 1]
+    assert await storage.find_audit_records(GUILD_ID, 5, before=1001) == []
+    assert await storage.find_audit_records(GUILD_ID, 7) == []
+    # Writing a record again replaces it, even if its user changed.
+    await storage.add_audit_records([{**record(GUILD_ID, 29, 6), "type": "reply"}])
+    assert [r["index"] for r in await storage.find_audit_records(GUILD_ID, 5, limit=1)] == [28]
+    assert [(r["index"], r["type"]) for r in await storage.find_audit_records(GUILD_ID, 6, limit=2)] == [(30, "original"), (29, "reply")]
+    assert [r["index"] async for r in storage.iter_audit_records(GUILD_ID, batch_size=7)] == list(range(1, 31))
+    # An index handed out again (after !count) gets a record of its own.
+    await storage.add_audit_records([{**record(GUILD_ID, 30, 5), "message_id": 2000}])
+    assert [(r["index"], r["message_id"]) for r in await storage.find_audit_records(GUILD_ID, 5, limit=2)] == [(30, 2000), (28, 1028)]
+    assert [r["message_id"] for r in await storage.find_audit_records(GUILD_ID, 6, limit=1)] == [1030]
+
+async def check_through_database_module(storage):
+    """The same calls the cogs make, end to end through database.py's caches."""
+    db._index_blocks.clear()
+    for cache in (db.guild_config_cache, db.log_config_cache, db.confession_map_cache, db._message_index_cache):
+        cache.clear()
+    await db.ensure_indexes(storage)
+    await db.set_confession_channel(storage, GUILD_ID, 10)
+    db.guild_config_cache.clear()
+    assert (await db.get_confession_channel(storage, GUILD_ID))["channel_id"] == 10
+    indices = [await db.get_next_confession_index(storage, GUILD_ID) for _ in range(3)]
+    assert indices == [1, 2, 3]
+    await db.save_confession_map(storage, GUILD_ID, indices[0], 10, 1000, "confession", content="hello")
+    await db.set_confession_thread(storage, GUILD_ID, indices[0], 77)
+    db.confession_map_cache.clear()
+    entry = await db.get_confession_by_message_id(storage, GUILD_ID, 1000)
+    assert (entry["index"], entry["thread_id"], entry["preview"]) == (1, 77, "hello")
+    await db.record_submission(storage, GUILD_ID, indices[0], 5, "confession", 10, 1000)
+    assert [r["index"] for r in await db.get_submission_page(storage, GUILD_ID, 5)] == [1]
+    await db.release_index_blocks(storage)
+    assert (await storage.get_counter(GUILD_ID))["index"] == 3
+    exported = [(name, document) async for name, document in db.iter_guild_documents(storage, GUILD_ID)]
+    assert [name for name, _ in exported] == ["guild_config", "guild_counters", "confession_map", "confession_audit"]
+    await db.import_guild_documents(storage, OTHER_GUILD_ID, exported)
+    assert (await storage.get_map(OTHER_GUILD_ID, 1))["content"] == "hello"
+    assert (await storage.get_config("guild_config", OTHER_GUILD_ID))["channel_id"] == 10
+    assert (await storage.get_counter(OTHER_GUILD_ID))["index"] == 3
+    assert (await db.get_submission_page(storage, OTHER_GUILD_ID, 5))[0]["message_id"] == 1000
+    await db.set_command_tree_hash(storage, "abc")
+    assert await db.get_command_tree_hash(storage) == "abc"
+    db.ban_cache.clear()
+    assert not await db.is_banned(storage, GUILD_ID, 5)
+    await db.add_confession_ban(storage, GUILD_ID, 5, reason="spam")
+    await db.add_confession_ban(storage, GUILD_ID, 6, duration=datetime.timedelta(seconds=-1))
+    assert await db.is_banned(storage, GUILD_ID, 5) and not await db.is_banned(storage, GUILD_ID, 6)
+    db.ban_cache.clear()
+    assert await db.is_banned(storage, GUILD_ID, 5)
+    await db.remove_confession_ban(storage, GUILD_ID, 5)
+    assert not await db.is_banned(storage, GUILD_ID, 5)
+
+async def check_archive(storage):
+    """Archived entries (Mongo only) stay reachable by index and message ID, and take thread IDs."""
+    for cache in (db.confession_map_cache, db._message_index_cache):
+        cache.clear()
+    await db.ensure_indexes(storage)
+    for index in (1, 2, 3):
+        await db.save_confession_map(storage, GUILD_ID, index, 10, 1000 + index, "confession", content=f"c{index}")
+    moved = await db.archive_confessions(storage, GUILD_ID, 1003)
+    assert moved == (2 if storage.mongo is not None else 0)
+    assert await storage.count_map(GUILD_ID) == 3 - moved
+    entry = await db.get_confession_by_message_id(storage, GUILD_ID, 1002)
+    assert (entry["index"], entry["channel_id"], entry["content"]) == (2, 10, "c2")
+    await db.set_confession_thread(storage, GUILD_ID, 1, 88)
+    db.confession_map_cache.clear()
+    assert (await db.get_confession_map(storage, GUILD_ID, 1))["thread_id"] == 88
+    assert (await db.get_confession_by_message_id(storage, GUILD_ID, 1003))["index"] == 3
+    assert await db.get_confession_by_message_id(storage, GUILD_ID, 999) is None
+
+CHECKS = [
+    check_config,
+    check_counters,
+    check_concurrent_reservations,
+    check_map,
+    check_bulk_map,
+    check_iter_map,
+    check_meta,
+    check_active_pointer,
+    check_bans,
+    check_audit,
+    check_archive,
+    check_through_database_module,
+]
+
+# --- Runner ---
+@contextlib.asynccontextmanager
+async def open_backend(name, args):
+    """Yields a fresh, empty store of the given backend."""
+    if name == "memory":
+        yield MemoryStorage()
+    elif name == "sqlite":
+        with tempfile.TemporaryDirectory() as directory:
+            storage = SQLiteStorage(os.path.join(directory, "conformance.sqlite3"))
+            await storage.ensure_schema()
+            try:
+                yield storage
+            finally:
+                await storage.close()
+    elif args.mongo_uri:
+        import motor.motor_asyncio
+        client = motor.motor_asyncio.AsyncIOMotorClient(args.mongo_uri)
+        await client.drop_database(CONFORMANCE_DB_NAME)
+        storage = MongoStorage(client[CONFORMANCE_DB_NAME], client)
+        await storage.ensure_schema()
+        try:
+            yield storage
+        finally:
+            await client.drop_database(CONFORMANCE_DB_NAME)
+            await storage.close()
+    else:
+        yield MongoStorage(FakeDatabase(latency=getattr(args, "mongo_latency", 0.0)))
+
+async def run(args):
+    failures = 0
+    for name in args.backends:
+        for check in CHECKS:
+            try:
+                async with open_backend(name, args) as storage:
+                    await check(storage)
+            except Exception:
+                failures += 1
+                print(f"FAIL {name:<7} {check.__name__}")
+                traceback.print_exc()
+            else:
+                print(f"ok   {name:<7} {check.__name__}")
+    print(f"{len(args.backends) * len(CHECKS) - failures} passed, {failures} failed")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--mongo-uri", help="run the mongo checks against a real mongod instead of the stand-in")
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(run(args)) else 0)
+
+if __name__ == "__main__":
+    main()
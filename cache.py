@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+
+# Returned by TTLCache.get() when a key is absent or expired, so that a cached
+# ``None`` (e.g. "this guild has no log channel") still counts as a hit.
+MISSING = object()
+
+class TTLCache:
+    """A bounded LRU cache whose entries also expire after a fixed TTL."""
+
+    def __init__(self, maxsize=1024, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key):
+        """Returns the cached value or MISSING, updating the hit/miss counters."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key):
+        """Returns the cached value or MISSING, without counting a hit or miss."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return MISSING
+        return entry[1]
+
+    def set(self, key, value):
+        """Stores a value, evicting the least recently used entry if full."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def refresh(self, key, value):
+        """Replaces a value only if the key is already cached."""
+        if key in self._data:
+            self.set(key, value)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
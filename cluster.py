@@ -0,0 +1,104 @@
+import os
+import sys
+import signal
+import asyncio
+import argparse
+import aiohttp
+
+# --- Cluster Launcher ---
+# Splits the bot's shards into contiguous ranges and runs one main.py worker
+# process per range. Each worker gets its range through SHARD_IDS/SHARD_COUNT,
+# its own health port, and a slice of the total Mongo connection budget.
+# Only cluster 0 registers slash commands.
+#
+#     python cluster.py --clusters 4                # shard count from Discord
+#     python cluster.py --clusters 4 --shards 16
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+RESTART_DELAY = 5.0
+
+def parse_shard_ids(value):
+    """Parses "0-3" or "0,1,5" (or a mix, "0-3,8") into a list of shard IDs."""
+    shard_ids = []
+    for part in value.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-")
+            shard_ids.extend(range(int(start), int(end) + 1))
+        elif part:
+            shard_ids.append(int(part))
+    return shard_ids
+
+def split_shards(shard_count, clusters):
+    """Splits shard IDs into `clusters` contiguous, near-equal ranges."""
+    base, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for cluster_id in range(clusters):
+        size = base + (1 if cluster_id < extra else 0)
+        ranges.append(range(start, start + size))
+        start += size
+    return [r for r in ranges if len(r)]
+
+async def recommended_shard_count(token):
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_URL, headers=headers) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+async def run_worker(cluster_id, shard_range, shard_count, env):
+    """Runs one cluster worker, restarting it if it exits unexpectedly."""
+    worker_env = {
+        **env,
+        "CLUSTER_ID": str(cluster_id),
+        "SHARD_COUNT": str(shard_count),
+        "SHARD_IDS": f"{shard_range.start}-{shard_range.stop - 1}",
+    }
+    while True:
+        print(f"[cluster] starting cluster {cluster_id} (shards {worker_env['SHARD_IDS']} of {shard_count})")
+        process = await asyncio.create_subprocess_exec(sys.executable, "main.py", env=worker_env)
+        try:
+            code = await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+            raise
+        print(f"[cluster] cluster {cluster_id} exited with code {code}, restarting in {RESTART_DELAY}s")
+        await asyncio.sleep(RESTART_DELAY)
+
+async def main(args):
+    shard_count = args.shards or await recommended_shard_count(os.environ["DISCORD_TOKEN"])
+    clusters = split_shards(shard_count, min(args.clusters, shard_count))
+    base_port = int(os.environ.get("PORT", 8000))
+    pool_size = max(1, args.mongo_pool_size // len(clusters))
+
+    workers = []
+    for cluster_id, shard_range in enumerate(clusters):
+        env = {
+            **os.environ,
+            "CLUSTER_COUNT": str(len(clusters)),
+            "PORT": str(base_port + cluster_id),
+            "MONGO_MAX_POOL_SIZE": str(pool_size),
+        }
+        workers.append(asyncio.create_task(run_worker(cluster_id, shard_range, shard_count, env)))
+        # Stagger logins so the clusters don't all hit the identify limit at once.
+        await asyncio.sleep(args.stagger)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    print("[cluster] shutting down")
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot as several sharded worker processes.")
+    parser.add_argument("--clusters", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shards", type=int, help="total shard count (default: Discord's recommendation)")
+    parser.add_argument("--mongo-pool-size", type=int, default=int(os.environ.get("MONGO_TOTAL_POOL_SIZE", 100)),
+                        help="total Mongo connections, divided between clusters")
+    parser.add_argument("--stagger", type=float, default=5.0, help="seconds between cluster starts")
+    asyncio.run(main(parser.parse_args()))
@@ -1,7 +1,14 @@
 # This is cogs/admin.py
+import os
+import time
 import discord
+import asyncio
 from discord.ext import commands
 import database as db
+import tracing
+import memory
+
+BACKFILL_CONCURRENCY = 5
 
 class Admin(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -27,5 +34,100 @@ class Admin(commands.Cog):
         await db.set_log_channel(self.bot.db, ctx.guild.id, guild_id, channel_id)
         await ctx.send(f"✅ Confession logs will now be sent to channel `{channel_id}` in guild `{guild_id}`.")
 
+    @commands.command(name="backfillthreads")
+    @commands.has_permissions(administrator=True)
+    async def backfill_threads(self, ctx):
+        """Records reply thread IDs for confessions posted before they were tracked."""
+        await ctx.send("⏳ Backfilling reply threads...")
+        queue = asyncio.Queue(maxsize=BACKFILL_CONCURRENCY * 2)
+        found = 0
+
+        async def worker():
+            nonlocal found
+            while (document := await queue.get()) is not None:
+                try:
+                    # A thread started from a message shares that message's ID.
+                    thread = ctx.guild.get_thread(document['message_id'])
+                    if thread is None:
+                        thread = await self.bot.fetch_channel(document['message_id'])
+                    await db.set_confession_thread(self.bot.db, ctx.guild.id, document['index'], thread.id)
+                    found += 1
+                except discord.NotFound:
+                    continue # No replies were ever made
+                except Exception as e:
+                    print(f"Backfill error for confession #{document['index']}: {e}")
+
+        workers = [asyncio.create_task(worker()) for _ in range(BACKFILL_CONCURRENCY)]
+        try:
+            async for document in db.iter_confessions_without_thread(self.bot.db, ctx.guild.id):
+                await queue.put(document)
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        await ctx.send(f"✅ Recorded **{found}** reply threads.")
+
+    @commands.command(name="timings")
+    @commands.has_permissions(manage_guild=True)
+    async def show_timings(self, ctx):
+        """Shows per-stage confession timings for this server."""
+        if not tracing.TRACE_ENABLED:
+            return await ctx.send("Tracing is disabled. Set `CONFESSION_TRACE=1` to enable it.")
+        stats = tracing.guild_stats(ctx.guild.id)
+        if not stats:
+            return await ctx.send("No timings recorded for this server yet.")
+        lines = [f"{'stage':<32}{'count':>7}{'avg ms':>9}{'max ms':>9}"]
+        for name, (count, avg_ms, max_ms) in list(stats.items())[:20]:
+            lines.append(f"{name:<32}{count:>7}{avg_ms:>9.1f}{max_ms:>9.1f}")
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+    @commands.command(name="sync")
+    @commands.is_owner()
+    async def force_sync(self, ctx):
+        """Re-registers the slash commands with Discord, even if unchanged."""
+        synced = await self.bot.sync_commands(force=True)
+        await ctx.send(f"✅ Synced **{len(synced)}** slash commands.")
+
+    @commands.command(name="memstats")
+    @commands.is_owner()
+    async def memory_stats(self, ctx):
+        """Shows RSS and cached object counts for the memory profile in use."""
+        report = memory.format_report(memory.memory_report(self.bot))
+        await ctx.send(f"```\n{report}\n```")
+
+    @commands.command(name="export")
+    @commands.has_permissions(administrator=True)
+    async def export_data(self, ctx):
+        """Exports this server's confession data as compressed NDJSON."""
+        import transfer # Only needed here, so it stays off the startup path
+        await ctx.send("⏳ Exporting confession data...")
+        os.makedirs(transfer.EXPORT_DIR, exist_ok=True)
+        path = os.path.join(transfer.EXPORT_DIR, f"{ctx.guild.id}-{int(time.time())}.ndjson.gz")
+        counts = await transfer.export_guild(self.bot.db, ctx.guild.id, path)
+        summary = transfer.format_counts(counts)
+        if os.path.getsize(path) > ctx.guild.filesize_limit:
+            return await ctx.send(f"✅ Exported {summary}. The file is too large to upload; it was saved on the bot host as `{path}`.")
+        await ctx.send(f"✅ Exported {summary}.", file=discord.File(path))
+        os.remove(path)
+
+    @commands.command(name="import")
+    @commands.has_permissions(administrator=True)
+    async def import_data(self, ctx):
+        """Imports an export attached to the message. Run it again to resume an interrupted import."""
+        if not ctx.message.attachments:
+            return await ctx.send("Attach a file created by `!export`.")
+        import transfer
+        await ctx.send("⏳ Importing confession data...")
+        os.makedirs(transfer.EXPORT_DIR, exist_ok=True)
+        # A fixed path per guild, so a retried import finds its checkpoint.
+        path = os.path.join(transfer.EXPORT_DIR, f"import-{ctx.guild.id}.ndjson.gz")
+        await ctx.message.attachments[0].save(path)
+        try:
+            counts = await transfer.import_guild(self.bot.db, path, guild_id=ctx.guild.id)
+        except (ValueError, OSError, EOFError) as e:
+            return await ctx.send(f"❌ Import failed: {e}")
+        os.remove(path)
+        await ctx.send(f"✅ Imported {transfer.format_counts(counts)}.")
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(Admin(bot))
\ No newline at end of file
@@ -0,0 +1,94 @@
+# This is cogs/audit.py
+import discord
+from discord.ext import commands
+from discord import app_commands, ui
+import database as db
+
+AUDIT_VIEW_TIMEOUT = 300
+
+class AuditLogView(ui.View):
+    """Pages through a user's submissions, newest first.
+
+    Each page is fetched as "the next PAGE_SIZE records older than the last
+    one shown", so going back only needs the `before` cursor of every page
+    visited on the way.
+    """
+
+    def __init__(self, bot, guild_id, user):
+        super().__init__(timeout=AUDIT_VIEW_TIMEOUT)
+        self.bot = bot
+        self.guild_id = guild_id
+        self.user = user
+        self.cursors = []  # `before` of each newer page, for going back
+        self.before = None
+        self.records = []
+        self.message = None
+
+    async def load(self, before):
+        # One extra record says whether there is an older page.
+        records = await db.get_submission_page(self.bot.db, self.guild_id, self.user.id, before, db.AUDIT_PAGE_SIZE + 1)
+        self.before = before
+        self.records = records[:db.AUDIT_PAGE_SIZE]
+        self.newer.disabled = not self.cursors
+        self.older.disabled = len(records) <= db.AUDIT_PAGE_SIZE
+
+    def embed(self):
+        embed = discord.Embed(title=f"Confession log for {self.user}", color=discord.Color.greyple())
+        lines = []
+        for record in self.records:
+            link = f"https://discord.com/channels/{self.guild_id}/{record['channel_id']}/{record['message_id']}"
+            lines.append(f"**#{record['index']}** {record['type']} · {discord.utils.format_dt(record['created_at'], 'f')} · [jump]({link})")
+        embed.description = "\n".join(lines) or f"No submissions from {self.user.mention} are on record."
+        embed.set_footer(text=f"User ID: {self.user.id} · Page {len(self.cursors) + 1}")
+        return embed
+
+    async def _show(self, interaction, before, cursors):
+        previous = self.cursors
+        self.cursors = cursors
+        try:
+            await self.load(before)
+        except Exception as e:
+            self.cursors = previous
+            print(f"[/checklogs] Error paging in guild {self.guild_id}: {e}")
+            return await interaction.response.send_message(f"An error occurred: {e}", ephemeral=True)
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    async def newer(self, interaction: discord.Interaction, button: ui.Button):
+        await self._show(interaction, self.cursors[-1], self.cursors[:-1])
+
+    @ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    async def older(self, interaction: discord.Interaction, button: ui.Button):
+        await self._show(interaction, self.records[-1]["message_id"], self.cursors + [self.before])
+
+    async def on_timeout(self):
+        if self.message is None:
+            return
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException:
+            pass
+
+class Audit(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="checklogs", description="Check confession logs for a user")
+    @app_commands.describe(user="The user whose confessions and replies to list")
+    @app_commands.default_permissions(manage_guild=True)
+    async def checklogs(self, interaction: discord.Interaction, user: discord.User):
+        await interaction.response.defer(ephemeral=True)
+        view = AuditLogView(self.bot, interaction.guild.id, user)
+        try:
+            await view.load(None)
+            view.message = await interaction.followup.send(
+                embed=view.embed(), view=view, allowed_mentions=discord.AllowedMentions.none(), wait=True
+            )
+        except Exception as e:
+            print(f"[/checklogs] Error in guild {interaction.guild.id}: {e}")
+            await interaction.followup.send(f"An error occurred: {e}")
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Audit(bot))
@@ -0,0 +1,65 @@
+# This is cogs/bans.py
+import datetime
+import discord
+from discord.ext import commands
+from discord import app_commands
+from typing import Optional
+import database as db
+
+BAN_LIST_LIMIT = 20
+
+def _describe_ban(ban):
+    expires_at = ban.get("expires_at")
+    until = f"until {discord.utils.format_dt(expires_at, 'R')}" if expires_at else "permanently"
+    reason = f" — {ban['reason']}" if ban.get("reason") else ""
+    return f"<@{ban['user_id']}> {until}{reason}"
+
+class Bans(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="confessban", description="Ban a user from confessing")
+    @app_commands.describe(
+        user="The user to ban (leave empty to list bans)",
+        days="How many days the ban lasts (leave empty for a permanent ban)",
+        reason="Why the user is banned",
+        clear="Lift the user's ban, or every ban in the server if no user is given"
+    )
+    @app_commands.default_permissions(manage_guild=True)
+    async def confessban(
+        self,
+        interaction: discord.Interaction,
+        user: Optional[discord.User] = None,
+        days: Optional[app_commands.Range[int, 1, 3650]] = None,
+        reason: Optional[app_commands.Range[str, 1, 200]] = None,
+        clear: Optional[bool] = None
+    ):
+        await interaction.response.defer(ephemeral=True)
+        guild_id = interaction.guild.id
+        try:
+            if clear and user:
+                if await db.remove_confession_ban(self.bot.db, guild_id, user.id):
+                    return await interaction.followup.send(f"✅ {user.mention} can confess again.")
+                return await interaction.followup.send(f"{user.mention} isn't banned.")
+            if clear:
+                removed = await db.clear_confession_bans(self.bot.db, guild_id)
+                return await interaction.followup.send(f"✅ Lifted {removed} confession ban(s).")
+            if user:
+                duration = datetime.timedelta(days=days) if days else None
+                ban = await db.add_confession_ban(self.bot.db, guild_id, user.id, duration, reason, interaction.user.id)
+                return await interaction.followup.send(f"✅ Banned {_describe_ban(ban)}.")
+
+            bans = await db.list_confession_bans(self.bot.db, guild_id)
+            if not bans:
+                return await interaction.followup.send("Nobody is banned from confessing.")
+            lines = [_describe_ban(ban) for ban in bans[:BAN_LIST_LIMIT]]
+            if len(bans) > BAN_LIST_LIMIT:
+                lines.append(f"…and {len(bans) - BAN_LIST_LIMIT} more.")
+            await interaction.followup.send(f"**{len(bans)} confession ban(s):**\n" + "\n".join(lines),
+                                            allowed_mentions=discord.AllowedMentions.none())
+        except Exception as e:
+            print(f"[/confessban] Error in guild {guild_id}: {e}")
+            await interaction.followup.send(f"An error occurred: {e}")
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Bans(bot))
@@ -1,4 +1,5 @@
 import discord
+import asyncio
 import re 
 import random 
 from discord import ui
@@ -6,6 +7,10 @@ from discord.ext import commands
 from discord import app_commands
 from typing import Optional
 import database as db
+import metrics
+from attachments import AttachmentError, NotAnImage, validate_url
+from scheduler import SubmissionRejected
+from tracing import span, traced
 
 # --- Random Colors ---
 RANDOM_COLORS = [
@@ -14,54 +19,201 @@ RANDOM_COLORS = [
     discord.Color.teal(), discord.Color.purple(),
 ]
 
+DB_UNAVAILABLE_MESSAGE = "⚠️ Confessions are temporarily unavailable. Please try again in a minute."
+BANNED_MESSAGE = "🚫 You are banned from confessing in this server."
+
+class ConfessionBanned(Exception):
+    """Raised when a banned user submits a confession or reply."""
+
+# Submissions turned away on purpose; str() is the message for the user.
+REJECTIONS = (ConfessionBanned, SubmissionRejected, AttachmentError)
+
+async def _check_not_banned(bot, interaction):
+    if await db.is_banned(bot.db, interaction.guild.id, interaction.user.id):
+        metrics.BANNED_SUBMISSIONS.inc()
+        raise ConfessionBanned(BANNED_MESSAGE)
+
+def _error_message(error):
+    """The message shown to the user when a submission fails."""
+    if db.is_unavailable(error):
+        return DB_UNAVAILABLE_MESSAGE
+    return f"An error occurred: {error}"
+
 # --- Helper: Send Log ---
+@traced("log.confession", lambda bot, interaction, *args, **kwargs: interaction.guild.id)
 async def _log_confession(bot, interaction, content, attachment_url, new_index, reply_to_index=None, original_content=None):
-    """Sends the confession data to the configured log channel."""
-    log_config = await db.get_log_channel(bot.db, interaction.guild.id)
-    if not log_config:
-        return 
+    """Queues the confession data for the configured log channel.
+
+    While the database is unavailable the log event is spooled and sent
+    once it recovers.
+    """
+    event = {
+        "guild_id": interaction.guild.id,
+        "user": f"{interaction.user} (`{interaction.user.id}`)",
+        "content": content,
+        "attachment_url": attachment_url,
+        "index": new_index,
+        "reply_to_index": reply_to_index,
+        "original_content": original_content,
+    }
+    if db.spool.backlog("log_confession"):
+        return db.spool_event("log_confession", event) # Don't overtake older spooled events
     try:
-        target_guild = bot.get_guild(log_config['target_guild_id'])
-        if not target_guild:
-            print(f"Log Error: Cannot find guild {log_config['target_guild_id']}")
-            return
-        target_channel = target_guild.get_channel(log_config['target_channel_id'])
-        if not target_channel:
-            print(f"Log Error: Cannot find channel {log_config['target_channel_id']}")
-            return
-        
-        if reply_to_index:
-            embed = discord.Embed(title="New Reply Log", color=discord.Color.blue())
-            embed.add_field(name="Replier", value=f"{interaction.user} (`{interaction.user.id}`)", inline=False)
-            embed.add_field(name=f"New Reply (#{new_index})", value=f"```{content}```", inline=False)
-            if original_content:
-                embed.add_field(name=f"Original Confession (#{reply_to_index})", value=f"```{original_content}```", inline=False)
-            else:
-                 embed.add_field(name="Original Confession", value=f"Replying to #{reply_to_index}", inline=False)
+        await _send_log(bot, event)
+    except Exception as e:
+        if not db.is_unavailable(e):
+            raise
+        db.spool_event("log_confession", event)
+
+async def _log_target(bot, guild_id):
+    """Returns the guild's log channel, or None if it isn't set up or can't be found."""
+    log_config = await db.get_log_channel(bot.db, guild_id)
+    if not log_config:
+        return None
+    target_guild = bot.get_guild(log_config['target_guild_id'])
+    if not target_guild:
+        print(f"Log Error: Cannot find guild {log_config['target_guild_id']}")
+        return None
+    target_channel = target_guild.get_channel(log_config['target_channel_id'])
+    if not target_channel:
+        print(f"Log Error: Cannot find channel {log_config['target_channel_id']}")
+    return target_channel
+
+MAX_FIELD_LENGTH = 1024
+
+def _field_value(text, limit=MAX_FIELD_LENGTH):
+    """Cuts text down to Discord's embed field limit."""
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def _code_block(text):
+    """Wraps text in a code block that fits in an embed field."""
+    return f"```{_field_value(text, MAX_FIELD_LENGTH - 6)}```"
+
+async def _send_log(bot, event):
+    """Builds the log embed for a log event and queues it for the log channel."""
+    target_channel = await _log_target(bot, event["guild_id"])
+    if not target_channel:
+        return
+
+    new_index, reply_to_index, content = event["index"], event["reply_to_index"], event["content"]
+    if reply_to_index:
+        embed = discord.Embed(title="New Reply Log", color=discord.Color.blue())
+        embed.add_field(name="Replier", value=_field_value(event["user"]), inline=False)
+        embed.add_field(name=f"New Reply (#{new_index})", value=_code_block(content), inline=False)
+        if event["original_content"]:
+            embed.add_field(name=f"Original Confession (#{reply_to_index})", value=_code_block(event['original_content']), inline=False)
         else:
-            embed = discord.Embed(title="New Confession Log", color=discord.Color.greyple())
-            embed.add_field(name="User", value=f"{interaction.user} (`{interaction.user.id}`)", inline=False)
-            embed.add_field(name=f"New Confession (#{new_index})", value=f"```{content}```", inline=False)
-        
-        if attachment_url:
-            embed.add_field(name="Attachment", value=attachment_url, inline=False)
-        await target_channel.send(embed=embed)
+             embed.add_field(name="Original Confession", value=f"Replying to #{reply_to_index}", inline=False)
+    else:
+        embed = discord.Embed(title="New Confession Log", color=discord.Color.greyple())
+        embed.add_field(name="User", value=_field_value(event["user"]), inline=False)
+        embed.add_field(name=f"New Confession (#{new_index})", value=_code_block(content), inline=False)
+
+    if event["attachment_url"]:
+        embed.add_field(name="Attachment", value=_field_value(event["attachment_url"]), inline=False)
+    if not bot.log_dispatcher.enqueue(target_channel, embed):
+        print(f"Log Error: Log queue is full, dropped log for #{new_index}")
+
+# --- Helper: Re-host Attachment ---
+async def _rehost_and_log(bot, interaction, sent_message, embed, content, attachment_url, index, reply_to_index, original_content):
+    """Re-uploads a confession's attachment onto its message and the log channel, then logs it.
+
+    The confession is posted with the original link so the user doesn't wait
+    for the transfer. If the file can't be fetched or isn't an image, the
+    confession and the log keep the link.
+    """
+    guild_id = interaction.guild.id
+    log_url = attachment_url
+    try:
+        async with bot.attachments.fetch(attachment_url) as attachment:
+            embed.set_image(url=f"attachment://{attachment.filename}")
+            with span("confession.rehost", guild_id):
+                await sent_message.edit(embed=embed, attachments=[attachment.to_file()])
+            log_channel = await _log_target(bot, guild_id)
+            if log_channel:
+                log_url = await bot.attachments.upload_once(log_channel, attachment, f"Attachment of #{index}")
+    except NotAnImage:
+        pass
     except Exception as e:
-        print(f"Error sending log: {e}")
+        print(f"Attachment Error: Could not re-host the attachment of #{index} in guild {guild_id}: {e}")
+    await _log_confession(bot, interaction, content, log_url, index, reply_to_index, original_content)
+
+# --- Helper: Disable Old Buttons ---
+async def _disable_previous_buttons(bot, guild_id, channel, sent_message):
+    """Removes the buttons from the previous original confession."""
+    try:
+        previous = await db.swap_active_confession(bot.db, guild_id, channel.id, sent_message.id)
+        if previous:
+            previous_channel = bot.get_channel(previous['channel_id']) or channel
+            with span("confession.disable_buttons", guild_id):
+                await previous_channel.get_partial_message(previous['message_id']).edit(view=None)
+            print(f"Disabled buttons on previous confession: {previous['message_id']}")
+            return
+
+        # No pointer stored for this guild yet, so recover it from recent history.
+        with span("confession.history_scan", guild_id):
+            messages = [message async for message in channel.history(limit=10)]
+        for old_message in messages:
+            # Skip the message we just sent
+            if old_message.id == sent_message.id:
+                continue
+            
+            # Find the first message before this one that is from the bot, has embeds, and has the 2-button view
+            if old_message.author.id == bot.user.id and old_message.embeds and old_message.components:
+                if len(old_message.components) > 0 and len(old_message.components[0].children) > 1:
+                    await old_message.edit(view=None) # Remove buttons
+                    print(f"Disabled buttons on previous confession: {old_message.id}")
+                    break # Stop searching once we've found and edited it
+    except discord.NotFound:
+        pass # The previous confession was deleted
 
 # --- Helper: Send Confession (UPDATED with Button Fix) ---
 async def _send_confession(bot, interaction, content, attachment_url=None, reply_to_index=None, target_channel=None, embed_title=None, original_content=None, reply_to_message=None):
-    """A reusable function to send the confession embed, handles button disabling."""
-    
-    index = await db.get_next_confession_index(bot.db, interaction.guild.id)
-    base_title = embed_title if embed_title else "Anonymous Confession"
-    final_title = f"{base_title} (#{index})"
+    """A reusable function to send the confession embed, handles button disabling.
+
+    The submission waits its turn in the guild's queue on bot.scheduler, and
+    returns as soon as the confession is posted. Saving the mapping, removing
+    the previous buttons and logging run afterwards as background tasks.
+    Raises one of REJECTIONS if the submission is turned away.
+    """
     
     # Determine if this is a reply *before* setting the view
     is_reply = reply_to_index is not None or (target_channel and isinstance(target_channel, discord.Thread)) or reply_to_message
-    
-    view = ReplyOnlyView(bot) if is_reply else ConfessionView(bot)
+
+    # --- STAGE 0: Reject banned users (an in-memory lookup once loaded), then queue ---
+    await _check_not_banned(bot, interaction)
+    return await bot.scheduler.run(
+        interaction.guild.id, interaction.user.id,
+        lambda: _post_confession(bot, interaction, content, attachment_url, reply_to_index, target_channel,
+                                 embed_title, original_content, reply_to_message, is_reply),
+        kind='reply' if is_reply else 'original'
+    )
+
+async def _post_confession(bot, interaction, content, attachment_url, reply_to_index, target_channel, embed_title, original_content, reply_to_message, is_reply):
     is_original_confession = not is_reply # This is an original confession if it's not a reply
+    guild_id = interaction.guild.id
+
+    # --- STAGE 1: Allocate the index (and look up the channel for originals) ---
+    main_confess_channel = None
+    with span("confession.allocate", guild_id):
+        if is_original_confession and not target_channel:
+            index, config = await asyncio.gather(
+                db.get_next_confession_index(bot.db, guild_id),
+                db.get_confession_channel(bot.db, guild_id)
+            )
+        else:
+            index = await db.get_next_confession_index(bot.db, guild_id)
+            config = None
+    if is_original_confession and not target_channel:
+        if not config or "channel_id" not in config:
+            return None 
+        main_confess_channel = bot.get_channel(config['channel_id'])
+        if not main_confess_channel:
+            return None 
+
+    base_title = embed_title if embed_title else "Anonymous Confession"
+    final_title = f"{base_title} (#{index})"
+    view = ReplyOnlyView(bot) if is_reply else ConfessionView(bot)
     
     embed = discord.Embed(
         title=final_title,
@@ -71,83 +223,95 @@ async def _send_confession(bot, interaction, content, attachment_url=None, reply
     if attachment_url:
         embed.set_image(url=attachment_url)
     
-    sent_message = None
-    sent_to_channel = None
-    main_confess_channel = None
-    
-    if reply_to_message:
-        sent_message = await reply_to_message.reply(embed=embed, view=view)
-        sent_to_channel = sent_message.channel
-    elif target_channel:
-        sent_message = await target_channel.send(embed=embed, view=view)
-        sent_to_channel = sent_message.channel
-    else:
-        # This is an original confession, send to main channel
-        config = await db.get_confession_channel(bot.db, interaction.guild.id)
-        if not config or "channel_id" not in config:
-            return None 
-        main_confess_channel = bot.get_channel(config['channel_id'])
-        if main_confess_channel:
-            sent_message = await main_confess_channel.send(embed=embed, view=view)
-            sent_to_channel = main_confess_channel
+    # --- STAGE 2: Post the confession (the only step the user waits for) ---
+    message_type = 'reply' if is_reply else 'original'
+    with metrics.DISCORD_SEND_LATENCY.time(kind=message_type), span("confession.send", guild_id):
+        if reply_to_message:
+            sent_message = await reply_to_message.reply(embed=embed, view=view)
+        elif target_channel:
+            sent_message = await target_channel.send(embed=embed, view=view)
         else:
-            return None 
+            # This is an original confession, send to main channel
+            sent_message = await main_confess_channel.send(embed=embed, view=view)
+    sent_to_channel = sent_message.channel
+    (metrics.REPLIES if is_reply else metrics.CONFESSIONS).inc()
     
-    # --- NEW BUTTON PERSISTENCE FIX ---
+    # --- STAGE 3: Post-send work, run concurrently off the critical path ---
+    bot.background.spawn(
+        f"save_confession_map:{guild_id}:{index}",
+        db.save_confession_map(
+            bot.db, guild_id, index, sent_to_channel.id, sent_message.id, message_type,
+            content=content, parent_index=reply_to_index,
+            thread_id=sent_to_channel.id if isinstance(sent_to_channel, discord.Thread) else None
+        )
+    )
+    bot.background.spawn(
+        f"record_submission:{guild_id}:{index}",
+        db.record_submission(bot.db, guild_id, index, interaction.user.id, message_type, sent_to_channel.id, sent_message.id)
+    )
     # If we just sent an original confession to the main channel, disable old buttons
-    if sent_message and is_original_confession and main_confess_channel and sent_to_channel.id == main_confess_channel.id:
-        async for old_message in main_confess_channel.history(limit=10):
-            # Skip the message we just sent
-            if old_message.id == sent_message.id:
-                continue
-            
-            # Find the first message before this one that is from the bot, has embeds, and has the 2-button view
-            if old_message.author.id == bot.user.id and old_message.embeds and old_message.components:
-                if len(old_message.components) > 0 and len(old_message.components[0].children) > 1:
-                    try:
-                        await old_message.edit(view=None) # Remove buttons
-                        print(f"Disabled buttons on previous confession: {old_message.id}")
-                    except discord.HTTPException as e:
-                        print(f"Error disabling old buttons: {e}")
-                    break # Stop searching once we've found and edited it
-    
-    # --- SAVE MAPPING TO DB ---
-    if sent_message:
-        message_type = 'reply' if is_reply else 'original'
-        await db.save_confession_map(bot.db, interaction.guild.id, index, sent_message.channel.id, sent_message.id, message_type)
-
-    await _log_confession(bot, interaction, content, attachment_url, index, reply_to_index, original_content)
+    if main_confess_channel:
+        bot.background.spawn(
+            f"disable_previous_buttons:{guild_id}:{index}",
+            _disable_previous_buttons(bot, guild_id, main_confess_channel, sent_message)
+        )
+    if attachment_url:
+        bot.background.spawn(
+            f"rehost_attachment:{guild_id}:{index}",
+            _rehost_and_log(bot, interaction, sent_message, embed, content, attachment_url, index, reply_to_index, original_content)
+        )
+    else:
+        bot.background.spawn(
+            f"log_confession:{guild_id}:{index}",
+            _log_confession(bot, interaction, content, attachment_url, index, reply_to_index, original_content)
+        )
     return sent_to_channel
 
 # --- NEW HELPER: Robustly find or create a thread ---
-async def get_or_create_reply_thread(message: discord.Message, name: str) -> discord.Thread | None:
+async def _resolve_thread(bot, thread_id: int) -> discord.Thread | None:
+    """Gets a thread from the client cache or the API, unarchiving it if needed."""
+    thread = bot.get_channel(thread_id)
+    if thread is None:
+        try:
+            thread = await bot.fetch_channel(thread_id)
+        except discord.NotFound:
+            return None
+    if not isinstance(thread, discord.Thread):
+        return None
+    if thread.archived:
+        thread = await thread.edit(archived=False)
+    return thread
+
+async def get_or_create_reply_thread(bot, message: discord.Message, name: str, index: int, thread_id: int | None = None) -> discord.Thread | None:
     """Robustly finds or creates a reply thread for a message."""
     
-    if message.thread: return message.thread
-
     try:
-        new_thread = await message.create_thread(name=name)
-        return new_thread
-    except discord.HTTPException as e:
-        if e.code == 160004: # Thread already created
-            # Check active threads
-            for thread in message.channel.threads:
-                if thread.parent_message_id == message.id:
-                    return thread
-            
-            # Check archived threads
-            try:
-                async for thread in message.channel.archived_threads(limit=None): 
-                    if thread.parent_message_id == message.id:
-                        return thread
-            except Exception as e_archived:
-                print(f"Failed to search archived threads: {e_archived}")
-                return None 
-            
-            return None
+        if thread_id:
+            with span("thread.resolve_stored", message.guild.id):
+                thread = await _resolve_thread(bot, thread_id)
+            if thread: return thread
+
+        if message.thread:
+            thread = message.thread
         else:
-            print(f"Failed to create thread: {e}")
-            return None
+            try:
+                with span("thread.create", message.guild.id):
+                    thread = await message.create_thread(name=name)
+            except discord.HTTPException as e:
+                if e.code != 160004: # Thread already created
+                    print(f"Failed to create thread: {e}")
+                    return None
+                # A thread started from a message shares that message's ID.
+                with span("thread.resolve_existing", message.guild.id):
+                    thread = await _resolve_thread(bot, message.id)
+                if not thread:
+                    return None
+
+        bot.background.spawn(
+            f"set_confession_thread:{message.guild.id}:{index}",
+            db.set_confession_thread(bot.db, message.guild.id, index, thread.id)
+        )
+        return thread
     except Exception as e:
         print(f"A non-HTTP error occurred during thread creation: {e}")
         return None
@@ -168,17 +332,20 @@ class ConfessionModal(ui.Modal):
                 bot=self.bot,
                 interaction=interaction,
                 content=self.content.value,
-                attachment_url=self.attachment.value or None,
+                attachment_url=validate_url(self.attachment.value) if self.attachment.value else None,
                 reply_to_index=None 
             )
             if confess_channel:
                 await interaction.followup.send(f":white_check_mark: Your confession has been added to {confess_channel.mention}")
             else:
                 await interaction.followup.send("Error: The confession channel is not set up.")
+        except REJECTIONS as e:
+            await interaction.followup.send(str(e), ephemeral=True)
         except Exception as e:
             print(f"Error in modal on_submit: {e}")
+            metrics.ERRORS.inc(source="confession_modal")
             try:
-                await interaction.followup.send(f"An error occurred: {e}", ephemeral=True)
+                await interaction.followup.send(_error_message(e), ephemeral=True)
             except discord.InteractionResponded:
                 pass 
 
@@ -196,6 +363,7 @@ class ReplyModal(ui.Modal):
     )
     attachment_url = ui.TextInput(label="Attachment URL (Optional)", required=False, style=discord.TextStyle.short)
 
+    @traced("reply.on_submit", lambda self, interaction: interaction.guild.id)
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True, thinking=True)
         original_message = None
@@ -203,8 +371,12 @@ class ReplyModal(ui.Modal):
         original_content = None
 
         try:
+            # Checked before the target lookups so rejected submissions cost nothing.
+            await _check_not_banned(self.bot, interaction)
+            self.bot.scheduler.check(interaction.guild.id, interaction.user.id)
+            attachment_url = validate_url(self.attachment_url.value) if self.attachment_url.value else None
             target_input = self.confession_to_reply_to.value.strip()
-            in_thread = isinstance(interaction.channel, discord.Thread)
+            confession_map = None
 
             if target_input:
                 # Case 3: ID is entered. Find the message by DATABASE INDEX or Message ID.
@@ -223,7 +395,7 @@ class ReplyModal(ui.Modal):
                 
                 # --- FETCHING LOGIC ---
                 config = await db.get_confession_channel(self.bot.db, interaction.guild.id)
-                if not config:
+                if not config or "channel_id" not in config:
                     await interaction.followup.send("Error: Confession channel not set up.", ephemeral=True)
                     return
                 
@@ -232,53 +404,56 @@ class ReplyModal(ui.Modal):
                     if not confession_map:
                         await interaction.followup.send(f"Error: Confession #{index_number} not found in database.", ephemeral=True)
                         return
-                    target_channel = self.bot.get_channel(confession_map['channel_id'])
-                    if not target_channel:
-                         await interaction.followup.send("Error: Confession channel not found.", ephemeral=True)
-                         return
-                    original_message = await target_channel.fetch_message(confession_map['message_id'])
-                
-                elif message_id: # Fetch by Message ID
-                    channel = self.bot.get_channel(config['channel_id'])
-                    
-                    try: original_message = await channel.fetch_message(message_id)
-                    except discord.NotFound:
-                        for thread in channel.threads:
-                            try:
-                                original_message = await thread.fetch_message(message_id)
-                                if original_message: break
-                            except discord.NotFound:
-                                continue
-                        if not original_message:
-                             await interaction.followup.send("Error: Message ID not found.", ephemeral=True)
-                             return
-
-
-            elif not in_thread:
-                # Case 2: In Main Channel, field is blank. Target is the button message.
-                original_message = interaction.message
-            
-            elif in_thread:
-                # Case 1: In Thread, field is blank. Target is the button message.
+                else: # Look up by Message ID
+                    confession_map = await db.get_confession_by_message_id(self.bot.db, interaction.guild.id, message_id)
+                    if not confession_map:
+                        await interaction.followup.send("Error: Message ID not found.", ephemeral=True)
+                        return
+
+            elif interaction.message:
+                # Cases 1 & 2: In Main Channel or Thread, field is blank. Target is the button message.
                 original_message = interaction.message
+                confession_map = await db.get_confession_by_message_id(self.bot.db, interaction.guild.id, original_message.id)
+
+            if confession_map and original_message is None:
+                target_channel = self.bot.get_channel(confession_map['channel_id'])
+                if not target_channel:
+                    # Archived reply threads aren't kept in the client cache.
+                    try: target_channel = await self.bot.fetch_channel(confession_map['channel_id'])
+                    except discord.HTTPException: target_channel = None
+                if not target_channel:
+                     await interaction.followup.send("Error: Confession channel not found.", ephemeral=True)
+                     return
+                if 'content' in confession_map:
+                    # Replying and creating threads only need the message ID.
+                    original_message = target_channel.get_partial_message(confession_map['message_id'])
+                else:
+                    with span("reply.fetch_target", interaction.guild.id):
+                        original_message = await target_channel.fetch_message(confession_map['message_id'])
 
             # --- Message Parsing & Final Logic ---
             if original_message:
                 try:
-                    embed = original_message.embeds[0]
-                    title = embed.title
-                    original_content = re.sub(r'Replying to #\d+\n\n', '', embed.description).strip('"') 
-                    original_index = int(re.search(r'#(\d+)\)', title).group(1))
+                    if confession_map and 'content' in confession_map:
+                        original_index = confession_map['index']
+                        original_content = confession_map['content']
+                    else:
+                        # Entries saved before content was stored: parse the embed instead.
+                        embed = original_message.embeds[0]
+                        title = embed.title
+                        original_content = re.sub(r'Replying to #\d+\n\n', '', embed.description).strip('"') 
+                        original_index = int(re.search(r'#(\d+)\)', title).group(1))
+                        if not confession_map:
+                            confession_map = await db.get_confession_map(self.bot.db, interaction.guild.id, original_index)
 
                     # --- FINAL LOGIC: DETERMINE TYPE ---
-                    confession_map = await db.get_confession_map(self.bot.db, interaction.guild.id, original_index)
                     message_type = confession_map['type'] if (confession_map and 'type' in confession_map) else 'original'
                     
                     # Target is a REPLY -> USE DISCORD REPLY
                     if message_type == 'reply':
                         await _send_confession(
                             bot=self.bot, interaction=interaction, content=self.reply.value,
-                            attachment_url=self.attachment_url.value or None,
+                            attachment_url=attachment_url,
                             reply_to_index=original_index,
                             reply_to_message=original_message, 
                             embed_title="Anonymous Reply",
@@ -287,12 +462,15 @@ class ReplyModal(ui.Modal):
                     
                     # Target is an ORIGINAL CONFESSION -> CREATE THREAD
                     elif message_type == 'original':
-                        reply_thread = await get_or_create_reply_thread(original_message, f"Replies for #{original_index}")
+                        reply_thread = await get_or_create_reply_thread(
+                            self.bot, original_message, f"Replies for #{original_index}", original_index,
+                            thread_id=confession_map.get('thread_id') if confession_map else None
+                        )
 
                         if reply_thread:
                             await _send_confession(
                                 bot=self.bot, interaction=interaction, content=self.reply.value,
-                                attachment_url=self.attachment_url.value or None,
+                                attachment_url=attachment_url,
                                 reply_to_index=original_index,
                                 target_channel=reply_thread, # Send into the thread
                                 embed_title="Anonymous Reply",
@@ -301,8 +479,11 @@ class ReplyModal(ui.Modal):
                         else:
                             await interaction.followup.send("Error: Could not find or create the reply thread.")
 
+                except REJECTIONS:
+                    raise
                 except Exception as e:
                     print(f"Error during final processing: {e}")
+                    metrics.ERRORS.inc(source="reply_modal")
                     await interaction.followup.send("Error: Could not process the reply. Target message is malformed.", ephemeral=True)
                     return
             
@@ -312,10 +493,13 @@ class ReplyModal(ui.Modal):
 
             await interaction.followup.send(":white_check_mark: Reply sent!")
 
+        except REJECTIONS as e:
+            await interaction.followup.send(str(e), ephemeral=True)
         except Exception as e:
             print(f"[DEBUG ReplyModal] CRITICAL ERROR in on_submit: {e}")
+            metrics.ERRORS.inc(source="reply_modal")
             try:
-                await interaction.followup.send(f"An error occurred: {e}", ephemeral=True)
+                await interaction.followup.send(_error_message(e), ephemeral=True)
             except discord.InteractionResponded:
                 pass 
 
@@ -347,6 +531,8 @@ class Confess(commands.Cog):
     def cog_load(self):
         self.bot.add_view(ConfessionView(self.bot))
         self.bot.add_view(ReplyOnlyView(self.bot))
+        # Replays log events spooled while the database was unavailable.
+        self.bot.spool_handlers["log_confession"] = lambda event: _send_log(self.bot, event)
 
     @app_commands.command(name="confess", description="Submits a confession")
     @app_commands.describe(
@@ -366,13 +552,16 @@ class Confess(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         try:
             config = await db.get_confession_channel(self.bot.db, interaction.guild.id)
-            if not config:
+            # !retention can create the config before a channel is set.
+            if not config or "channel_id" not in config:
                 return await interaction.followup.send("Error: The confession channel has not been set up.")
             
             confession_channel_id = config['channel_id']
             if channel and channel.id != confession_channel_id:
                 return await interaction.followup.send(f"Confessions not allowed in {channel.mention}. They must go to <#{confession_channel_id}>.")
             
+            if attachment:
+                self.bot.attachments.check_size(attachment.size)
             confess_channel = await _send_confession(
                 bot=self.bot,
                 interaction=interaction,
@@ -384,10 +573,13 @@ class Confess(commands.Cog):
                 await interaction.followup.send(f":white_check_mark: Your confession has been added to {confess_channel.mention}")
             else:
                 await interaction.followup.send("Error: Could not send confession. Is the channel set up?")
+        except REJECTIONS as e:
+            await interaction.followup.send(str(e), ephemeral=True)
         except Exception as e:
             print(f"Error in /confess command: {e}")
+            metrics.ERRORS.inc(source="confess_command")
             try:
-                await interaction.followup.send(f"An error occurred: {e}", ephemeral=True)
+                await interaction.followup.send(_error_message(e), ephemeral=True)
             except discord.InteractionResponded:
                 pass 
 
@@ -0,0 +1,67 @@
+# This is cogs/retention.py
+import os
+import datetime
+import discord
+from discord.ext import commands, tasks
+import database as db
+
+RETENTION_INTERVAL_HOURS = float(os.environ.get("RETENTION_INTERVAL_HOURS", 6))
+
+def _mb(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+class Retention(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.archive_loop.start()
+
+    def cog_unload(self):
+        self.archive_loop.cancel()
+
+    @tasks.loop(hours=RETENTION_INTERVAL_HOURS)
+    async def archive_loop(self):
+        """Archives entries past each guild's retention horizon (guilds on this cluster only)."""
+        now = discord.utils.utcnow()
+        moved = 0
+        for guild in list(self.bot.guilds):
+            try:
+                days = await db.get_retention_days(self.bot.db, guild.id)
+                if days <= 0:
+                    continue
+                # Message IDs are snowflakes, so the horizon is just an ID.
+                horizon = discord.utils.time_snowflake(now - datetime.timedelta(days=days))
+                moved += await db.archive_confessions(self.bot.db, guild.id, horizon)
+            except Exception as e:
+                print(f"Retention error in guild {guild.id}: {e}")
+        if moved:
+            print(f"Archived {moved} confession entries.")
+
+    @archive_loop.before_loop
+    async def before_archive_loop(self):
+        await self.bot.wait_until_ready()
+
+    @commands.command(name="retention")
+    @commands.has_permissions(manage_guild=True)
+    async def retention(self, ctx, days: int = None):
+        """Shows hot/cold storage stats, or sets how many days confessions stay hot (0 = forever)."""
+        if days is not None:
+            if days < 0:
+                return await ctx.send("Days can't be negative.")
+            await db.set_retention_days(self.bot.db, ctx.guild.id, days)
+            if days == 0:
+                return await ctx.send("✅ Confessions will no longer be archived.")
+            return await ctx.send(f"✅ Confessions older than **{days}** days will be archived.")
+
+        days = await db.get_retention_days(self.bot.db, ctx.guild.id)
+        stats = await db.retention_stats(self.bot.db, ctx.guild.id)
+        hot, cold = stats["hot"], stats["cold"]
+        lines = [
+            f"retention: {f'{days} days' if days else 'forever'}",
+            f"{'':<6}{'this server':>13}{'documents':>11}{'data':>11}{'indexes':>11}",
+            f"{'hot':<6}{hot['guild_entries']:>13}{hot['documents']:>11}{_mb(hot['size_bytes']):>11}{_mb(hot['index_bytes']):>11}",
+            f"{'cold':<6}{cold['guild_entries']:>13}{cold['documents']:>11}{_mb(cold['size_bytes']):>11}{_mb(cold['index_bytes']):>11}",
+        ]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Retention(bot))
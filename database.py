@@ -1,64 +1,1046 @@
 # This is database.py
+import os
+import time
+import asyncio
+import datetime
+import inspect
+import functools
 import pymongo 
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, OperationFailure, PyMongoError
+from cache import TTLCache, MISSING
+from spool import CircuitBreaker, Spool
+from storage import parse_ban_id
+import metrics
+from tracing import span
+
+# --- Outage Handling ---
+# Calls go through a circuit breaker: after DB_BREAKER_FAILURES consecutive
+# connection failures or timeouts, they raise DatabaseUnavailable straight
+# away instead of each waiting out the driver's timeouts. Writes that must
+# not be lost (confession map entries, audit records, log events) are
+# appended to a SQLite spool instead, and replay_spool_forever() replays them
+# in order once Mongo answers again. While writes of a kind are spooled, new
+# writes of that kind are spooled too, so they can't overtake older ones.
+DB_BREAKER_FAILURES = int(os.environ.get("DB_BREAKER_FAILURES", 5))
+DB_BREAKER_RESET = float(os.environ.get("DB_BREAKER_RESET", 10))
+SPOOL_PATH = os.environ.get("SPOOL_PATH", f"spool-{os.environ.get('CLUSTER_ID', 0)}.sqlite3")
+SPOOL_REPLAY_INTERVAL = float(os.environ.get("SPOOL_REPLAY_INTERVAL", 2))
+
+_SPOOLED_WRITES = ("map_update", "audit", "archived_thread")
+
+breaker = CircuitBreaker(failure_threshold=DB_BREAKER_FAILURES, reset_timeout=DB_BREAKER_RESET)
+spool = Spool(SPOOL_PATH)
+
+class DatabaseUnavailable(ConnectionFailure):
+    """Raised without a round trip while the circuit breaker is open."""
+
+def is_unavailable(error):
+    """Returns whether an exception means Mongo can't be reached right now."""
+    return isinstance(error, (ConnectionFailure, ExecutionTimeout)) or (isinstance(error, PyMongoError) and error.timeout)
+
+def _timed(func=None, *, fail_fast=True):
+    """Records the call's latency in db_call_seconds and a "db.<name>" span.
+
+    Unless ``fail_fast`` is False, the call also goes through the circuit
+    breaker. Calls that spool their writes pass False and report to the
+    breaker themselves.
+    """
+    if func is None:
+        return functools.partial(_timed, fail_fast=fail_fast)
+    span_name = f"db.{func.__name__}"
+    # Calls that take a guild_id get it as their second positional argument.
+    has_guild = "guild_id" in inspect.signature(func).parameters
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if fail_fast and not breaker.allow():
+            raise DatabaseUnavailable(f"{func.__name__}: the database is unavailable")
+        guild_id = args[1] if has_guild and len(args) > 1 else None
+        started = time.perf_counter()
+        try:
+            with span(span_name, guild_id):
+                result = await func(*args, **kwargs)
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            if fail_fast and is_unavailable(e):
+                breaker.record_failure()
+            raise
+        finally:
+            metrics.DB_LATENCY.observe(time.perf_counter() - started, op=func.__name__)
+        if fail_fast:
+            breaker.record_success()
+        return result
+    return wrapper
+
+# --- Config Cache ---
+# guild_config and log_config are read on every confession but almost never
+# change, so both are served from a bounded TTL/LRU cache. Writes from this
+# process go straight into the cache; writes from other processes are picked
+# up by watch_config_changes().
+CONFIG_CACHE_SIZE = int(os.environ.get("CONFIG_CACHE_SIZE", 4096))
+CONFIG_CACHE_TTL = float(os.environ.get("CONFIG_CACHE_TTL", 300))
+CONFIG_POLL_INTERVAL = float(os.environ.get("CONFIG_POLL_INTERVAL", 15))
+# Server errors meaning the deployment has no change streams (a standalone
+# server): 40573 "only supported on replica sets", 40324 unrecognized
+# pipeline stage (older servers) and 115 CommandNotSupported.
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324, 115}
+
+guild_config_cache = TTLCache(maxsize=CONFIG_CACHE_SIZE, ttl=CONFIG_CACHE_TTL)
+log_config_cache = TTLCache(maxsize=CONFIG_CACHE_SIZE, ttl=CONFIG_CACHE_TTL)
+
+_CONFIG_CACHES = {
+    "guild_config": guild_config_cache,
+    "log_config": log_config_cache,
+}
+
+def cache_stats():
+    """Returns hit/miss counters for the config and confession map caches."""
+    stats = {name: cache.stats() for name, cache in _CONFIG_CACHES.items()}
+    stats["confession_map"] = confession_map_cache.stats()
+    stats["confession_bans"] = ban_cache.stats()
+    return stats
+
+async def _cached_find(db, name, guild_id):
+    cache = _CONFIG_CACHES[name]
+    value = cache.get(guild_id)
+    if value is not MISSING:
+        return value
+    value = await _find_config(db, guild_id, name)
+    cache.set(guild_id, value)
+    return value
+
+# Cache hits don't touch the database, so only the read itself is timed and
+# goes through the breaker; cached guilds keep working during an outage.
+@_timed
+async def _find_config(db, guild_id, name):
+    return await db.get_config(name, guild_id)
+
+async def warm_config_caches(db, owns_guild=None):
+    """Loads guild and log configs into their caches at startup and returns how many were loaded.
+
+    ``owns_guild(guild_id)`` picks the guilds this process serves; up to
+    CONFIG_CACHE_SIZE of each kind are loaded. Entries already cached are
+    left alone, as they may be newer. Ban sets aren't warmed: they are
+    read per guild on its first submission, and loading every guild's would
+    read the whole ban collection.
+    """
+    warmed = 0
+    for name, cache in _CONFIG_CACHES.items():
+        loaded = 0
+        async for document in db.iter_configs(name):
+            if loaded >= CONFIG_CACHE_SIZE:
+                break
+            guild_id = document["_id"]
+            if owns_guild is not None and not owns_guild(guild_id):
+                continue
+            if cache.peek(guild_id) is MISSING:
+                cache.set(guild_id, document)
+            loaded += 1
+        warmed += loaded
+    return warmed
+
+async def _update_config(db, name, guild_id, fields):
+    document = await db.update_config(name, guild_id, fields)
+    _CONFIG_CACHES[name].set(guild_id, document)
+
+async def _watch_change_stream(mongo):
+    pipeline = [{"$match": {"$or": [
+        {"ns.coll": {"$in": list(_CONFIG_CACHES)}},
+        # Counter resets from !count stamp updated_at; block reservations don't.
+        {"ns.coll": "guild_counters", "updateDescription.updatedFields.updated_at": {"$exists": True}},
+        {"ns.coll": "confession_bans"},
+    ]}}]
+    async with mongo.watch(pipeline, full_document="updateLookup") as stream:
+        print("Config cache: watching change stream.")
+        async for change in stream:
+            if change["ns"]["coll"] == "confession_bans":
+                _ban_changed(change)
+                continue
+            guild_id = change["documentKey"]["_id"]
+            if change["ns"]["coll"] == "guild_counters":
+                _drop_index_block(guild_id)
+                continue
+            cache = _CONFIG_CACHES[change["ns"]["coll"]]
+            document = change.get("fullDocument")
+            if document is not None:
+                cache.refresh(guild_id, document)
+            else:
+                cache.invalidate(guild_id)
+
+async def _poll_config_changes(mongo):
+    print(f"Config cache: change streams unavailable, polling every {CONFIG_POLL_INTERVAL}s.")
+    # Deletes can't be polled for, so unbans from other processes only show
+    # up once the guild's ban set expires from ban_cache.
+    watched = {**_CONFIG_CACHES, "guild_counters": None, "confession_bans": None}
+    last_seen = {}
+    for name in watched:
+        latest = await mongo[name].find_one({"updated_at": {"$exists": True}}, sort=[("updated_at", -1)])
+        last_seen[name] = latest["updated_at"] if latest else None
+
+    while True:
+        await asyncio.sleep(CONFIG_POLL_INTERVAL)
+        for name, cache in watched.items():
+            query = {"updated_at": {"$gt": last_seen[name]}} if last_seen[name] else {"updated_at": {"$exists": True}}
+            async for document in mongo[name].find(query):
+                if name == "confession_bans":
+                    _set_ban(document["guild_id"], document["user_id"], _expiry(document))
+                elif cache is None:
+                    _drop_index_block(document["_id"])
+                else:
+                    cache.refresh(document["_id"], document)
+                if last_seen[name] is None or document["updated_at"] > last_seen[name]:
+                    last_seen[name] = document["updated_at"]
+
+async def watch_config_changes(db):
+    """Keeps the config caches, index blocks and ban sets consistent with
+    writes made by other processes.
+
+    Uses a change stream when the deployment supports one and falls back to
+    polling the ``updated_at`` stamp otherwise. Runs until cancelled. Only
+    Mongo is shared between processes; other backends return straight away.
+    """
+    if db.mongo is None:
+        return
+    polling = False
+    while True:
+        try:
+            if polling:
+                await _poll_config_changes(db.mongo)
+            else:
+                await _watch_change_stream(db.mongo)
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            if not polling and isinstance(e, OperationFailure) and e.code in CHANGE_STREAMS_UNSUPPORTED:
+                polling = True
+                continue
+            print(f"Config cache: {'polling' if polling else 'change stream'} interrupted ({e}), resyncing.")
+            for cache in _CONFIG_CACHES.values():
+                cache.clear()
+            ban_cache.clear()
+            _index_blocks.clear()
+            await asyncio.sleep(5)
+
+# --- Indexes ---
+@_timed
+async def ensure_indexes(db):
+    """Creates the indexes (or tables) the lookups in this module rely on."""
+    await db.ensure_schema()
+
+# --- Slash Command Sync State ---
+@_timed
+async def get_command_tree_hash(db):
+    """Gets the hash of the command tree that was last synced to Discord."""
+    document = await db.get_meta("command_tree")
+    return document["hash"] if document else None
+
+@_timed
+async def set_command_tree_hash(db, digest):
+    """Records the hash of the command tree that was just synced."""
+    await db.set_meta("command_tree", {"hash": digest})
 
 # --- Guild Configuration (Confession Channel) ---
+@_timed
 async def set_confession_channel(db, guild_id, channel_id):
     """Sets the confession channel for a guild."""
-    await db.guild_config.update_one(
-        {"_id": guild_id},
-        {"$set": {"channel_id": channel_id}},
-        upsert=True
-    )
+    await _update_config(db, "guild_config", guild_id, {"channel_id": channel_id})
 
 async def get_confession_channel(db, guild_id):
     """Gets the confession channel config for a guild."""
-    return await db.guild_config.find_one({"_id": guild_id})
+    return await _cached_find(db, "guild_config", guild_id)
 
 # --- Confession Index (Counter) ---
+# Indices are reserved from guild_counters in blocks of INDEX_BLOCK_SIZE and
+# handed out locally, so most confessions don't need a counter round trip.
+# Within a process indices are strictly increasing. When callers are already
+# queued behind a reservation, the block grows to cover them so one round trip
+# serves the whole burst. On shutdown the unused
+# tail of each block is handed back when INDEX_RETURN_UNUSED is set and no
+# other process has reserved past it; otherwise it is left as a gap.
+INDEX_BLOCK_SIZE = max(1, int(os.environ.get("INDEX_BLOCK_SIZE", 10)))
+INDEX_RETURN_UNUSED = os.environ.get("INDEX_RETURN_UNUSED", "1") == "1"
+
+_index_blocks = {}  # guild_id -> [next_index, last_index]
+_index_locks = {}
+_index_waiters = {}
+
+def _index_lock(guild_id):
+    lock = _index_locks.get(guild_id)
+    if lock is None:
+        lock = _index_locks[guild_id] = asyncio.Lock()
+    return lock
+
+def _drop_index_block(guild_id):
+    _index_blocks.pop(guild_id, None)
+
+@_timed
 async def set_confession_index(db, guild_id, number):
     """Sets the confession counter. The next confession will be this number."""
-    await db.guild_counters.update_one(
-        {"_id": guild_id},
-        {"$set": {"index": number - 1}},
-        upsert=True
-    )
+    async with _index_lock(guild_id):
+        _drop_index_block(guild_id)
+        await db.set_counter(guild_id, number - 1)
 
+@_timed
+async def _reserve_index_block(db, guild_id, size):
+    return await db.reserve_indices(guild_id, size)
+
+# Only the reservation is timed and goes through the breaker, so a guild can
+# keep using its current block while the database is unavailable.
 async def get_next_confession_index(db, guild_id):
-    """Increments and returns the next confession index."""
-    result = await db.guild_counters.find_one_and_update(
-        {"_id": guild_id},
-        {"$inc": {"index": 1}},
-        upsert=True,
-        return_document=pymongo.ReturnDocument.AFTER
-    )
-    return result.get("index", 1) 
+    """Returns the next confession index, reserving a new block when needed."""
+    _index_waiters[guild_id] = _index_waiters.get(guild_id, 0) + 1
+    try:
+        async with _index_lock(guild_id):
+            block = _index_blocks.get(guild_id)
+            if block is None or block[0] > block[1]:
+                size = max(INDEX_BLOCK_SIZE, _index_waiters[guild_id])
+                last_index = await _reserve_index_block(db, guild_id, size)
+                block = _index_blocks[guild_id] = [last_index - size + 1, last_index]
+            index = block[0]
+            block[0] += 1
+            return index
+    finally:
+        _index_waiters[guild_id] -= 1
+
+async def release_index_blocks(db):
+    """Returns unused reserved indices to the counter (called on shutdown)."""
+    blocks = list(_index_blocks.items())
+    _index_blocks.clear()
+    if not INDEX_RETURN_UNUSED:
+        return
+    for guild_id, (next_index, last_index) in blocks:
+        if next_index > last_index:
+            continue
+        # Only roll back if the counter still ends at our block.
+        await db.release_indices(guild_id, last_index, next_index - 1)
 
 # --- Log Channel Configuration ---
+@_timed
 async def set_log_channel(db, guild_id, target_guild_id, target_channel_id):
     """Sets the cross-server logging destination."""
-    await db.log_config.update_one(
-        {"_id": guild_id},
-        {"$set": {
-            "target_guild_id": target_guild_id,
-            "target_channel_id": target_channel_id
-        }},
-        upsert=True
-    )
+    await _update_config(db, "log_config", guild_id, {
+        "target_guild_id": target_guild_id,
+        "target_channel_id": target_channel_id
+    })
 
 async def get_log_channel(db, guild_id):
     """Gets the log channel destination."""
-    return await db.log_config.find_one({"_id": guild_id})
+    return await _cached_find(db, "log_config", guild_id)
+
+# --- Active Buttons Pointer ---
+@_timed
+async def swap_active_confession(db, guild_id, channel_id, message_id):
+    """Marks a message as the confession carrying the buttons.
+
+    Returns the pointer to the message whose buttons should now be removed,
+    or None if the guild had no pointer yet. If a newer confession already
+    holds the buttons, this one is stale and its own pointer is returned.
+    """
+    return await db.swap_active(guild_id, channel_id, message_id)
+
+# --- Confession Bans ---
+# Every submission checks its author against the guild's bans, so each
+# guild's bans are loaded once into a dict of user_id -> expiry timestamp
+# (None for permanent bans) and the check is a hash lookup. Bans made by this
+# process are written through to the loaded set; bans made by other
+# processes arrive through watch_config_changes(). Expired bans are skipped
+# by the check and deleted by the backend (a TTL index on Mongo).
+BAN_CACHE_SIZE = int(os.environ.get("BAN_CACHE_SIZE", 4096))
+BAN_CACHE_TTL = float(os.environ.get("BAN_CACHE_TTL", 900))
+
+ban_cache = TTLCache(maxsize=BAN_CACHE_SIZE, ttl=BAN_CACHE_TTL)
+_ban_locks = {}
+
+def _ban_lock(guild_id):
+    lock = _ban_locks.get(guild_id)
+    if lock is None:
+        lock = _ban_locks[guild_id] = asyncio.Lock()
+    return lock
+
+def _utc(value):
+    # Motor and json_util return naive datetimes, which are UTC.
+    return value.replace(tzinfo=datetime.timezone.utc) if value is not None and value.tzinfo is None else value
+
+def _expiry(ban):
+    expires_at = _utc(ban.get("expires_at"))
+    return expires_at.timestamp() if expires_at is not None else None
+
+def _set_ban(guild_id, user_id, expires_at):
+    bans = ban_cache.peek(guild_id)
+    if bans is not MISSING:
+        bans[user_id] = expires_at
+
+def _drop_ban(guild_id, user_id):
+    bans = ban_cache.peek(guild_id)
+    if bans is not MISSING:
+        bans.pop(user_id, None)
+
+def _ban_changed(change):
+    if change["operationType"] == "delete":
+        _drop_ban(*parse_ban_id(change["documentKey"]["_id"]))
+        return
+    document = change.get("fullDocument")
+    if document is not None:
+        _set_ban(document["guild_id"], document["user_id"], _expiry(document))
+
+@_timed
+async def _load_bans(db, guild_id):
+    return {ban["user_id"]: _expiry(ban) async for ban in db.iter_bans(guild_id)}
+
+async def is_banned(db, guild_id, user_id):
+    """Returns whether a user is banned from confessing in a guild."""
+    bans = ban_cache.get(guild_id)
+    if bans is MISSING:
+        async with _ban_lock(guild_id):
+            # Concurrent submissions from one guild share a single load.
+            bans = ban_cache.peek(guild_id)
+            if bans is MISSING:
+                bans = await _load_bans(db, guild_id)
+                ban_cache.set(guild_id, bans)
+    if user_id not in bans:
+        return False
+    expires_at = bans[user_id]
+    if expires_at is not None and expires_at <= time.time():
+        bans.pop(user_id, None)
+        return False
+    return True
+
+@_timed
+async def add_confession_ban(db, guild_id, user_id, duration=None, reason=None, moderator_id=None):
+    """Bans a user from confessing for `duration` (a timedelta), or for good. Returns the ban."""
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + duration if duration else None
+    async with _ban_lock(guild_id):
+        ban = await db.add_ban(guild_id, user_id, {"expires_at": expires_at, "reason": reason, "moderator_id": moderator_id})
+        _set_ban(guild_id, user_id, _expiry(ban))
+    return ban
+
+@_timed
+async def remove_confession_ban(db, guild_id, user_id):
+    """Lifts a user's ban. Returns whether they were banned."""
+    async with _ban_lock(guild_id):
+        removed = await db.remove_ban(guild_id, user_id)
+        _drop_ban(guild_id, user_id)
+    return removed
+
+@_timed
+async def clear_confession_bans(db, guild_id):
+    """Lifts every ban in a guild and returns how many there were."""
+    async with _ban_lock(guild_id):
+        removed = await db.clear_bans(guild_id)
+        ban_cache.set(guild_id, {})
+    return removed
+
+@_timed
+async def list_confession_bans(db, guild_id):
+    """Returns a guild's active bans, newest first."""
+    bans = [ban async for ban in db.iter_bans(guild_id)]
+    return sorted(bans, key=lambda ban: _utc(ban["created_at"]), reverse=True)
 
 # --- Confession Index Mapping (UPDATED) ---
+# Each entry stores the confession's content, so a reply can be resolved from
+# one indexed read without fetching and parsing the Discord message. Recently
+# replied-to entries are kept in an LRU; message ID -> index never changes,
+# so that lookup is cached too.
+CONFESSION_MAP_CACHE_SIZE = int(os.environ.get("CONFESSION_MAP_CACHE_SIZE", 2048))
+CONFESSION_MAP_CACHE_TTL = float(os.environ.get("CONFESSION_MAP_CACHE_TTL", 600))
+PREVIEW_LENGTH = 100
 
-async def save_confession_map(db, guild_id, index, channel_id, message_id, type):
-    """Saves the mapping of confession index, message details, and type."""
-    await db.confession_map.update_one(
-        {"guild_id": guild_id, "index": index},
-        {"$set": {"channel_id": channel_id, "message_id": message_id, "type": type}}, # <-- Saves 'type'
-        upsert=True
-    )
+confession_map_cache = TTLCache(maxsize=CONFESSION_MAP_CACHE_SIZE, ttl=CONFESSION_MAP_CACHE_TTL)
+_message_index_cache = TTLCache(maxsize=CONFESSION_MAP_CACHE_SIZE, ttl=CONFESSION_MAP_CACHE_TTL)
+
+# --- Write-Behind Buffer ---
+# With CONFESSION_WRITE_BEHIND=1, map upserts and thread updates are merged per
+# (guild_id, index) and written in unordered bulk_write batches, along with
+# any buffered audit records, either once
+# WRITE_BEHIND_BATCH entries are pending or every WRITE_BEHIND_INTERVAL seconds.
+# Reads check the pending and in-flight buffers first, so a process always sees
+# its own writes. flush_writes() is awaited on shutdown. Counters don't need
+# buffering; block reservation already amortises those round trips.
+WRITE_BEHIND = os.environ.get("CONFESSION_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_BATCH = int(os.environ.get("WRITE_BEHIND_BATCH", 100))
+WRITE_BEHIND_INTERVAL = float(os.environ.get("WRITE_BEHIND_INTERVAL", 0.5))
+
+_pending_writes = {}   # (guild_id, index) -> {"fields": {...}, "upsert": bool}
+_inflight_writes = {}
+_pending_by_message = {}  # (guild_id, message_id) -> index, for entries not yet written
+_pending_audit = []    # audit records not yet written
+_write_behind_db = None
+_flush_task = None        # the periodic flush
+_batch_flush_task = None  # a flush started early because a batch filled up
+_flush_lock = asyncio.Lock()
 
+def _buffer_write(db, guild_id, index, fields, upsert):
+    entry = _pending_writes.get((guild_id, index))
+    if entry is None:
+        _pending_writes[(guild_id, index)] = {"fields": dict(fields), "upsert": upsert}
+    else:
+        entry["fields"].update(fields)
+        entry["upsert"] = entry["upsert"] or upsert
+    if "message_id" in fields:
+        _pending_by_message[(guild_id, fields["message_id"])] = index
+    _schedule_flush(db, len(_pending_writes))
+
+def _buffer_audit(db, record):
+    _pending_audit.append(record)
+    _schedule_flush(db, len(_pending_audit))
+
+def _schedule_flush(db, pending):
+    global _write_behind_db, _flush_task, _batch_flush_task
+    _write_behind_db = db
+    if pending >= WRITE_BEHIND_BATCH and (_batch_flush_task is None or _batch_flush_task.done()):
+        _batch_flush_task = asyncio.create_task(_flush_quietly())
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_periodically())
+
+async def _flush_quietly():
+    try:
+        await flush_writes()
+    except Exception:
+        pass # Already logged; the entries stay buffered for the next flush.
+
+async def _flush_periodically():
+    while _pending_writes or _pending_audit:
+        await asyncio.sleep(WRITE_BEHIND_INTERVAL)
+        await _flush_quietly()
+
+def _buffered_fields(guild_id, index):
+    """Returns the fields of an entry that are buffered but not yet written."""
+    fields = {}
+    for buffer in (_inflight_writes, _pending_writes):
+        entry = buffer.get((guild_id, index))
+        if entry is not None:
+            fields.update(entry["fields"])
+    return fields
+
+@_timed
+async def flush_writes(db=None):
+    """Writes every buffered map update and audit record, one unordered batch each."""
+    global _pending_writes, _inflight_writes
+    db = db or _write_behind_db
+    async with _flush_lock:
+        if db is None:
+            return
+        if _pending_audit:
+            records = _pending_audit[:]
+            del _pending_audit[:]
+            try:
+                await db.add_audit_records(records)
+            except Exception as e:
+                print(f"Write-behind flush of {len(records)} audit records failed, will retry: {e}")
+                _pending_audit[:0] = records
+                raise
+        if not _pending_writes:
+            return
+        _inflight_writes, _pending_writes = _pending_writes, {}
+        requests = [
+            (guild_id, index, entry["fields"], entry["upsert"])
+            for (guild_id, index), entry in _inflight_writes.items()
+        ]
+        try:
+            await db.bulk_update_map(requests)
+        except Exception as e:
+            print(f"Write-behind flush of {len(requests)} entries failed, will retry: {e}")
+            # Newer pending updates win over the batch that failed.
+            for key, entry in _inflight_writes.items():
+                newer = _pending_writes.get(key)
+                if newer is not None:
+                    entry["fields"].update(newer["fields"])
+                    entry["upsert"] = entry["upsert"] or newer["upsert"]
+                _pending_writes[key] = entry
+            raise
+        finally:
+            for (guild_id, index), entry in _inflight_writes.items():
+                if "message_id" in entry["fields"] and (guild_id, index) not in _pending_writes:
+                    _pending_by_message.pop((guild_id, entry["fields"]["message_id"]), None)
+            _inflight_writes = {}
+
+def _preview(content):
+    return content if len(content) <= PREVIEW_LENGTH else content[:PREVIEW_LENGTH - 1] + "…"
+
+@_timed(fail_fast=False)
+async def save_confession_map(db, guild_id, index, channel_id, message_id, type, content=None, parent_index=None, thread_id=None):
+    """Saves the mapping of confession index, message details, type and content.
+
+    ``thread_id`` is the thread that replies to this entry go to: the reply
+    thread of an original, or the thread a reply was posted in.
+    """
+    fields = {"channel_id": channel_id, "message_id": message_id, "type": type} # <-- Saves 'type'
+    if content is not None:
+        fields["content"] = content
+        fields["preview"] = _preview(content)
+    if parent_index is not None:
+        fields["parent_index"] = parent_index
+    if thread_id is not None:
+        fields["thread_id"] = thread_id
+    await _write_map(db, guild_id, index, fields, upsert=True)
+
+async def _write_map(db, guild_id, index, fields, upsert):
+    """Writes (or buffers) a map update, spooling it if the database is unavailable."""
+    confession_map_cache.invalidate((guild_id, index))
+    if _spool_first():
+        _spool_map_update(guild_id, index, fields, upsert)
+        return
+    if WRITE_BEHIND:
+        _buffer_write(db, guild_id, index, fields, upsert=upsert)
+        return
+    try:
+        await db.update_map(guild_id, index, fields, upsert)
+    except PyMongoError as e:
+        if not is_unavailable(e):
+            raise
+        breaker.record_failure()
+        _spool_map_update(guild_id, index, fields, upsert)
+        return
+    breaker.record_success()
+    confession_map_cache.invalidate((guild_id, index))
+
+@_timed
+async def _find_map(db, guild_id, index):
+    return await db.get_map(guild_id, index)
+
+@_timed
+async def _find_map_by_message(db, guild_id, message_id):
+    return await db.get_map_by_message(guild_id, message_id)
+
+# As with config, only cache misses are timed and go through the breaker.
 async def get_confession_map(db, guild_id, index):
     """Retrieves the mapping of confession index to message details."""
-    return await db.confession_map.find_one({"guild_id": guild_id, "index": index})
\ No newline at end of file
+    buffered = _buffered_fields(guild_id, index) if WRITE_BEHIND else None
+    if buffered and "message_id" in buffered:
+        # Saved by this process but not flushed yet.
+        return {"guild_id": guild_id, "index": index, **buffered}
+    document = confession_map_cache.get((guild_id, index))
+    if document is MISSING:
+        document = await _find_map(db, guild_id, index)
+        if document is not None:
+            confession_map_cache.set((guild_id, index), document)
+    if document is None:
+        document = await _find_archived(db, guild_id, index)
+        if document is not None:
+            confession_map_cache.set((guild_id, index), document)
+    if buffered and document is not None:
+        document = {**document, **buffered}
+    return document
+
+async def get_confession_by_message_id(db, guild_id, message_id):
+    """Retrieves the confession mapping for a posted message."""
+    if WRITE_BEHIND and (guild_id, message_id) in _pending_by_message:
+        return await get_confession_map(db, guild_id, _pending_by_message[(guild_id, message_id)])
+    index = _message_index_cache.get((guild_id, message_id))
+    if index is not MISSING:
+        return await get_confession_map(db, guild_id, index)
+    document = await _find_map_by_message(db, guild_id, message_id)
+    if document is None:
+        document = await _find_archived_by_message(db, guild_id, message_id)
+    if document is not None:
+        _message_index_cache.set((guild_id, message_id), document["index"])
+        confession_map_cache.set((guild_id, document["index"]), document)
+    return document
+
+@_timed(fail_fast=False)
+async def set_confession_thread(db, guild_id, index, thread_id):
+    """Records the reply thread created for a confession."""
+    await _write_map(db, guild_id, index, {"thread_id": thread_id}, upsert=False)
+    if db.mongo is None:
+        return
+    # The entry may be archived; then this sets the thread in its bucket.
+    if _spool_first():
+        _spool_archived_thread(guild_id, index, thread_id)
+        return
+    try:
+        await _set_archived_thread(db, guild_id, index, thread_id)
+    except PyMongoError as e:
+        if not is_unavailable(e):
+            raise
+        _spool_archived_thread(guild_id, index, thread_id)
+
+async def iter_confessions_without_thread(db, guild_id):
+    """Yields original confessions that have no reply thread recorded."""
+    if WRITE_BEHIND:
+        await flush_writes(db)
+    async for document in db.iter_map(guild_id, without_thread=True):
+        yield document
+
+# --- Submission Audit Log ---
+# One record per posted confession or reply: who sent it, where it was posted
+# and when. Records are keyed by message ID rather than confession index,
+# which !count can hand out again. /checklogs pages through a user's records
+# newest first. Pages are keyset-paginated on the message ID ("posted before
+# message N", as message IDs are snowflakes) rather than skipped into, and the
+# (guild_id, user_id, message_id) index answers each page as one short range
+# scan, so a page costs the same however deep it is and however many
+# confessions the guild has.
+AUDIT_PAGE_SIZE = 10
+
+@_timed(fail_fast=False)
+async def record_submission(db, guild_id, index, user_id, type, channel_id, message_id):
+    """Writes the audit record for a posted confession or reply."""
+    await _write_audit(db, {
+        "guild_id": guild_id,
+        "index": index,
+        "user_id": user_id,
+        "type": type,
+        "channel_id": channel_id,
+        "message_id": message_id,
+        "created_at": datetime.datetime.now(datetime.timezone.utc),
+    })
+
+async def _write_audit(db, record):
+    """Writes (or buffers) an audit record, spooling it if the database is unavailable."""
+    if _spool_first():
+        _spool_audit(record)
+        return
+    if WRITE_BEHIND:
+        _buffer_audit(db, record)
+        return
+    try:
+        await db.add_audit_records([record])
+    except PyMongoError as e:
+        if not is_unavailable(e):
+            raise
+        breaker.record_failure()
+        _spool_audit(record)
+        return
+    breaker.record_success()
+
+@_timed
+async def get_submission_page(db, guild_id, user_id, before=None, limit=AUDIT_PAGE_SIZE):
+    """Returns up to `limit` of a user's submissions posted before message `before`, newest first."""
+    if WRITE_BEHIND and _pending_audit:
+        await flush_writes(db)
+    return await db.find_audit_records(guild_id, user_id, before, limit)
+
+# --- Guild Export / Import ---
+# Everything stored for one guild: the per-guild singletons (keyed by the
+# guild ID), its confession_map entries, its confession bans and its audit
+# records. transfer.py streams these to and from compressed NDJSON.
+GUILD_COLLECTIONS = ("guild_config", "log_config", "guild_counters")
+
+async def iter_guild_documents(db, guild_id, batch_size=1000):
+    """Yields (collection, document) for a guild, confession_map in index order."""
+    if WRITE_BEHIND:
+        await flush_writes(db)
+    for name in GUILD_COLLECTIONS:
+        if name == "guild_counters":
+            document = await db.get_counter(guild_id)
+        else:
+            document = await db.get_config(name, guild_id)
+        if document is not None:
+            yield name, document
+    async for document in db.iter_map(guild_id, batch_size):
+        yield "confession_map", document
+    async for document in iter_archived(db, guild_id, batch_size):
+        yield "confession_map", document
+    async for ban in db.iter_bans(guild_id):
+        yield "confession_bans", ban
+    async for record in db.iter_audit_records(guild_id, batch_size):
+        yield "confession_audit", record
+
+@_timed
+async def advance_confession_index(db, guild_id, index):
+    """Moves the counter forward to at least `index`; it never moves back."""
+    async with _index_lock(guild_id):
+        _drop_index_block(guild_id)
+        await db.advance_counter(guild_id, index)
+
+@_timed
+async def import_guild_documents(db, guild_id, records):
+    """Upserts a batch of exported (collection, document) pairs into a guild.
+
+    Re-importing the same batch is harmless, which is what makes resuming
+    from a checkpoint safe. The counter is advanced past every imported
+    index, so new confessions can't collide with imported ones.
+    """
+    requests = []
+    audit = []
+    last_index = 0
+    for name, document in records:
+        document = {key: value for key, value in document.items() if key != "_id"}
+        if name == "confession_map":
+            fields = {key: value for key, value in document.items() if key not in ("guild_id", "index")}
+            requests.append((guild_id, document["index"], fields, True))
+            last_index = max(last_index, document["index"])
+            confession_map_cache.invalidate((guild_id, document["index"]))
+            _message_index_cache.invalidate((guild_id, document.get("message_id")))
+        elif name == "guild_counters":
+            last_index = max(last_index, document.get("index", 0))
+        elif name == "confession_bans":
+            await db.add_ban(guild_id, document["user_id"], {
+                "expires_at": _utc(document.get("expires_at")),
+                "reason": document.get("reason"),
+                "moderator_id": document.get("moderator_id"),
+            })
+            ban_cache.invalidate(guild_id)
+        elif name == "confession_audit":
+            audit.append({**document, "guild_id": guild_id, "created_at": _utc(document["created_at"])})
+        elif name in _CONFIG_CACHES:
+            # Stamping updated_at lets other processes refresh their caches.
+            document.pop("updated_at", None)
+            await db.update_config(name, guild_id, document)
+            _CONFIG_CACHES[name].invalidate(guild_id)
+        else:
+            raise ValueError(f"Unknown collection in import: {name!r}")
+    if requests:
+        await db.bulk_update_map(requests)
+    if audit:
+        await db.add_audit_records(audit)
+    if last_index:
+        await advance_confession_index(db, guild_id, last_index)
+
+# --- Retention (Cold Archive) ---
+# Entries older than a guild's retention horizon are moved out of
+# confession_map into confession_archive. There they are grouped into one
+# bucket document per ARCHIVE_BUCKET_SIZE consecutive indices, and use short
+# field names:
+#     {"g": guild_id, "s": first index, "e": {"<offset>": {"c", "m", "t", "x", "p", "h"}},
+#      "ms": [message IDs of the entries]}
+# That turns hundreds of documents and index entries into one.
+# get_confession_map() and get_confession_by_message_id() fall back to the
+# archive, so old confessions can still be replied to, and
+# set_confession_thread() records threads on archived entries too. The
+# archive is Mongo only; with the other backends, entries stay in the map.
+# Archiving is off unless CONFESSION_RETENTION_DAYS or !retention sets a
+# number of days.
+ARCHIVE_BUCKET_SIZE = int(os.environ.get("ARCHIVE_BUCKET_SIZE", 256))
+RETENTION_DAYS = int(os.environ.get("CONFESSION_RETENTION_DAYS", 0))
+
+_ARCHIVE_FIELDS = {
+    "channel_id": "c",
+    "message_id": "m",
+    "type": "t",
+    "content": "x",
+    "parent_index": "p",
+    "thread_id": "h",
+}
+
+def _bucket_start(index):
+    return index - index % ARCHIVE_BUCKET_SIZE
+
+def _expand_archived(guild_id, index, entry):
+    document = {"guild_id": guild_id, "index": index}
+    for field, short in _ARCHIVE_FIELDS.items():
+        if short in entry:
+            document[field] = entry[short]
+    if "content" in document:
+        document["preview"] = _preview(document["content"])
+    return document
+
+@_timed
+async def _find_archived(db, guild_id, index):
+    if db.mongo is None:
+        return None
+    start = _bucket_start(index)
+    offset = str(index - start)
+    bucket = await db.mongo.confession_archive.find_one({"g": guild_id, "s": start}, {f"e.{offset}": 1})
+    entry = bucket and bucket.get("e", {}).get(offset)
+    return _expand_archived(guild_id, index, entry) if entry else None
+
+@_timed
+async def _find_archived_by_message(db, guild_id, message_id):
+    if db.mongo is None:
+        return None
+    bucket = await db.mongo.confession_archive.find_one({"g": guild_id, "ms": message_id}, {"s": 1, "e": 1})
+    for offset, entry in (bucket or {}).get("e", {}).items():
+        if entry.get("m") == message_id:
+            return _expand_archived(guild_id, bucket["s"] + int(offset), entry)
+    return None
+
+@_timed
+async def _set_archived_thread(db, guild_id, index, thread_id):
+    start = _bucket_start(index)
+    offset = index - start
+    await db.mongo.confession_archive.update_one(
+        {"g": guild_id, "s": start, f"e.{offset}": {"$exists": True}},
+        {"$set": {f"e.{offset}.h": thread_id}},
+    )
+
+async def iter_archived(db, guild_id, batch_size=100):
+    """Yields a guild's archived entries in the confession_map format."""
+    if db.mongo is None:
+        return
+    cursor = db.mongo.confession_archive.find({"g": guild_id}).sort("s", pymongo.ASCENDING).batch_size(batch_size)
+    async for bucket in cursor:
+        for offset, entry in sorted(bucket["e"].items(), key=lambda item: int(item[0])):
+            yield _expand_archived(guild_id, bucket["s"] + int(offset), entry)
+
+@_timed
+async def set_retention_days(db, guild_id, days):
+    """Sets how many days confessions stay in the hot collection (0 keeps them forever)."""
+    await _update_config(db, "guild_config", guild_id, {"retention_days": days})
+
+async def get_retention_days(db, guild_id):
+    config = await get_confession_channel(db, guild_id)
+    return config.get("retention_days", RETENTION_DAYS) if config else RETENTION_DAYS
+
+@_timed
+async def archive_confessions(db, guild_id, before_message_id, batch_size=500):
+    """Moves a guild's entries posted before `before_message_id` into the archive.
+
+    Entries are taken in index order, stopping at the first one that is still
+    inside the horizon. Each batch is written to the archive before it is
+    deleted from confession_map, so an interrupted run loses nothing; the
+    next run rewrites the same entries. Returns the number of entries moved.
+    """
+    mongo = db.mongo
+    if mongo is None:
+        return 0
+    if WRITE_BEHIND:
+        await flush_writes(db)
+    moved = 0
+    while True:
+        cursor = mongo.confession_map.find({"guild_id": guild_id}).sort("index", pymongo.ASCENDING).limit(batch_size)
+        documents = []
+        async for document in cursor:
+            if document["message_id"] >= before_message_id:
+                break
+            documents.append(document)
+        if not documents:
+            return moved
+
+        buckets = {}
+        message_ids = {}
+        for document in documents:
+            start = _bucket_start(document["index"])
+            entry = {short: document[field] for field, short in _ARCHIVE_FIELDS.items() if document.get(field) is not None}
+            buckets.setdefault(start, {})[f"e.{document['index'] - start}"] = entry
+            message_ids.setdefault(start, []).append(document["message_id"])
+        await mongo.confession_archive.bulk_write([
+            pymongo.UpdateOne(
+                {"g": guild_id, "s": start},
+                {"$set": entries, "$addToSet": {"ms": {"$each": message_ids[start]}}},
+                upsert=True,
+            )
+            for start, entries in buckets.items()
+        ], ordered=False)
+        await mongo.confession_map.delete_many({"_id": {"$in": [document["_id"] for document in documents]}})
+        moved += len(documents)
+        if len(documents) < batch_size:
+            return moved
+
+async def _collection_stats(db, name):
+    stats = {}
+    if db.mongo is not None:
+        try:
+            stats = await db.mongo.command("collStats", name)
+        except PyMongoError as e:
+            print(f"collStats failed for {name}: {e}")
+    return {
+        "documents": stats.get("count", 0),
+        "size_bytes": stats.get("size", 0),
+        "storage_bytes": stats.get("storageSize", 0),
+        "index_bytes": stats.get("totalIndexSize", 0),
+    }
+
+@_timed
+async def retention_stats(db, guild_id=None):
+    """Returns the sizes of the hot and cold tiers, plus entry counts for one guild.
+
+    Sizes are only known with Mongo; other backends report zeros.
+    """
+    stats = {
+        "hot": await _collection_stats(db, "confession_map"),
+        "cold": await _collection_stats(db, "confession_archive"),
+    }
+    if guild_id is not None:
+        stats["hot"]["guild_entries"] = await db.count_map(guild_id)
+        cold = []
+        if db.mongo is not None:
+            cold = await db.mongo.confession_archive.aggregate([
+                {"$match": {"g": guild_id}},
+                {"$group": {"_id": None, "buckets": {"$sum": 1}, "entries": {"$sum": {"$size": {"$objectToArray": "$e"}}}}},
+            ]).to_list(1)
+        stats["cold"]["guild_buckets"] = cold[0]["buckets"] if cold else 0
+        stats["cold"]["guild_entries"] = cold[0]["entries"] if cold else 0
+    return stats
+
+# --- Spool Replay ---
+def _spool_first():
+    """Returns whether a write should go straight to the spool.
+
+    Only reads the breaker's state, so a half-open trial is left to calls
+    that report their outcome.
+    """
+    return spool.backlog(*_SPOOLED_WRITES) > 0 or breaker.state == "open"
+
+def _spool_map_update(guild_id, index, fields, upsert):
+    spool.append("map_update", {"guild_id": guild_id, "index": index, "fields": fields, "upsert": upsert})
+
+def _spool_archived_thread(guild_id, index, thread_id):
+    spool.append("archived_thread", {"guild_id": guild_id, "index": index, "thread_id": thread_id})
+
+def _spool_audit(record):
+    spool.append("audit", {**record, "created_at": record["created_at"].timestamp()})
+
+def spool_event(kind, payload):
+    """Spools an operation for a handler passed to replay_spool()."""
+    spool.append(kind, payload)
+
+def spool_buffered_writes():
+    """Moves write-behind entries that couldn't be flushed into the spool (used on shutdown)."""
+    for buffer in (_inflight_writes, _pending_writes):
+        for (guild_id, index), entry in buffer.items():
+            _spool_map_update(guild_id, index, entry["fields"], entry["upsert"])
+        buffer.clear()
+    _pending_by_message.clear()
+    for record in _pending_audit:
+        _spool_audit(record)
+    del _pending_audit[:]
+
+@_timed
+async def _replay_map_update(db, guild_id, index, fields, upsert):
+    await db.update_map(guild_id, index, fields, upsert)
+    confession_map_cache.invalidate((guild_id, index))
+
+@_timed
+async def _replay_audit(db, record):
+    record["created_at"] = datetime.datetime.fromtimestamp(record["created_at"], datetime.timezone.utc)
+    await db.add_audit_records([record])
+
+async def replay_spool(db, handlers):
+    """Replays spooled operations in order and returns how many were replayed.
+
+    Map updates, archived thread IDs and audit records are replayed here;
+    other kinds go to ``handlers[kind](payload)``. Entries of a kind with no
+    handler registered yet (its cog hasn't loaded) are left in the spool for
+    a later pass, and the rest are replayed past them. Stops when Mongo is
+    still unavailable; entries that fail for any other reason are dropped so
+    they can't block the rest.
+    """
+    replayed = 0
+    last_id = 0
+    while entries := spool.peek(after=last_id):
+        for entry_id, kind, payload in entries:
+            last_id = entry_id
+            try:
+                if kind == "map_update":
+                    await _replay_map_update(db, payload["guild_id"], payload["index"], payload["fields"], payload["upsert"])
+                elif kind == "audit":
+                    await _replay_audit(db, payload)
+                elif kind == "archived_thread":
+                    await _set_archived_thread(db, payload["guild_id"], payload["index"], payload["thread_id"])
+                elif kind in handlers:
+                    await handlers[kind](payload)
+                else:
+                    continue
+            except Exception as e:
+                if is_unavailable(e):
+                    return replayed
+                print(f"Spool: dropping {kind} entry {entry_id}: {e}")
+            spool.remove(entry_id, kind)
+            replayed += 1
+    return replayed
+
+async def replay_spool_forever(db, handlers):
+    """Replays the spool whenever it has a backlog and the breaker isn't open. Runs until cancelled."""
+    while True:
+        await asyncio.sleep(SPOOL_REPLAY_INTERVAL)
+        if not len(spool) or breaker.state == "open":
+            continue
+        try:
+            replayed = await replay_spool(db, handlers)
+        except Exception as e:
+            print(f"Spool replay failed: {e}")
+            continue
+        if replayed:
+            print(f"Spool: replayed {replayed} operations, {len(spool)} left.")
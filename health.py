@@ -0,0 +1,103 @@
+import os
+import math
+import asyncio
+from aiohttp import web
+import database as db
+import memory
+import metrics
+
+# --- Health & Metrics Server ---
+# Runs on the bot's own event loop. "/" stays a plain liveness check for the
+# hosting platform; "/healthz" reports readiness and "/metrics" is scraped by
+# Prometheus.
+MONGO_PING_TIMEOUT = float(os.environ.get("MONGO_PING_TIMEOUT", 2.0))
+
+async def _ping_database(bot):
+    try:
+        await asyncio.wait_for(bot.db.ping(), timeout=MONGO_PING_TIMEOUT)
+        return True
+    except Exception as e:
+        print(f"Health check: {bot.db.name} ping failed: {e}")
+        return False
+
+def _ms(latency):
+    return round(latency * 1000, 1) if math.isfinite(latency) else None
+
+def _shard_health(bot):
+    """Returns {shard_id: {"connected", "latency_ms"}} for the shards this process runs."""
+    shards = getattr(bot, "shards", None) or {}
+    return {
+        shard_id: {"connected": not shard.is_closed(), "latency_ms": _ms(shard.latency)}
+        for shard_id, shard in shards.items()
+    }
+
+def create_app(bot):
+    async def alive(request):
+        return web.Response(text="I am alive and running!")
+
+    async def healthz(request):
+        latency = bot.latency
+        shards = _shard_health(bot)
+        gateway_ok = (bot.is_ready() and not bot.is_closed() and math.isfinite(latency)
+                      and all(shard["connected"] for shard in shards.values()))
+        database_ok = await _ping_database(bot)
+        body = {
+            "status": "ok" if gateway_ok and database_ok else "unavailable",
+            "cluster_id": int(os.environ.get("CLUSTER_ID", 0)),
+            "cluster_count": int(os.environ.get("CLUSTER_COUNT", 1)),
+            "gateway": {
+                "ready": bot.is_ready(),
+                "latency_ms": _ms(latency),
+                "shards": shards,
+            },
+            "database": {"backend": bot.db.name, "ok": database_ok, "breaker": db.breaker.state, "spool_backlog": len(db.spool)},
+            "startup": bot.startup.to_dict(),
+        }
+        return web.json_response(body, status=200 if gateway_ok and database_ok else 503)
+
+    async def metrics_endpoint(request):
+        return web.Response(text=metrics.render(), content_type="text/plain", headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/", alive)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics_endpoint)
+    return app
+
+async def start_health_server(bot, port):
+    """Starts the HTTP server and returns its runner (call runner.cleanup() to stop)."""
+    runner = web.AppRunner(create_app(bot), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host="0.0.0.0", port=port).start()
+    print(f"Health server listening on port {port}.")
+    return runner
+
+def register_bot_gauges(bot):
+    """Exposes the bot's internal counters (caches, queues, tasks) as gauges."""
+    metrics.Gauge("gateway_latency_seconds", "Gateway heartbeat latency.",
+                  lambda: bot.latency if math.isfinite(bot.latency) else -1)
+    metrics.Gauge("shard_latency_seconds", "Gateway heartbeat latency, by shard.",
+                  lambda: {(("shard", shard_id),): latency if math.isfinite(latency) else -1
+                           for shard_id, latency in getattr(bot, "latencies", [])})
+    metrics.Gauge("process_resident_memory_bytes", "Resident memory size.", memory.rss_bytes)
+    metrics.Gauge("cached_messages", "Messages held in the client cache.", lambda: len(bot.cached_messages))
+    metrics.Gauge("cached_members", "Members held in the client cache.", lambda: sum(len(g.members) for g in bot.guilds))
+    metrics.Gauge("config_cache_hits", "Config cache hits, by cache.",
+                  lambda: {(("cache", name),): stats["hits"] for name, stats in db.cache_stats().items()})
+    metrics.Gauge("config_cache_misses", "Config cache misses, by cache.",
+                  lambda: {(("cache", name),): stats["misses"] for name, stats in db.cache_stats().items()})
+    metrics.Gauge("write_behind_pending", "Confession map updates waiting to be flushed.",
+                  lambda: len(db._pending_writes) + len(db._inflight_writes))
+    metrics.Gauge("spool_backlog", "Operations spooled to disk while the database was unavailable.", lambda: len(db.spool))
+    metrics.Gauge("db_breaker_state", "Database circuit breaker state (1 for the current state).",
+                  lambda: {(("state", state),): int(db.breaker.state == state) for state in ("closed", "half_open", "open")})
+    metrics.Gauge("log_queue_depth", "Log embeds waiting to be sent.", lambda: bot.log_dispatcher.depth)
+    metrics.Gauge("log_dropped", "Log embeds dropped because the queue was full.", lambda: bot.log_dispatcher.dropped)
+    metrics.Gauge("log_failed", "Log embeds that could not be delivered.", lambda: bot.log_dispatcher.failed)
+    metrics.Gauge("submission_queue_depth", "Submissions waiting for a worker.", lambda: bot.scheduler.stats()["queued"])
+    metrics.Gauge("submission_workers_busy", "Scheduler workers posting a submission.", lambda: bot.scheduler.busy)
+    metrics.Gauge("attachment_transfers_active", "Attachments being downloaded or re-uploaded.", lambda: bot.attachments.active)
+    metrics.Gauge("startup_phase_seconds", "Time spent in each startup phase.",
+                  lambda: {(("phase", name),): phase["seconds"] for name, phase in bot.startup.phases.items()})
+    metrics.Gauge("background_tasks_running", "Post-send tasks in flight.", lambda: len(bot.background))
+    metrics.Gauge("background_tasks_failed", "Post-send tasks that raised.", lambda: bot.background.failed)
@@ -0,0 +1,135 @@
+import os
+import asyncio
+from collections import deque
+import discord
+import metrics
+from tracing import span
+
+# --- Log Dispatcher ---
+# Log embeds are queued per destination channel and sent in the background,
+# coalescing up to MAX_EMBEDS_PER_MESSAGE embeds into a single message so a
+# burst of confessions costs one request per flush instead of one each.
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 1000))
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", 2.0))
+LOG_MAX_RETRIES = int(os.environ.get("LOG_MAX_RETRIES", 5))
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+class LogDispatcher:
+    """Batches log embeds by destination channel and sends them off the hot path."""
+
+    def __init__(self, max_queue=LOG_QUEUE_SIZE, flush_interval=LOG_FLUSH_INTERVAL, max_retries=LOG_MAX_RETRIES):
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queues = {}   # channel_id -> deque of embeds
+        self._channels = {}
+        self._wakeups = {}
+        self._workers = {}
+        self._closing = False
+        self.depth = 0
+        self.dropped = 0
+        self.failed = 0
+        self.sent_messages = 0
+        self.sent_embeds = 0
+
+    def enqueue(self, channel, embed):
+        """Queues an embed for a channel. Returns False if it had to be dropped."""
+        if self._closing or self.depth >= self.max_queue:
+            self.dropped += 1
+            return False
+
+        queue = self._queues.setdefault(channel.id, deque())
+        queue.append(embed)
+        self._channels[channel.id] = channel
+        self.depth += 1
+
+        if channel.id not in self._workers:
+            self._wakeups[channel.id] = asyncio.Event()
+            self._workers[channel.id] = asyncio.create_task(self._run(channel.id))
+        elif len(queue) >= MAX_EMBEDS_PER_MESSAGE:
+            self._wakeups[channel.id].set()
+        return True
+
+    def stats(self):
+        return {
+            "queue_depth": self.depth,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "sent_messages": self.sent_messages,
+            "sent_embeds": self.sent_embeds,
+        }
+
+    def _take_batch(self, queue):
+        batch = []
+        chars = 0
+        while queue and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(queue[0])
+            if batch and chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(queue.popleft())
+            chars += size
+        self.depth -= len(batch)
+        return batch
+
+    async def _run(self, channel_id):
+        queue = self._queues[channel_id]
+        wakeup = self._wakeups[channel_id]
+        try:
+            while queue:
+                if len(queue) < MAX_EMBEDS_PER_MESSAGE and not self._closing:
+                    # Give the burst a moment to fill up the batch.
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), timeout=self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                wakeup.clear()
+                await self._send(self._channels[channel_id], self._take_batch(queue))
+        finally:
+            del self._workers[channel_id]
+            if not queue:
+                del self._queues[channel_id], self._channels[channel_id], self._wakeups[channel_id]
+
+    async def _send(self, channel, batch):
+        delay = 1.0
+        for attempt in range(self.max_retries):
+            try:
+                with metrics.DISCORD_SEND_LATENCY.time(kind="log"), span("log.send", channel.guild.id):
+                    await channel.send(embeds=batch)
+                self.sent_messages += 1
+                self.sent_embeds += len(batch)
+                return
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    if e.status == 400 and len(batch) > 1:
+                        # One bad embed rejects the whole message; send them
+                        # one by one so only that one is lost. Other 4xx
+                        # (missing access, deleted channel) would fail for
+                        # every embed, so the batch is dropped.
+                        for embed in batch:
+                            await self._send(channel, [embed])
+                        return
+                    print(f"Error sending log: {e}")
+                    break
+                if attempt + 1 < self.max_retries:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+            except Exception as e:
+                print(f"Error sending log: {e}")
+                break
+        self.failed += len(batch)
+
+    async def close(self, timeout=10.0):
+        """Stops accepting embeds and flushes everything already queued."""
+        self._closing = True
+        for wakeup in self._wakeups.values():
+            wakeup.set()
+        workers = list(self._workers.values())
+        if not workers:
+            return
+        done, pending = await asyncio.wait(workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"Log dispatcher: {self.depth} log embeds were not delivered before shutdown.")
@@ -1,77 +1,206 @@
+import startup # First, so the startup report times the imports below
 import os
+import time
+import json
+import hashlib
 import discord
-import motor.motor_asyncio
 import asyncio
-import threading  # <-- Add this
-from flask import Flask  # <-- Add this
 from discord.ext import commands
+import database as db
+from log_dispatcher import LogDispatcher
+from background import BackgroundTasks
+from scheduler import SubmissionScheduler
+from attachments import AttachmentPipeline
+from health import start_health_server, register_bot_gauges
+from cluster import parse_shard_ids
+import storage
+import memory
 
-# --- Flask Web App Setup ---
-# This part keeps Koyeb's free tier alive
-app = Flask(__name__)
-
-@app.route('/')
-def health_check():
-    # This is the webpage Koyeb will check
-    return "I am alive and running!"
-
-def run_flask_app():
-    # Runs the web app on Koyeb's port
-    port = int(os.environ.get('PORT', 8000))
-    app.run(host='0.0.0.0', port=port)
+IMPORTS_DONE = time.perf_counter()
 
 # --- Discord Bot Setup ---
-intents = discord.Intents.default()
-intents.guilds = True
-intents.messages = True
-intents.message_content = True
+# Intents and cache sizes come from the memory profile (see memory.py)
+client_options = memory.client_options()
+
+# --- Sharding ---
+# Run on its own, the bot auto-shards inside one process. cluster.py runs
+# several copies of this file, passing each one a range of shards.
+CLUSTER_ID = int(os.environ.get('CLUSTER_ID', 0))
+SHARD_COUNT = int(os.environ['SHARD_COUNT']) if os.environ.get('SHARD_COUNT') else None
+SHARD_IDS = parse_shard_ids(os.environ['SHARD_IDS']) if os.environ.get('SHARD_IDS') else None
 
-class ConfessionBot(commands.Bot):
+class ConfessionBot(commands.AutoShardedBot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.config_watcher = None
+        self.spool_replayer = None
+        self.spool_handlers = {}
+        self.commands_synced = False
+        self.stored_tree_hash = None
+        self.warmup = None
+        self.startup = startup.StartupReport()
+        self.startup.record("imports", startup.PROCESS_STARTED, IMPORTS_DONE)
+        self._login_started = None
+        self._gateway_started = None
+        self.log_dispatcher = LogDispatcher()
+        self.background = BackgroundTasks()
+        self.scheduler = SubmissionScheduler()
+        self.attachments = AttachmentPipeline()
         try:
-            self.mongo_client = motor.motor_asyncio.AsyncIOMotorClient(os.environ['MONGO_URI'])
-            self.db = self.mongo_client["confession_bot_db"]
-            print("Successfully connected to MongoDB (async).")
+            self.db = storage.open_storage()
+            print(f"Using the {self.db.name} storage backend.")
         except Exception as e:
-            print(f"Error connecting to MongoDB: {e}")
+            print(f"Error opening the {storage.STORAGE_BACKEND} storage backend: {e}")
             exit()
     
+    async def login(self, token):
+        self._login_started = time.perf_counter()
+        await super().login(token)
+
     async def setup_hook(self):
-        print("Loading cogs...")
-        for filename in os.listdir('./cogs'):
-            if filename.endswith('.py'):
-                try:
-                    await self.load_extension(f'cogs.{filename[:-3]}')
-                    print(f"Loaded cog: {filename}")
-                except Exception as e:
-                    print(f"Failed to load cog {filename}: {e}")
+        if self._login_started:
+            self.startup.record("login", self._login_started)
+        # The database warms up while the cogs load and the gateway connects.
+        self.warmup = asyncio.create_task(self._warm_up())
+        if len(db.spool):
+            print(f"Spool: {len(db.spool)} operations waiting to be replayed.")
+        await self.load_cogs()
+        self._gateway_started = time.perf_counter()
+
+    def _owns_guild(self, guild_id):
+        """Returns whether one of this process's shards serves the guild."""
+        if SHARD_IDS is None or SHARD_COUNT is None:
+            return True # Auto-sharded: this process runs every shard
+        return (guild_id >> 22) % SHARD_COUNT in SHARD_IDS
+
+    async def _warm_up(self):
+        """Connects to the database, creates indexes, warms the config caches and prefetches the tree hash."""
+        try:
+            with self.startup.phase("db_connect"):
+                await self.db.ping()
+            with self.startup.phase("indexes"):
+                await db.ensure_indexes(self.db)
+            with self.startup.phase("config_cache"):
+                warmed = await db.warm_config_caches(self.db, self._owns_guild)
+            print(f"Config cache: loaded {warmed} configs.")
+            if CLUSTER_ID == 0:
+                self.stored_tree_hash = await db.get_command_tree_hash(self.db)
+        except Exception as e:
+            print(f"Database warm-up failed: {e}")
+        self.config_watcher = asyncio.create_task(db.watch_config_changes(self.db))
+        self.spool_replayer = asyncio.create_task(db.replay_spool_forever(self.db, self.spool_handlers))
+
+    async def load_cogs(self):
+        """Loads every cog in ./cogs concurrently, recording how long each took."""
+        names = sorted(filename[:-3] for filename in os.listdir('./cogs') if filename.endswith('.py'))
+        with self.startup.phase("cogs"):
+            await asyncio.gather(*(self._load_cog(name) for name in names))
+        print(f"Loaded {len(self.startup.cogs)} of {len(names)} cogs.")
+
+    async def _load_cog(self, name):
+        started = time.perf_counter()
+        try:
+            await self.load_extension(f'cogs.{name}')
+        except Exception as e:
+            self.startup.failed_cogs[name] = f"{type(e).__name__}: {e}"
+            print(f"Failed to load cog {name}: {e}")
+            if startup.COG_LOAD_STRICT:
+                raise
+        else:
+            self.startup.cogs[name] = round(time.perf_counter() - started, 4)
         
     async def on_ready(self):
-        print(f'Logged in as {self.user} (ID: {self.user.id})')
+        print(f'Logged in as {self.user} (ID: {self.user.id}), cluster {CLUSTER_ID}, shards {sorted(self.shards)}')
+        first_ready = self.startup.ready_at is None
+        if first_ready:
+            if self._gateway_started:
+                self.startup.record("gateway", self._gateway_started)
+            if self.warmup:
+                await self.warmup # Usually finished long before the gateway
+        # on_ready fires again after every reconnect, but the tree only needs
+        # syncing once per process. Commands are global, so only one cluster
+        # registers them.
+        if CLUSTER_ID == 0 and not self.commands_synced:
+            try:
+                with self.startup.phase("command_sync"):
+                    synced = await self.sync_commands()
+                if synced is None:
+                    print("Slash commands unchanged, skipped sync.")
+                else:
+                    print(f"Synced {len(synced)} slash commands.")
+            except Exception as e:
+                print(f"Failed to sync commands: {e}")
+        if first_ready:
+            self.startup.ready()
+            self.startup.emit()
+        if memory.MEMORY_REPORT:
+            print(memory.format_report(memory.memory_report(self)))
+        print('-----------------------------------------')
+
+    def command_tree_hash(self):
+        """Hashes every app command's name, description, options and permissions."""
+        payload = sorted(
+            (command.to_dict(self.tree) for command_type in discord.AppCommandType
+             for command in self.tree.get_commands(type=command_type)),
+            key=lambda command: (command.get('type', 1), command['name'])
+        )
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def sync_commands(self, force=False):
+        """Syncs the command tree if it changed since the last sync.
+
+        Returns the synced commands, or None if the sync was skipped.
+        """
+        digest = self.command_tree_hash()
+        stored = self.stored_tree_hash or await db.get_command_tree_hash(self.db)
+        if not force and digest == stored:
+            self.commands_synced = True
+            return None
+        synced = await self.tree.sync()
+        await db.set_command_tree_hash(self.db, digest)
+        self.stored_tree_hash = digest
+        self.commands_synced = True
+        return synced
+
+    async def close(self):
+        for task in (self.warmup, self.config_watcher, self.spool_replayer):
+            if task:
+                task.cancel()
+        await self.scheduler.close()
+        await self.background.drain()
+        await self.attachments.close()
+        await self.log_dispatcher.close()
+        await super().close()
+        try:
+            await db.flush_writes(self.db)
+        except Exception:
+            db.spool_buffered_writes()
         try:
-            synced = await self.tree.sync() 
-            print(f"Synced {len(synced)} slash commands.")
+            await db.release_index_blocks(self.db)
         except Exception as e:
-            print(f"Failed to sync commands: {e}")
-        print('-----------------------------------------')
+            print(f"Failed to release index blocks: {e}")
+        db.spool.close()
+        await self.db.close()
 
 bot = ConfessionBot(
     command_prefix=commands.when_mentioned_or("!"),
-    intents=intents,
-    help_command=None
+    help_command=None,
+    shard_count=SHARD_COUNT,
+    shard_ids=SHARD_IDS,
+    **client_options
 )
 
 async def run_bot_async():
-    async with bot:
-        await bot.start(os.environ['DISCORD_TOKEN'])
+    # The health server shares the bot's event loop and keeps Koyeb's free tier alive
+    register_bot_gauges(bot)
+    health_runner = await start_health_server(bot, int(os.environ.get('PORT', 8000)))
+    try:
+        async with bot:
+            await bot.start(os.environ['DISCORD_TOKEN'])
+    finally:
+        await health_runner.cleanup()
 
 # --- Main Entry Point ---
 if __name__ == "__main__":
-    # 1. Start the Flask web app in a separate thread
-    flask_thread = threading.Thread(target=run_flask_app)
-    flask_thread.start()
-    
-    # 2. Run the Discord bot in the main thread
     print("Starting bot...")
     asyncio.run(run_bot_async())
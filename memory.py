@@ -0,0 +1,88 @@
+import os
+import sys
+import resource
+import discord
+
+# --- Memory Profiles ---
+# "default" keeps the original client settings. "lean" is meant for large
+# guild counts:
+#   - no message_content intent (prefix commands then need a mention,
+#     e.g. "@Bot count 5")
+#   - no message cache (the bot edits its own messages through partial messages)
+#   - no member cache and no guild chunking at startup
+# Set CONFESSION_MEMORY_PROFILE to pick one. CONFESSION_MAX_MESSAGES overrides
+# the message cache size for either profile.
+MEMORY_PROFILE = os.environ.get("CONFESSION_MEMORY_PROFILE", "default")
+MEMORY_REPORT = os.environ.get("CONFESSION_MEMORY_REPORT", "0") == "1"
+
+def client_options(profile=MEMORY_PROFILE):
+    """Returns the discord.Client keyword arguments for a memory profile."""
+    if profile == "lean":
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        options = {
+            "intents": intents,
+            "max_messages": None,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False,
+        }
+    elif profile == "default":
+        intents = discord.Intents.default()
+        intents.guilds = True
+        intents.messages = True
+        intents.message_content = True
+        options = {"intents": intents}
+    else:
+        raise ValueError(f"Unknown memory profile: {profile!r}")
+
+    if os.environ.get("CONFESSION_MAX_MESSAGES"):
+        max_messages = int(os.environ["CONFESSION_MAX_MESSAGES"])
+        options["max_messages"] = max_messages or None
+    return options
+
+def rss_bytes():
+    """Returns the current resident set size, or the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def memory_report(bot):
+    """Summarises RSS and the client's cached objects, in total and per guild."""
+    guilds = bot.guilds
+    totals = {
+        "members": sum(len(guild.members) for guild in guilds),
+        "channels": sum(len(guild.channels) for guild in guilds),
+        "threads": sum(len(guild.threads) for guild in guilds),
+        "roles": sum(len(guild.roles) for guild in guilds),
+        "emojis": sum(len(guild.emojis) for guild in guilds),
+        "messages": len(bot.cached_messages),
+        "users": len(bot.users),
+    }
+    count = max(len(guilds), 1)
+    rss = rss_bytes()
+    return {
+        "profile": MEMORY_PROFILE,
+        "rss_mb": round(rss / 1024 / 1024, 1),
+        "guilds": len(guilds),
+        "rss_kb_per_guild": round(rss / 1024 / count, 1),
+        "totals": totals,
+        "per_guild": {name: round(value / count, 2) for name, value in totals.items()},
+    }
+
+def format_report(report):
+    lines = [
+        f"profile {report['profile']}: {report['rss_mb']} MB RSS, {report['guilds']} guilds, "
+        f"{report['rss_kb_per_guild']} KB per guild",
+        f"{'cached':<10}{'total':>10}{'per guild':>12}",
+    ]
+    for name, total in report["totals"].items():
+        lines.append(f"{name:<10}{total:>10}{report['per_guild'][name]:>12}")
+    return "\n".join(lines)
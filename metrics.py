@@ -0,0 +1,125 @@
+import time
+from contextlib import contextmanager
+
+# --- Metrics ---
+# A small in-process metrics registry rendered in the Prometheus text format
+# by the /metrics endpoint. Labels are passed as keyword arguments.
+
+_registry = []
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
+
+class Counter:
+    """A monotonically increasing value, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield self.name, dict(key), value
+
+class Gauge:
+    """A value read from a callback at scrape time.
+
+    The callback returns either a number or a dict mapping label dicts (as
+    tuples of pairs) to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        _registry.append(self)
+
+    def samples(self):
+        value = self.callback()
+        if isinstance(value, dict):
+            for key, sample in value.items():
+                yield self.name, dict(key), sample
+        else:
+            yield self.name, {}, value
+
+class Histogram:
+    """Counts observations into cumulative buckets (in seconds)."""
+
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        for key, series in self._series.items():
+            labels = dict(key)
+            for bound, count in zip(self.buckets, series):
+                yield f"{self.name}_bucket", {**labels, "le": bound}, count
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, series[-2]
+            yield f"{self.name}_count", labels, series[-2]
+            yield f"{self.name}_sum", labels, series[-1]
+
+def render():
+    """Renders every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        except Exception as e:
+            print(f"Metrics Error: {metric.name} failed to collect: {e}")
+    return "\n".join(lines) + "\n"
+
+# --- Bot Metrics ---
+CONFESSIONS = Counter("confessions_total", "Original confessions posted.")
+REPLIES = Counter("replies_total", "Anonymous replies posted.")
+ERRORS = Counter("errors_total", "Errors surfaced to users, by source.")
+BANNED_SUBMISSIONS = Counter("banned_submissions_total", "Submissions rejected because the author is confession-banned.")
+SUBMISSIONS_REJECTED = Counter("submissions_rejected_total", "Submissions turned away by admission control, by reason.")
+ATTACHMENTS = Counter("attachments_total", "Attachments fetched for re-hosting, by outcome.")
+DB_LATENCY = Histogram("db_call_seconds", "Latency of database.py calls, by operation.")
+DISCORD_SEND_LATENCY = Histogram("discord_send_seconds", "Latency of Discord message sends, by kind.")
+SUBMISSION_QUEUE_WAIT = Histogram("submission_queue_wait_seconds", "Time submissions wait in their guild's queue for a worker, by kind.")
+ATTACHMENT_DOWNLOAD = Histogram("attachment_download_seconds", "Time to stream an attachment to a temporary file.")
@@ -0,0 +1,182 @@
+import os
+import math
+import time
+import asyncio
+from collections import deque
+import metrics
+from cache import TTLCache, MISSING
+
+# --- Submission Scheduler ---
+# Confessions and replies are posted by a shared pool of SCHEDULER_WORKERS
+# workers instead of inside each interaction handler. Every guild has its own
+# FIFO queue and at most one submission in flight, so indices are allocated
+# and posts land in submission order. Guilds with queued work take turns
+# round robin, so a burst in one guild queues behind itself instead of
+# starving the others of Mongo and Discord capacity.
+#
+# Admission control runs first and is synchronous: each user (per guild) and
+# each guild has a token bucket, and a guild's queue holds at most
+# SCHEDULER_GUILD_QUEUE submissions. Anything over the limits is rejected
+# with SubmissionRejected before it does any work.
+SCHEDULER_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", 32))
+SCHEDULER_GUILD_QUEUE = int(os.environ.get("SCHEDULER_GUILD_QUEUE", 25))
+SUBMIT_USER_RATE = float(os.environ.get("SUBMIT_USER_RATE", 0.2))     # tokens per second
+SUBMIT_USER_BURST = float(os.environ.get("SUBMIT_USER_BURST", 3))
+SUBMIT_GUILD_RATE = float(os.environ.get("SUBMIT_GUILD_RATE", 2))
+SUBMIT_GUILD_BURST = float(os.environ.get("SUBMIT_GUILD_BURST", 20))
+BUCKET_CACHE_SIZE = int(os.environ.get("BUCKET_CACHE_SIZE", 100_000))
+
+SHUTDOWN_MESSAGE = "⏳ The bot is restarting. Please try again in a minute."
+
+class SubmissionRejected(Exception):
+    """Raised when a submission is turned away; str() is the message for the user."""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+class TokenBuckets:
+    """Token buckets keyed by ID, refilled lazily when they are looked at.
+
+    A bucket that has been idle long enough to refill is the same as a new
+    one, so idle buckets are simply allowed to expire from the cache.
+    """
+
+    def __init__(self, rate, burst, maxsize=BUCKET_CACHE_SIZE):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = TTLCache(maxsize=maxsize, ttl=burst / rate if rate else 0)
+
+    def _tokens(self, key, now):
+        bucket = self._buckets.peek(key)
+        if bucket is MISSING:
+            return self.burst
+        tokens, updated = bucket
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def wait_time(self, key, now=None):
+        """Returns how many seconds until `key` has a token (0 if it has one now)."""
+        if not self.rate:
+            return 0.0
+        tokens = self._tokens(key, now or time.monotonic())
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key, now=None):
+        if not self.rate:
+            return
+        now = now or time.monotonic()
+        self._buckets.set(key, (self._tokens(key, now) - 1, now))
+
+class SubmissionScheduler:
+    """Runs submissions through per-guild ordered queues on a capped worker pool."""
+
+    def __init__(self, workers=SCHEDULER_WORKERS, guild_queue=SCHEDULER_GUILD_QUEUE,
+                 user_rate=SUBMIT_USER_RATE, user_burst=SUBMIT_USER_BURST,
+                 guild_rate=SUBMIT_GUILD_RATE, guild_burst=SUBMIT_GUILD_BURST):
+        self.workers = workers
+        self.guild_queue = guild_queue
+        self.user_buckets = TokenBuckets(user_rate, user_burst)
+        self.guild_buckets = TokenBuckets(guild_rate, guild_burst)
+        self._queues = {}        # guild_id -> deque of (future, job, enqueued_at, kind)
+        self._ready = deque()    # guilds with queued work and nothing in flight
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers = []
+        self._closing = False
+        self.depth = 0
+        self.busy = 0
+        self.rejected = 0
+
+    def check(self, guild_id, user_id):
+        """Raises SubmissionRejected if a submission would be turned away right now."""
+        if self._closing:
+            self._reject(SHUTDOWN_MESSAGE, "shutdown")
+        queue = self._queues.get(guild_id)
+        if queue is not None and len(queue) >= self.guild_queue:
+            self._reject("⏳ This server's confession queue is full. Please try again in a moment.", "guild_queue")
+        now = time.monotonic()
+        wait = self.user_buckets.wait_time((guild_id, user_id), now)
+        if wait:
+            self._reject(f"⏳ You're sending confessions too quickly. Please try again in {math.ceil(wait)}s.", "user_rate")
+        wait = self.guild_buckets.wait_time(guild_id, now)
+        if wait:
+            self._reject(f"⏳ This server is getting a lot of confessions right now. Please try again in {math.ceil(wait)}s.", "guild_rate")
+
+    def _reject(self, message, reason):
+        self.rejected += 1
+        metrics.SUBMISSIONS_REJECTED.inc(reason=reason)
+        raise SubmissionRejected(message, reason)
+
+    async def run(self, guild_id, user_id, job, kind="original"):
+        """Admits a submission, queues `job()` behind the guild's earlier ones and returns its result."""
+        self.check(guild_id, user_id)
+        now = time.monotonic()
+        self.user_buckets.take((guild_id, user_id), now)
+        self.guild_buckets.take(guild_id, now)
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            queue = self._queues[guild_id] = deque()
+            self._ready.append(guild_id)
+            self._wakeup.set()
+        queue.append((future, job, time.perf_counter(), kind))
+        self.depth += 1
+        self._idle.clear()
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        return await future
+
+    async def _work(self):
+        while True:
+            while not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            guild_id = self._ready.popleft()
+            queue = self._queues[guild_id]
+            future, job, enqueued_at, kind = queue.popleft()
+            metrics.SUBMISSION_QUEUE_WAIT.observe(time.perf_counter() - enqueued_at, kind=kind)
+            self.busy += 1
+            try:
+                if not future.done(): # The handler may have given up waiting
+                    try:
+                        result = await job()
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+            finally:
+                if not future.done(): # The worker was cancelled mid-job
+                    future.set_exception(SubmissionRejected(SHUTDOWN_MESSAGE, "shutdown"))
+                self.busy -= 1
+                self.depth -= 1
+                if queue:
+                    self._ready.append(guild_id)
+                    self._wakeup.set()
+                else:
+                    self._queues.pop(guild_id, None)
+                if not self.depth:
+                    self._idle.set()
+
+    def stats(self):
+        return {"queued": self.depth - self.busy, "busy": self.busy, "guilds": len(self._queues), "rejected": self.rejected}
+
+    async def close(self, timeout=10.0):
+        """Stops admitting, waits for queued submissions and stops the workers."""
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        for queue in self._queues.values():
+            for future, *_ in queue:
+                if not future.done():
+                    future.set_exception(SubmissionRejected(SHUTDOWN_MESSAGE, "shutdown"))
+        self._queues.clear()
+        self._ready.clear()
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import sqlite3
+from collections import Counter, deque
+
+# --- Circuit Breaker ---
+# Opens once failure_threshold failures happen within `window` seconds;
+# callers then fail fast instead of waiting on timeouts. Successes don't
+# reset the count, because many "successful" calls are cache hits that never
+# reached the server. After reset_timeout seconds the breaker half-opens and
+# lets a single trial call through; that call's outcome closes the breaker
+# or opens it again.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, window=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.window = window
+        self.failures = deque()
+        self.opened_at = None
+        self.trial_started = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Returns whether a call may go ahead."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        # Half open: one trial at a time. A trial that never reports back
+        # (e.g. it was cancelled) expires after reset_timeout.
+        now = time.monotonic()
+        if self.trial_started is None or now - self.trial_started >= self.reset_timeout:
+            self.trial_started = now
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is None:
+            return
+        print("Database circuit breaker closed.")
+        self.failures.clear()
+        self.opened_at = None
+        self.trial_started = None
+
+    def record_failure(self):
+        now = time.monotonic()
+        self.failures.append(now)
+        while self.failures and now - self.failures[0] > self.window:
+            self.failures.popleft()
+        self.trial_started = None
+        if self.opened_at is not None or len(self.failures) >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"Database circuit breaker opened after {len(self.failures)} failures.")
+            self.opened_at = now
+
+# --- Spool ---
+# An on-disk FIFO of operations that couldn't reach Mongo. SQLite keeps it
+# durable across restarts; entries are JSON payloads tagged with a kind and
+# replayed in insertion order. The file is only created on first use. The
+# backlog is counted per kind, so a kind that can't be replayed yet doesn't
+# hold up the others.
+class Spool:
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._backlog = Counter()  # kind -> entries
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS spool ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._backlog = Counter(dict(self._connection.execute("SELECT kind, COUNT(*) FROM spool GROUP BY kind")))
+        return self._connection
+
+    def __len__(self):
+        return self.backlog()
+
+    def backlog(self, *kinds):
+        """Returns how many entries are spooled, of the given kinds or of any kind."""
+        if self._connection is None and not os.path.exists(self.path):
+            return 0
+        self._connect()
+        return sum(self._backlog[kind] for kind in kinds) if kinds else sum(self._backlog.values())
+
+    def append(self, kind, payload):
+        self._connect().execute(
+            "INSERT INTO spool (kind, payload, created_at) VALUES (?, ?, ?)",
+            (kind, json.dumps(payload), time.time())
+        )
+        self._backlog[kind] += 1
+
+    def peek(self, limit=100, after=0):
+        """Returns the oldest entries after id `after` as (id, kind, payload), without removing them."""
+        rows = self._connect().execute("SELECT id, kind, payload FROM spool WHERE id > ? ORDER BY id LIMIT ?", (after, limit))
+        return [(entry_id, kind, json.loads(payload)) for entry_id, kind, payload in rows]
+
+    def remove(self, entry_id, kind):
+        if self._connect().execute("DELETE FROM spool WHERE id = ?", (entry_id,)).rowcount:
+            self._backlog[kind] -= 1
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
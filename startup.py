@@ -0,0 +1,59 @@
+import os
+import json
+import time
+import contextlib
+
+# --- Startup Timing ---
+# main.py imports this module first, so PROCESS_STARTED marks the start of
+# its imports. Startup is split into phases, each recorded with its offset
+# from that point and its duration, and reported once as a single JSON line
+# when the bot is first ready:
+#   imports       importing main.py's dependencies
+#   login         the HTTP login, before setup_hook
+#   cogs          loading every cog concurrently (per-cog times under "cogs")
+#   db_connect    the first database round trip, overlapping the gateway login
+#   indexes       ensure_indexes, also overlapping the gateway login
+#   config_cache  loading this process's guild and log configs into their
+#                 caches (ban sets load per guild on first use)
+#   gateway       from setup_hook finishing to the first on_ready
+#   command_sync  comparing (and if needed syncing) the command tree
+# Set COG_LOAD_STRICT=1 to stop startup when a cog fails to load instead of
+# running without it.
+PROCESS_STARTED = time.perf_counter()
+COG_LOAD_STRICT = os.environ.get("COG_LOAD_STRICT", "0") == "1"
+
+class StartupReport:
+    """Collects startup phase timings and cog load results."""
+
+    def __init__(self, started=PROCESS_STARTED):
+        self.started = started
+        self.phases = {}       # name -> {"at": offset, "seconds": duration}
+        self.cogs = {}         # cog name -> load seconds
+        self.failed_cogs = {}  # cog name -> error
+        self.ready_at = None
+
+    def record(self, name, started, ended=None):
+        ended = ended or time.perf_counter()
+        self.phases[name] = {"at": round(started - self.started, 3), "seconds": round(ended - started, 3)}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+
+    def ready(self):
+        self.ready_at = time.perf_counter()
+
+    def to_dict(self):
+        return {
+            "ready_seconds": round(self.ready_at - self.started, 3) if self.ready_at else None,
+            "phases": dict(sorted(self.phases.items(), key=lambda item: item[1]["at"])),
+            "cogs": self.cogs,
+            "failed_cogs": self.failed_cogs,
+        }
+
+    def emit(self):
+        print(json.dumps({"event": "startup", **self.to_dict()}))
@@ -0,0 +1,921 @@
+import os
+import abc
+import json
+import asyncio
+import datetime
+import bisect
+import functools
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import pymongo
+from pymongo.errors import DuplicateKeyError
+
+# --- Storage Backends ---
+# database.py owns caching, index allocation, write-behind and the outage
+# handling. The reads and writes themselves go through one of these backends,
+# picked with STORAGE_BACKEND:
+#   mongo   MongoDB through Motor (default). Needed for several clusters,
+#           change-stream cache invalidation and the cold archive.
+#   sqlite  one embedded SQLite file in WAL mode (SQLITE_PATH). For
+#           single-process deployments; no network round trips.
+#   memory  plain dicts, lost on exit. For development and benchmarks.
+# Every backend implements the methods of Storage. benchmarks/storage_conformance.py
+# checks that they behave the same way.
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mongo")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "confessions.sqlite3")
+MONGO_DB_NAME = "confession_bot_db"
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+
+# The driver's defaults wait 30s to find a server and forever for a pooled
+# connection or a reply. These bounds keep a slow or unreachable Mongo from
+# stalling interactions past Discord's deadlines; the circuit breaker in
+# database.py takes over once failures pile up. Replies aren't bounded
+# client-wide, since index builds, archive writes and export cursors can
+# legitimately take longer; the calls on the submission path are bounded
+# one by one with MONGO_OPERATION_TIMEOUT_MS instead (see _bounded).
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": MONGO_MAX_POOL_SIZE,
+    "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', min(5, MONGO_MAX_POOL_SIZE))),
+    "maxIdleTimeMS": 60_000,
+    "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 3000)),
+    "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 3000)),
+    "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+    "retryWrites": True,
+    "retryReads": True,
+}
+MONGO_OPERATION_TIMEOUT_MS = int(os.environ.get('MONGO_OPERATION_TIMEOUT_MS', 10000))
+
+CONFIG_COLLECTIONS = ("guild_config", "log_config")
+# Confession map fields every backend stores. Other keys are ignored by
+# backends with a fixed schema.
+MAP_FIELDS = ("channel_id", "message_id", "type", "content", "preview", "parent_index", "thread_id")
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+class Storage(abc.ABC):
+    """The operations database.py needs from a backend.
+
+    Config documents look like Mongo's: ``{"_id": guild_id, ..., "updated_at"}``.
+    Map entries are ``{"guild_id", "index", <MAP_FIELDS that are set>}``.
+    """
+    name = None
+    mongo = None  # the Motor database, for the Mongo-only features
+
+    async def ensure_schema(self):
+        """Creates the tables or indexes the other methods rely on."""
+
+    @abc.abstractmethod
+    async def ping(self):
+        ...
+
+    async def close(self):
+        pass
+
+    # Guild and log config
+    @abc.abstractmethod
+    async def get_config(self, name, guild_id):
+        ...
+
+    @abc.abstractmethod
+    async def update_config(self, name, guild_id, fields):
+        """Sets fields on a config document, stamps updated_at and returns the result."""
+
+    @abc.abstractmethod
+    async def iter_configs(self, name, batch_size=1000):
+        """Yields every guild's config document of one kind, in guild ID order."""
+
+    # Counters
+    @abc.abstractmethod
+    async def get_counter(self, guild_id):
+        ...
+
+    @abc.abstractmethod
+    async def reserve_indices(self, guild_id, size):
+        """Adds `size` to the counter and returns the new value."""
+
+    @abc.abstractmethod
+    async def set_counter(self, guild_id, value):
+        ...
+
+    @abc.abstractmethod
+    async def advance_counter(self, guild_id, value):
+        """Raises the counter to `value` if it is lower."""
+
+    @abc.abstractmethod
+    async def release_indices(self, guild_id, last_index, value):
+        """Sets the counter to `value`, but only if it is still `last_index`."""
+
+    # Confession map
+    @abc.abstractmethod
+    async def update_map(self, guild_id, index, fields, upsert):
+        ...
+
+    @abc.abstractmethod
+    async def bulk_update_map(self, updates):
+        """Applies (guild_id, index, fields, upsert) updates in one batch."""
+
+    @abc.abstractmethod
+    async def get_map(self, guild_id, index):
+        ...
+
+    @abc.abstractmethod
+    async def get_map_by_message(self, guild_id, message_id):
+        ...
+
+    @abc.abstractmethod
+    async def count_map(self, guild_id):
+        ...
+
+    @abc.abstractmethod
+    async def iter_map(self, guild_id, batch_size=1000, without_thread=False):
+        """Yields a guild's entries in index order; `without_thread` keeps
+        only non-reply entries that have no thread_id."""
+
+    # Small bookkeeping documents
+    @abc.abstractmethod
+    async def get_meta(self, key):
+        ...
+
+    @abc.abstractmethod
+    async def set_meta(self, key, fields):
+        ...
+
+    @abc.abstractmethod
+    async def swap_active(self, guild_id, channel_id, message_id):
+        """Points the guild's button pointer at a newer message and returns the
+        previous pointer (None if there was none, or the new pointer itself if
+        the stored one is already newer)."""
+
+    # Confession bans: {"guild_id", "user_id", "expires_at", "reason",
+    # "moderator_id", "created_at"}. expires_at is None for permanent bans;
+    # expired bans are removed by the backend, eventually.
+    @abc.abstractmethod
+    async def iter_bans(self, guild_id):
+        ...
+
+    @abc.abstractmethod
+    async def get_ban(self, guild_id, user_id):
+        ...
+
+    @abc.abstractmethod
+    async def add_ban(self, guild_id, user_id, fields):
+        """Creates or replaces a ban and returns it."""
+
+    @abc.abstractmethod
+    async def remove_ban(self, guild_id, user_id):
+        """Returns whether there was a ban to remove."""
+
+    @abc.abstractmethod
+    async def clear_bans(self, guild_id):
+        """Removes every ban in a guild and returns how many there were."""
+
+    # Audit records: who posted each confession, {"guild_id", "index",
+    # "user_id", "type", "channel_id", "message_id", "created_at"}. Keyed by
+    # (guild_id, message_id), so writing a record again just replaces it,
+    # and a reused index (after !count) doesn't overwrite an older record.
+    @abc.abstractmethod
+    async def add_audit_records(self, records):
+        ...
+
+    @abc.abstractmethod
+    async def find_audit_records(self, guild_id, user_id, before=None, limit=10):
+        """Returns up to `limit` of a user's records with message_id below `before`, newest first."""
+
+    @abc.abstractmethod
+    async def iter_audit_records(self, guild_id, batch_size=1000):
+        """Yields a guild's records in message_id (posting) order."""
+
+def _ban_id(guild_id, user_id):
+    return f"{guild_id}:{user_id}"
+
+def parse_ban_id(ban_id):
+    """Returns (guild_id, user_id) from a Mongo ban _id."""
+    guild_id, user_id = ban_id.split(":")
+    return int(guild_id), int(user_id)
+
+def _ban_expired(ban, now):
+    return ban["expires_at"] is not None and ban["expires_at"] <= now
+
+def _aware(document, *fields):
+    # Motor returns naive UTC datetimes.
+    for field in fields:
+        if document.get(field) is not None and document[field].tzinfo is None:
+            document[field] = document[field].replace(tzinfo=datetime.timezone.utc)
+    return document
+
+# --- MongoDB ---
+def _bounded(method):
+    """Runs a Mongo call under MONGO_OPERATION_TIMEOUT_MS (server selection, pool wait and reply)."""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with pymongo.timeout(MONGO_OPERATION_TIMEOUT_MS / 1000):
+            return await method(*args, **kwargs)
+    return wrapper
+
+class MongoStorage(Storage):
+    name = "mongo"
+
+    def __init__(self, database, client=None):
+        self.mongo = database
+        self._client = client
+
+    async def ensure_schema(self):
+        # The builds are independent, so they run concurrently: startup waits
+        # one round trip instead of one per index.
+        await asyncio.gather(
+            # Bans are keyed "<guild_id>:<user_id>", so a change stream delete
+            # event still says whose ban it was.
+            self.mongo.confession_bans.create_index("guild_id", name="guild_id"),
+            self.mongo.confession_bans.create_index("expires_at", expireAfterSeconds=0, name="ban_expiry"),
+            # Serves "a user's submissions in a guild, newest first" as one index range.
+            self.mongo.confession_audit.create_index(
+                [("guild_id", pymongo.ASCENDING), ("user_id", pymongo.ASCENDING), ("message_id", pymongo.DESCENDING)],
+                name="guild_user_message"
+            ),
+            self.mongo.confession_audit.create_index(
+                [("guild_id", pymongo.ASCENDING), ("message_id", pymongo.ASCENDING)], name="guild_message"
+            ),
+            self.mongo.confession_map.create_index(
+                [("guild_id", pymongo.ASCENDING), ("index", pymongo.ASCENDING)],
+                unique=True, name="guild_id_index"
+            ),
+            self.mongo.confession_map.create_index("message_id", name="message_id"),
+            self.mongo.confession_archive.create_index(
+                [("g", pymongo.ASCENDING), ("s", pymongo.ASCENDING)],
+                unique=True, name="guild_bucket"
+            ),
+            self.mongo.confession_archive.create_index(
+                [("g", pymongo.ASCENDING), ("ms", pymongo.ASCENDING)], name="guild_message"
+            ),
+            # Without change streams, database.py polls these for documents
+            # stamped since its last look. Counters are only stamped by !count.
+            *(
+                self.mongo[name].create_index("updated_at", sparse=True, name="updated_at")
+                for name in (*CONFIG_COLLECTIONS, "guild_counters", "confession_bans")
+            ),
+        )
+
+    async def ping(self):
+        await self.mongo.command("ping")
+
+    async def close(self):
+        if self._client is not None:
+            self._client.close()
+
+    @_bounded
+    async def get_config(self, name, guild_id):
+        return await self.mongo[name].find_one({"_id": guild_id})
+
+    @_bounded
+    async def update_config(self, name, guild_id, fields):
+        update = {"$currentDate": {"updated_at": True}}
+        if fields:
+            update["$set"] = fields
+        return await self.mongo[name].find_one_and_update(
+            {"_id": guild_id}, update, upsert=True, return_document=pymongo.ReturnDocument.AFTER
+        )
+
+    async def iter_configs(self, name, batch_size=1000):
+        async for document in self.mongo[name].find().sort("_id", pymongo.ASCENDING).batch_size(batch_size):
+            yield document
+
+    @_bounded
+    async def get_counter(self, guild_id):
+        return await self.mongo.guild_counters.find_one({"_id": guild_id})
+
+    @_bounded
+    async def reserve_indices(self, guild_id, size):
+        result = await self.mongo.guild_counters.find_one_and_update(
+            {"_id": guild_id},
+            {"$inc": {"index": size}},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        return result.get("index", size)
+
+    async def set_counter(self, guild_id, value):
+        await self.mongo.guild_counters.update_one(
+            {"_id": guild_id},
+            {"$set": {"index": value}, "$currentDate": {"updated_at": True}},
+            upsert=True
+        )
+
+    async def advance_counter(self, guild_id, value):
+        await self.mongo.guild_counters.update_one(
+            {"_id": guild_id},
+            {"$max": {"index": value}, "$currentDate": {"updated_at": True}},
+            upsert=True
+        )
+
+    async def release_indices(self, guild_id, last_index, value):
+        await self.mongo.guild_counters.update_one({"_id": guild_id, "index": last_index}, {"$set": {"index": value}})
+
+    @_bounded
+    async def update_map(self, guild_id, index, fields, upsert):
+        await self.mongo.confession_map.update_one({"guild_id": guild_id, "index": index}, {"$set": fields}, upsert=upsert)
+
+    @_bounded
+    async def bulk_update_map(self, updates):
+        await self.mongo.confession_map.bulk_write([
+            pymongo.UpdateOne({"guild_id": guild_id, "index": index}, {"$set": fields}, upsert=upsert)
+            for guild_id, index, fields, upsert in updates
+        ], ordered=False)
+
+    @_bounded
+    async def get_map(self, guild_id, index):
+        return await self.mongo.confession_map.find_one({"guild_id": guild_id, "index": index})
+
+    @_bounded
+    async def get_map_by_message(self, guild_id, message_id):
+        return await self.mongo.confession_map.find_one({"message_id": message_id, "guild_id": guild_id})
+
+    async def count_map(self, guild_id):
+        return await self.mongo.confession_map.count_documents({"guild_id": guild_id})
+
+    async def iter_map(self, guild_id, batch_size=1000, without_thread=False):
+        query = {"guild_id": guild_id}
+        if without_thread:
+            query.update({"type": {"$ne": "reply"}, "thread_id": {"$exists": False}})
+        cursor = self.mongo.confession_map.find(query, {"_id": 0}).sort("index", pymongo.ASCENDING).batch_size(batch_size)
+        async for document in cursor:
+            yield document
+
+    async def get_meta(self, key):
+        return await self.mongo.bot_meta.find_one({"_id": key})
+
+    async def set_meta(self, key, fields):
+        await self.mongo.bot_meta.update_one(
+            {"_id": key},
+            {"$set": fields, "$currentDate": {"updated_at": True}},
+            upsert=True
+        )
+
+    @_bounded
+    async def swap_active(self, guild_id, channel_id, message_id):
+        try:
+            return await self.mongo.active_buttons.find_one_and_update(
+                # Message IDs are snowflakes, so only ever move the pointer forward.
+                {"_id": guild_id, "message_id": {"$lt": message_id}},
+                {"$set": {"channel_id": channel_id, "message_id": message_id}},
+                upsert=True,
+                return_document=pymongo.ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # A newer confession already holds the buttons.
+            return {"_id": guild_id, "channel_id": channel_id, "message_id": message_id}
+
+    @staticmethod
+    def _ban(document, now):
+        # The TTL monitor only runs once a minute, so expired bans can still
+        # be read back.
+        document.pop("_id", None)
+        document.pop("updated_at", None)
+        _aware(document, "expires_at", "created_at")
+        return None if _ban_expired(document, now) else document
+
+    @_bounded
+    async def _find_bans(self, guild_id):
+        return await self.mongo.confession_bans.find({"guild_id": guild_id}).to_list(None)
+
+    async def iter_bans(self, guild_id):
+        # A guild's bans are few; they're read in one bounded call rather than
+        # streamed, since a timeout can't span the yields of a generator.
+        now = _now()
+        for document in await self._find_bans(guild_id):
+            ban = self._ban(document, now)
+            if ban is not None:
+                yield ban
+
+    @_bounded
+    async def get_ban(self, guild_id, user_id):
+        document = await self.mongo.confession_bans.find_one({"_id": _ban_id(guild_id, user_id)})
+        return self._ban(document, _now()) if document is not None else None
+
+    @_bounded
+    async def add_ban(self, guild_id, user_id, fields):
+        ban = {"guild_id": guild_id, "user_id": user_id, "expires_at": None, "reason": None, "moderator_id": None, **fields}
+        result = await self.mongo.confession_bans.find_one_and_update(
+            {"_id": _ban_id(guild_id, user_id)},
+            {"$set": ban, "$currentDate": {"created_at": True, "updated_at": True}},
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        return self._ban(result, datetime.datetime.min.replace(tzinfo=datetime.timezone.utc))
+
+    @_bounded
+    async def remove_ban(self, guild_id, user_id):
+        return (await self.mongo.confession_bans.delete_one({"_id": _ban_id(guild_id, user_id)})).deleted_count > 0
+
+    async def clear_bans(self, guild_id):
+        return (await self.mongo.confession_bans.delete_many({"guild_id": guild_id})).deleted_count
+
+    @_bounded
+    async def add_audit_records(self, records):
+        await self.mongo.confession_audit.bulk_write([
+            pymongo.UpdateOne({"_id": f"{record['guild_id']}:{record['message_id']}"}, {"$set": record}, upsert=True)
+            for record in records
+        ], ordered=False)
+
+    @_bounded
+    async def find_audit_records(self, guild_id, user_id, before=None, limit=10):
+        query = {"guild_id": guild_id, "user_id": user_id}
+        if before is not None:
+            query["message_id"] = {"$lt": before}
+        cursor = self.mongo.confession_audit.find(query, {"_id": 0}).sort("message_id", pymongo.DESCENDING).limit(limit)
+        return [_aware(record, "created_at") async for record in cursor]
+
+    async def iter_audit_records(self, guild_id, batch_size=1000):
+        cursor = self.mongo.confession_audit.find({"guild_id": guild_id}, {"_id": 0}).sort("message_id", pymongo.ASCENDING).batch_size(batch_size)
+        async for record in cursor:
+            yield _aware(record, "created_at")
+
+# --- In-Memory ---
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self):
+        self._configs = {name: {} for name in CONFIG_COLLECTIONS}
+        self._counters = {}
+        self._map = {}          # (guild_id, index) -> entry
+        self._by_message = {}   # (guild_id, message_id) -> index
+        self._meta = {}
+        self._active = {}
+        self._bans = {}  # guild_id -> {user_id: ban}
+        self._audit = {}  # (guild_id, message_id) -> record
+        self._audit_by_user = {}  # (guild_id, user_id) -> sorted message IDs
+
+    async def ping(self):
+        pass
+
+    async def get_config(self, name, guild_id):
+        document = self._configs[name].get(guild_id)
+        return dict(document) if document is not None else None
+
+    async def update_config(self, name, guild_id, fields):
+        document = self._configs[name].setdefault(guild_id, {"_id": guild_id})
+        document.update(fields)
+        document["updated_at"] = _now()
+        return dict(document)
+
+    async def iter_configs(self, name, batch_size=1000):
+        for guild_id in sorted(self._configs[name]):
+            yield dict(self._configs[name][guild_id])
+
+    async def get_counter(self, guild_id):
+        counter = self._counters.get(guild_id)
+        return dict(counter) if counter is not None else None
+
+    async def reserve_indices(self, guild_id, size):
+        counter = self._counters.setdefault(guild_id, {"_id": guild_id, "index": 0})
+        counter["index"] += size
+        return counter["index"]
+
+    async def set_counter(self, guild_id, value):
+        self._counters[guild_id] = {"_id": guild_id, "index": value, "updated_at": _now()}
+
+    async def advance_counter(self, guild_id, value):
+        counter = self._counters.setdefault(guild_id, {"_id": guild_id, "index": value})
+        counter["index"] = max(counter["index"], value)
+        counter["updated_at"] = _now()
+
+    async def release_indices(self, guild_id, last_index, value):
+        counter = self._counters.get(guild_id)
+        if counter is not None and counter["index"] == last_index:
+            counter["index"] = value
+
+    def _update(self, guild_id, index, fields, upsert):
+        entry = self._map.get((guild_id, index))
+        if entry is None:
+            if not upsert:
+                return
+            entry = self._map[(guild_id, index)] = {"guild_id": guild_id, "index": index}
+        entry.update({field: value for field, value in fields.items() if field in MAP_FIELDS})
+        if "message_id" in entry:
+            self._by_message[(guild_id, entry["message_id"])] = index
+
+    async def update_map(self, guild_id, index, fields, upsert):
+        self._update(guild_id, index, fields, upsert)
+
+    async def bulk_update_map(self, updates):
+        for update in updates:
+            self._update(*update)
+
+    async def get_map(self, guild_id, index):
+        entry = self._map.get((guild_id, index))
+        return dict(entry) if entry is not None else None
+
+    async def get_map_by_message(self, guild_id, message_id):
+        index = self._by_message.get((guild_id, message_id))
+        return await self.get_map(guild_id, index) if index is not None else None
+
+    async def count_map(self, guild_id):
+        return sum(1 for entry_guild, _ in self._map if entry_guild == guild_id)
+
+    async def iter_map(self, guild_id, batch_size=1000, without_thread=False):
+        for key in sorted(key for key in self._map if key[0] == guild_id):
+            entry = self._map.get(key)
+            if entry is None:
+                continue
+            if without_thread and (entry.get("type") == "reply" or "thread_id" in entry):
+                continue
+            yield dict(entry)
+
+    async def get_meta(self, key):
+        document = self._meta.get(key)
+        return dict(document) if document is not None else None
+
+    async def set_meta(self, key, fields):
+        document = self._meta.setdefault(key, {"_id": key})
+        document.update(fields)
+        document["updated_at"] = _now()
+
+    async def swap_active(self, guild_id, channel_id, message_id):
+        previous = self._active.get(guild_id)
+        if previous is not None and previous["message_id"] >= message_id:
+            return {"_id": guild_id, "channel_id": channel_id, "message_id": message_id}
+        self._active[guild_id] = {"_id": guild_id, "channel_id": channel_id, "message_id": message_id}
+        return previous
+
+    def _live_bans(self, guild_id):
+        bans = self._bans.get(guild_id, {})
+        now = _now()
+        for user_id in [user_id for user_id, ban in bans.items() if _ban_expired(ban, now)]:
+            del bans[user_id]
+        return bans
+
+    async def iter_bans(self, guild_id):
+        for ban in list(self._live_bans(guild_id).values()):
+            yield dict(ban)
+
+    async def get_ban(self, guild_id, user_id):
+        ban = self._live_bans(guild_id).get(user_id)
+        return dict(ban) if ban is not None else None
+
+    async def add_ban(self, guild_id, user_id, fields):
+        ban = {"guild_id": guild_id, "user_id": user_id, "expires_at": None, "reason": None, "moderator_id": None, **fields, "created_at": _now()}
+        self._bans.setdefault(guild_id, {})[user_id] = ban
+        return dict(ban)
+
+    async def remove_ban(self, guild_id, user_id):
+        return self._bans.get(guild_id, {}).pop(user_id, None) is not None
+
+    async def clear_bans(self, guild_id):
+        return len(self._bans.pop(guild_id, {}))
+
+    async def add_audit_records(self, records):
+        for record in records:
+            key = (record["guild_id"], record["message_id"])
+            previous = self._audit.get(key)
+            if previous is not None:
+                self._audit_by_user[(previous["guild_id"], previous["user_id"])].remove(record["message_id"])
+            self._audit[key] = dict(record)
+            bisect.insort(self._audit_by_user.setdefault((record["guild_id"], record["user_id"]), []), record["message_id"])
+
+    async def find_audit_records(self, guild_id, user_id, before=None, limit=10):
+        message_ids = self._audit_by_user.get((guild_id, user_id), [])
+        end = len(message_ids) if before is None else bisect.bisect_left(message_ids, before)
+        return [dict(self._audit[(guild_id, message_id)]) for message_id in reversed(message_ids[max(0, end - limit):end])]
+
+    async def iter_audit_records(self, guild_id, batch_size=1000):
+        for key in sorted(key for key in self._audit if key[0] == guild_id):
+            yield dict(self._audit[key])
+
+# --- SQLite ---
+# One connection, used from a single worker thread, so statements never run
+# concurrently and the event loop never blocks on disk. Every statement is a
+# fixed string with ? parameters, so sqlite3's statement cache prepares each
+# one once. Fields outside MAP_FIELDS are not stored.
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS config (
+    name TEXT NOT NULL, guild_id INTEGER NOT NULL, doc TEXT NOT NULL, updated_at REAL NOT NULL,
+    PRIMARY KEY (name, guild_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counters (
+    guild_id INTEGER PRIMARY KEY, value INTEGER NOT NULL, updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS confession_map (
+    guild_id INTEGER NOT NULL, idx INTEGER NOT NULL,
+    channel_id INTEGER, message_id INTEGER, type TEXT, content TEXT, preview TEXT, parent_index INTEGER, thread_id INTEGER,
+    PRIMARY KEY (guild_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS confession_map_message ON confession_map (guild_id, message_id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, doc TEXT NOT NULL, updated_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS active_buttons (guild_id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL, message_id INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS bans (
+    guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL,
+    expires_at REAL, reason TEXT, moderator_id INTEGER, created_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bans_expiry ON bans (expires_at) WHERE expires_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS audit (
+    guild_id INTEGER NOT NULL, idx INTEGER NOT NULL, user_id INTEGER NOT NULL,
+    type TEXT, channel_id INTEGER, message_id INTEGER NOT NULL, created_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS audit_guild_user ON audit (guild_id, user_id, message_id DESC);
+"""
+_BAN_SELECT = "SELECT guild_id, user_id, expires_at, reason, moderator_id, created_at FROM bans"
+_AUDIT_SELECT = "SELECT guild_id, idx, user_id, type, channel_id, message_id, created_at FROM audit"
+_MAP_SELECT = f"SELECT guild_id, idx, {', '.join(MAP_FIELDS)} FROM confession_map"
+
+@functools.lru_cache(maxsize=None)
+def _map_upsert_sql(columns):
+    return (
+        f"INSERT INTO confession_map (guild_id, idx, {', '.join(columns)}) VALUES (?, ?{', ?' * len(columns)}) "
+        f"ON CONFLICT (guild_id, idx) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns)}"
+    )
+
+@functools.lru_cache(maxsize=None)
+def _map_update_sql(columns):
+    return f"UPDATE confession_map SET {', '.join(f'{c} = ?' for c in columns)} WHERE guild_id = ? AND idx = ?"
+
+def _map_row(row):
+    if row is None:
+        return None
+    entry = {"guild_id": row[0], "index": row[1]}
+    for field, value in zip(MAP_FIELDS, row[2:]):
+        if value is not None:
+            entry[field] = value
+    return entry
+
+def _timestamp(value):
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc) if value is not None else None
+
+def _audit_row(row):
+    guild_id, index, user_id, type, channel_id, message_id, created_at = row
+    return {
+        "guild_id": guild_id, "index": index, "user_id": user_id, "type": type,
+        "channel_id": channel_id, "message_id": message_id, "created_at": _timestamp(created_at),
+    }
+
+def _ban_row(row):
+    if row is None:
+        return None
+    guild_id, user_id, expires_at, reason, moderator_id, created_at = row
+    return {
+        "guild_id": guild_id, "user_id": user_id, "expires_at": _timestamp(expires_at),
+        "reason": reason, "moderator_id": moderator_id, "created_at": _timestamp(created_at),
+    }
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SQLITE_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _transaction(self, func, *args):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(connection, *args)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    async def ensure_schema(self):
+        await self._run(self._connect)
+
+    async def ping(self):
+        await self._run(lambda: self._connect().execute("SELECT 1").fetchone())
+
+    async def close(self):
+        def close():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        await self._run(close)
+        self._executor.shutdown(wait=False)
+
+    def _get_config(self, connection, name, guild_id):
+        row = connection.execute("SELECT doc, updated_at FROM config WHERE name = ? AND guild_id = ?", (name, guild_id)).fetchone()
+        if row is None:
+            return None
+        return {"_id": guild_id, **json.loads(row[0]), "updated_at": _timestamp(row[1])}
+
+    async def get_config(self, name, guild_id):
+        return await self._run(lambda: self._get_config(self._connect(), name, guild_id))
+
+    def _update_config(self, connection, name, guild_id, fields):
+        document = self._get_config(connection, name, guild_id) or {"_id": guild_id}
+        document.update(fields)
+        document["updated_at"] = _now()
+        body = {key: value for key, value in document.items() if key not in ("_id", "updated_at")}
+        connection.execute(
+            "INSERT OR REPLACE INTO config (name, guild_id, doc, updated_at) VALUES (?, ?, ?, ?)",
+            (name, guild_id, json.dumps(body), document["updated_at"].timestamp())
+        )
+        return document
+
+    async def update_config(self, name, guild_id, fields):
+        return await self._run(self._transaction, self._update_config, name, guild_id, fields)
+
+    async def iter_configs(self, name, batch_size=1000):
+        sql = "SELECT guild_id, doc, updated_at FROM config WHERE name = ? AND guild_id > ? ORDER BY guild_id LIMIT ?"
+        after = -1
+        while True:
+            rows = await self._run(lambda: self._connect().execute(sql, (name, after, batch_size)).fetchall())
+            for guild_id, doc, updated_at in rows:
+                yield {"_id": guild_id, **json.loads(doc), "updated_at": _timestamp(updated_at)}
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0]
+
+    async def get_counter(self, guild_id):
+        def get():
+            row = self._connect().execute("SELECT value, updated_at FROM counters WHERE guild_id = ?", (guild_id,)).fetchone()
+            if row is None:
+                return None
+            counter = {"_id": guild_id, "index": row[0]}
+            if row[1] is not None:
+                counter["updated_at"] = _timestamp(row[1])
+            return counter
+        return await self._run(get)
+
+    async def reserve_indices(self, guild_id, size):
+        return await self._run(lambda: self._connect().execute(
+            "INSERT INTO counters (guild_id, value) VALUES (?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET value = value + excluded.value RETURNING value",
+            (guild_id, size)
+        ).fetchone()[0])
+
+    async def set_counter(self, guild_id, value):
+        await self._run(lambda: self._connect().execute(
+            "INSERT INTO counters (guild_id, value, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            (guild_id, value, _now().timestamp())
+        ))
+
+    async def advance_counter(self, guild_id, value):
+        await self._run(lambda: self._connect().execute(
+            "INSERT INTO counters (guild_id, value, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET value = max(value, excluded.value), updated_at = excluded.updated_at",
+            (guild_id, value, _now().timestamp())
+        ))
+
+    async def release_indices(self, guild_id, last_index, value):
+        await self._run(lambda: self._connect().execute(
+            "UPDATE counters SET value = ? WHERE guild_id = ? AND value = ?", (value, guild_id, last_index)
+        ))
+
+    def _update_map(self, connection, guild_id, index, fields, upsert):
+        columns = tuple(field for field in MAP_FIELDS if field in fields)
+        if not columns:
+            return
+        values = [fields[column] for column in columns]
+        if upsert:
+            connection.execute(_map_upsert_sql(columns), (guild_id, index, *values))
+        else:
+            connection.execute(_map_update_sql(columns), (*values, guild_id, index))
+
+    async def update_map(self, guild_id, index, fields, upsert):
+        await self._run(lambda: self._update_map(self._connect(), guild_id, index, fields, upsert))
+
+    async def bulk_update_map(self, updates):
+        def apply(connection):
+            for update in updates:
+                self._update_map(connection, *update)
+        await self._run(self._transaction, apply)
+
+    async def get_map(self, guild_id, index):
+        return await self._run(lambda: _map_row(self._connect().execute(
+            f"{_MAP_SELECT} WHERE guild_id = ? AND idx = ?", (guild_id, index)
+        ).fetchone()))
+
+    async def get_map_by_message(self, guild_id, message_id):
+        return await self._run(lambda: _map_row(self._connect().execute(
+            f"{_MAP_SELECT} WHERE guild_id = ? AND message_id = ?", (guild_id, message_id)
+        ).fetchone()))
+
+    async def count_map(self, guild_id):
+        return await self._run(lambda: self._connect().execute(
+            "SELECT COUNT(*) FROM confession_map WHERE guild_id = ?", (guild_id,)
+        ).fetchone()[0])
+
+    async def iter_map(self, guild_id, batch_size=1000, without_thread=False):
+        sql = f"{_MAP_SELECT} WHERE guild_id = ? AND idx > ?"
+        if without_thread:
+            sql += " AND (type IS NULL OR type != 'reply') AND thread_id IS NULL"
+        sql += " ORDER BY idx LIMIT ?"
+        after = -1
+        while True:
+            rows = await self._run(lambda: self._connect().execute(sql, (guild_id, after, batch_size)).fetchall())
+            for row in rows:
+                yield _map_row(row)
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][1]
+
+    async def get_meta(self, key):
+        def get():
+            row = self._connect().execute("SELECT doc, updated_at FROM meta WHERE key = ?", (key,)).fetchone()
+            return {"_id": key, **json.loads(row[0]), "updated_at": _timestamp(row[1])} if row else None
+        return await self._run(get)
+
+    async def set_meta(self, key, fields):
+        def update(connection):
+            row = connection.execute("SELECT doc FROM meta WHERE key = ?", (key,)).fetchone()
+            document = {**(json.loads(row[0]) if row else {}), **fields}
+            connection.execute(
+                "INSERT OR REPLACE INTO meta (key, doc, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(document), _now().timestamp())
+            )
+        await self._run(self._transaction, update)
+
+    async def swap_active(self, guild_id, channel_id, message_id):
+        def swap(connection):
+            row = connection.execute("SELECT channel_id, message_id FROM active_buttons WHERE guild_id = ?", (guild_id,)).fetchone()
+            if row is not None and row[1] >= message_id:
+                return {"_id": guild_id, "channel_id": channel_id, "message_id": message_id}
+            connection.execute(
+                "INSERT OR REPLACE INTO active_buttons (guild_id, channel_id, message_id) VALUES (?, ?, ?)",
+                (guild_id, channel_id, message_id)
+            )
+            return {"_id": guild_id, "channel_id": row[0], "message_id": row[1]} if row else None
+        return await self._run(self._transaction, swap)
+
+    async def iter_bans(self, guild_id):
+        def load(connection):
+            # Expired bans are deleted here, standing in for Mongo's TTL index.
+            connection.execute("DELETE FROM bans WHERE guild_id = ? AND expires_at <= ?", (guild_id, _now().timestamp()))
+            return connection.execute(f"{_BAN_SELECT} WHERE guild_id = ?", (guild_id,)).fetchall()
+        for row in await self._run(self._transaction, load):
+            yield _ban_row(row)
+
+    async def get_ban(self, guild_id, user_id):
+        ban = await self._run(lambda: _ban_row(self._connect().execute(
+            f"{_BAN_SELECT} WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).fetchone()))
+        return None if ban is None or _ban_expired(ban, _now()) else ban
+
+    async def add_ban(self, guild_id, user_id, fields):
+        ban = {"guild_id": guild_id, "user_id": user_id, "expires_at": None, "reason": None, "moderator_id": None, **fields, "created_at": _now()}
+        expires_at = ban["expires_at"].timestamp() if ban["expires_at"] is not None else None
+        await self._run(lambda: self._connect().execute(
+            "INSERT OR REPLACE INTO bans (guild_id, user_id, expires_at, reason, moderator_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (guild_id, user_id, expires_at, ban["reason"], ban["moderator_id"], ban["created_at"].timestamp())
+        ))
+        return ban
+
+    async def remove_ban(self, guild_id, user_id):
+        return await self._run(lambda: self._connect().execute(
+            "DELETE FROM bans WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).rowcount > 0)
+
+    async def clear_bans(self, guild_id):
+        return await self._run(lambda: self._connect().execute("DELETE FROM bans WHERE guild_id = ?", (guild_id,)).rowcount)
+
+    async def add_audit_records(self, records):
+        rows = [
+            (r["guild_id"], r["index"], r["user_id"], r.get("type"), r.get("channel_id"), r["message_id"], r["created_at"].timestamp())
+            for r in records
+        ]
+        await self._run(self._transaction, lambda connection: connection.executemany(
+            "INSERT OR REPLACE INTO audit (guild_id, idx, user_id, type, channel_id, message_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        ))
+
+    async def find_audit_records(self, guild_id, user_id, before=None, limit=10):
+        sql = f"{_AUDIT_SELECT} WHERE guild_id = ? AND user_id = ? AND message_id < ? ORDER BY message_id DESC LIMIT ?"
+        before = (1 << 62) if before is None else before
+        rows = await self._run(lambda: self._connect().execute(sql, (guild_id, user_id, before, limit)).fetchall())
+        return [_audit_row(row) for row in rows]
+
+    async def iter_audit_records(self, guild_id, batch_size=1000):
+        sql = f"{_AUDIT_SELECT} WHERE guild_id = ? AND message_id > ? ORDER BY message_id LIMIT ?"
+        after = -1
+        while True:
+            rows = await self._run(lambda: self._connect().execute(sql, (guild_id, after, batch_size)).fetchall())
+            for row in rows:
+                yield _audit_row(row)
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][5]
+
+def open_storage(backend=STORAGE_BACKEND):
+    """Creates the configured backend. The Mongo client connects lazily."""
+    if backend == "mongo":
+        import motor.motor_asyncio
+        client = motor.motor_asyncio.AsyncIOMotorClient(os.environ['MONGO_URI'], **MONGO_CLIENT_OPTIONS)
+        return MongoStorage(client[MONGO_DB_NAME], client)
+    if backend == "sqlite":
+        return SQLiteStorage(SQLITE_PATH)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend!r}")
@@ -0,0 +1,22 @@
+"""Runs the storage backend conformance checks under pytest, on every backend.
+
+The checks live in benchmarks/storage_conformance.py, which can also be run
+on its own (for instance against a real mongod with --mongo-uri); here the
+Mongo backend uses the in-memory stand-in.
+"""
+import argparse
+import asyncio
+
+import pytest
+
+from benchmarks import storage_conformance as conformance
+
+ARGS = argparse.Namespace(mongo_uri=None)
+
+@pytest.mark.parametrize("check", conformance.CHECKS, ids=lambda check: check.__name__)
+@pytest.mark.parametrize("backend", conformance.BACKENDS)
+def test_conformance(backend, check):
+    async def run():
+        async with conformance.open_backend(backend, ARGS) as storage:
+            await check(storage)
+    asyncio.run(run())
@@ -0,0 +1,86 @@
+import os
+import time
+import functools
+
+# --- Tracing ---
+# Lightweight per-stage timers. Wrap a stage in ``with span("name", guild_id):``
+# to record how long it took. Timings are aggregated per guild and stage, and
+# anything slower than TRACE_SLOW_MS is printed. When tracing is disabled,
+# span() returns a shared no-op object, so the cost is one function call.
+TRACE_ENABLED = os.environ.get("CONFESSION_TRACE", "0") == "1"
+TRACE_SLOW_MS = float(os.environ.get("CONFESSION_TRACE_SLOW_MS", 500))
+
+_aggregates = {}  # (guild_id, name) -> [count, total_seconds, max_seconds]
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("name", "guild_id", "started")
+
+    def __init__(self, name, guild_id):
+        self.name = name
+        self.guild_id = guild_id
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        aggregate = _aggregates.get((self.guild_id, self.name))
+        if aggregate is None:
+            _aggregates[(self.guild_id, self.name)] = [1, elapsed, elapsed]
+        else:
+            aggregate[0] += 1
+            aggregate[1] += elapsed
+            aggregate[2] = max(aggregate[2], elapsed)
+        if elapsed * 1000 >= TRACE_SLOW_MS:
+            outcome = f" ({exc_type.__name__})" if exc_type else ""
+            print(f"[trace] slow {self.name} in guild {self.guild_id}: {elapsed * 1000:.0f} ms{outcome}")
+        return False
+
+def span(name, guild_id=None):
+    """Times a stage. Use as ``with span("confession.send", guild_id): ...``."""
+    if not TRACE_ENABLED:
+        return _NULL_SPAN
+    return _Span(name, guild_id)
+
+def traced(name, guild_of=None):
+    """Decorates a coroutine function so each call runs inside span(name).
+
+    ``guild_of`` receives the call's arguments and returns the guild ID.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not TRACE_ENABLED:
+                return await func(*args, **kwargs)
+            with _Span(name, guild_of(*args, **kwargs) if guild_of else None):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def set_enabled(enabled):
+    global TRACE_ENABLED
+    TRACE_ENABLED = enabled
+
+def guild_stats(guild_id):
+    """Returns {stage: (count, avg_ms, max_ms)} for one guild, slowest first."""
+    rows = {
+        name: (count, total / count * 1000, worst * 1000)
+        for (gid, name), (count, total, worst) in _aggregates.items()
+        if gid == guild_id
+    }
+    return dict(sorted(rows.items(), key=lambda item: item[1][1], reverse=True))
+
+def reset():
+    _aggregates.clear()
@@ -0,0 +1,161 @@
+import os
+import gzip
+import asyncio
+import argparse
+import datetime
+from bson import json_util
+import database as db
+import storage
+
+# --- Guild Export / Import ---
+# Streams one guild's data to gzip-compressed NDJSON and back, for moving a
+# guild between clusters or restoring it after an incident. A file is a
+# header line, one {"collection", "document"} line per document, and a footer
+# with the document count per collection. Either direction holds at most one
+# batch in memory, and JSON encoding and compression run in a worker thread
+# so the event loop keeps serving the gateway.
+#
+# Imports save their progress to <file>.checkpoint after every batch; running
+# the same import again resumes from there.
+#
+#     python transfer.py export 123456789012345678 guild.ndjson.gz
+#     python transfer.py import guild.ndjson.gz
+#
+# The CLI uses the backend selected by STORAGE_BACKEND, so it can also move a
+# guild from one backend to another.
+EXPORT_FORMAT = "confession-export"
+EXPORT_VERSION = 1
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+TRANSFER_BATCH_SIZE = int(os.environ.get("TRANSFER_BATCH_SIZE", 1000))
+
+def _dumps(record):
+    return json_util.dumps(record, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n"
+
+def _write_batch(out, records):
+    out.write("".join(_dumps({"collection": name, "document": document}) for name, document in records))
+
+def _read_batch(file, batch_size):
+    records = []
+    for line in file:
+        records.append(json_util.loads(line))
+        if len(records) >= batch_size:
+            break
+    return records
+
+def _read_checkpoint(path, header):
+    """Returns how many documents a previous run of this import applied."""
+    try:
+        with open(path) as file:
+            checkpoint = json_util.loads(file.read())
+    except FileNotFoundError:
+        return 0
+    # Only resume an import of the same export.
+    if checkpoint["guild_id"] != header["guild_id"] or checkpoint["exported_at"] != header["exported_at"]:
+        return 0
+    return checkpoint["documents"]
+
+def _write_checkpoint(path, header, documents):
+    with open(path + ".tmp", "w") as file:
+        file.write(_dumps({"guild_id": header["guild_id"], "exported_at": header["exported_at"], "documents": documents}))
+    os.replace(path + ".tmp", path)
+
+async def export_guild(database, guild_id, path, batch_size=TRANSFER_BATCH_SIZE):
+    """Exports a guild to `path` and returns the number of documents per collection."""
+    counts = {}
+    partial = path + ".partial"
+    out = await asyncio.to_thread(gzip.open, partial, "wt", encoding="utf-8")
+    try:
+        header = {
+            "format": EXPORT_FORMAT,
+            "version": EXPORT_VERSION,
+            "guild_id": guild_id,
+            "exported_at": datetime.datetime.now(datetime.timezone.utc),
+        }
+        await asyncio.to_thread(out.write, _dumps(header))
+        batch = []
+        async for name, document in db.iter_guild_documents(database, guild_id, batch_size):
+            batch.append((name, document))
+            counts[name] = counts.get(name, 0) + 1
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(_write_batch, out, batch)
+                batch = []
+        await asyncio.to_thread(_write_batch, out, batch)
+        await asyncio.to_thread(out.write, _dumps({"complete": True, "counts": counts}))
+    except BaseException:
+        out.close()
+        os.remove(partial)
+        raise
+    await asyncio.to_thread(out.close)
+    os.replace(partial, path)
+    return counts
+
+async def import_guild(database, path, guild_id=None, batch_size=TRANSFER_BATCH_SIZE, resume=True):
+    """Imports an export and returns the number of documents applied per collection.
+
+    If `guild_id` is given, the export must belong to that guild. Documents a
+    previous run already applied are skipped unless `resume` is False.
+    """
+    checkpoint = path + ".checkpoint"
+    file = await asyncio.to_thread(gzip.open, path, "rt", encoding="utf-8")
+    try:
+        header = (await asyncio.to_thread(_read_batch, file, 1) or [{}])[0]
+        if header.get("format") != EXPORT_FORMAT or header.get("version") != EXPORT_VERSION:
+            raise ValueError(f"Not a version {EXPORT_VERSION} confession export: {path}")
+        if guild_id is not None and header["guild_id"] != guild_id:
+            raise ValueError(f"This export belongs to guild {header['guild_id']}, not {guild_id}.")
+
+        done = _read_checkpoint(checkpoint, header) if resume else 0
+        if done:
+            print(f"Resuming import of {path} after {done} documents.")
+        seen, applied, footer = {}, {}, None
+        position = 0
+        while records := await asyncio.to_thread(_read_batch, file, batch_size):
+            if "complete" in records[-1]:
+                footer = records.pop()
+            batch = [(record["collection"], record["document"]) for record in records]
+            for name, _ in batch:
+                seen[name] = seen.get(name, 0) + 1
+            pending = batch[max(0, done - position):]
+            position += len(batch)
+            if pending:
+                await db.import_guild_documents(database, header["guild_id"], pending)
+                for name, _ in pending:
+                    applied[name] = applied.get(name, 0) + 1
+                await asyncio.to_thread(_write_checkpoint, checkpoint, header, position)
+    finally:
+        await asyncio.to_thread(file.close)
+
+    if footer is None or footer["counts"] != seen:
+        raise ValueError(f"Export is truncated or damaged; imported {position} documents. Rerun with a complete file to resume.")
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return applied
+
+def format_counts(counts):
+    return ", ".join(f"{count} {name}" for name, count in counts.items()) or "nothing"
+
+async def main(args):
+    database = storage.open_storage()
+    try:
+        if args.command == "export":
+            counts = await export_guild(database, args.guild_id, args.path, args.batch_size)
+            print(f"Exported {format_counts(counts)} to {args.path}.")
+        else:
+            counts = await import_guild(database, args.path, args.guild_id, args.batch_size, resume=not args.restart)
+            print(f"Imported {format_counts(counts)} from {args.path}.")
+    finally:
+        await database.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import one guild's confession data.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    export_parser = subcommands.add_parser("export", help="write a guild's data to compressed NDJSON")
+    export_parser.add_argument("guild_id", type=int)
+    export_parser.add_argument("path")
+    import_parser = subcommands.add_parser("import", help="load an export, resuming an interrupted import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--guild-id", type=int, help="refuse exports of any other guild")
+    import_parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and import everything")
+    for subparser in (export_parser, import_parser):
+        subparser.add_argument("--batch-size", type=int, default=TRANSFER_BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))